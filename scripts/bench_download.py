@@ -0,0 +1,365 @@
+"""
+Benchmark Downloader.download_all end to end without network access: an archive is
+extracted from channels generated by scripts/fake_youtube.py, every video's info is put
+in the info cache (as --reuse-info would) with its formats and thumbnail pointing at a
+local HTTP server, which serves m4a/webm media and thumbnails generated with ffmpeg,
+throttled per connection and with some responses cut off on request. yt-dlp then downloads
+from the saved info, as it would from any info JSON, for each output format
+
+reported for each format: files/s, MB/s (over the whole run, and while transferring),
+seconds in each post-processor (from yt_dlq.metrics), ffmpeg's wall time and tag writes,
+and retries and failures, so that changes to concurrency, staging and tagging can be
+compared on one machine
+
+    python scripts/bench_download.py --videos 40 --bandwidth 2048 --fail-rate 0.05
+"""
+
+import argparse
+import functools
+import logging
+import os
+import random
+import re
+import shutil
+import subprocess
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from fake_youtube import FakeYoutube, FakeYoutubeDL
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+
+import yt_dlq.download
+from yt_dlq.args import process_args
+from yt_dlq.download import Downloader
+from yt_dlq.filters import iter_videos
+from yt_dlq.info_cache import InfoCache
+from yt_dlq.metrics import DOWNLOAD_SECONDS, DOWNLOADED_BYTES, FAILURES, POSTPROCESSOR_SECONDS, RETRIES
+from yt_dlq.url.info_extractor import YoutubeInfoExtractor
+
+MIB = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+RANGE_PATTERN = re.compile(r"bytes=(\d+)-(\d*)")
+CONTENT_TYPES = {"m4a": "audio/mp4", "webm": "audio/webm", "jpg": "image/jpeg"}
+# lavfi sources for each kind of file served
+FFMPEG_SOURCES = {
+    "m4a": lambda seconds: ["-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}", "-c:a", "aac", "-b:a", "128k"],
+    "webm": lambda seconds: ["-f", "lavfi", "-i", f"sine=frequency=660:duration={seconds}", "-c:a", "libopus", "-b:a", "128k"],
+    "jpg": lambda seconds: ["-f", "lavfi", "-i", "color=c=steelblue:s=1280x720", "-frames:v", "1"],
+}
+
+
+class ArgsNamespace(argparse.Namespace):
+    videos: int
+    seed: int
+    formats: list[str]
+    duration: int
+    bandwidth: int
+    fail_rate: float
+    webm_share: float
+    staging: bool
+    ffmpeg_location: Path | None
+
+
+def comma_separated_str_to_list(input_: str) -> list[str]:
+    return [e.lower() for e in input_.split(",")]
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=40, help="videos in the generated channels")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--formats",
+        type=comma_separated_str_to_list,
+        default=["mp3", "m4a", "mkv"],
+        help="comma-separated output formats to download to (default: mp3,m4a,mkv)",
+    )
+    parser.add_argument(
+        "--duration", type=int, default=30, metavar="SECONDS", help="length of the generated audio"
+    )
+    parser.add_argument(
+        "--bandwidth", type=int, default=0, metavar="KIB_PER_SECOND", help="per-connection cap (default: none)"
+    )
+    parser.add_argument(
+        "--fail-rate",
+        type=float,
+        default=0.0,
+        help="share of media responses cut off halfway (retried by the downloader as incomplete)",
+    )
+    parser.add_argument(
+        "--webm-share", type=float, default=0.2, help="share of videos with only a webm (opus) format"
+    )
+    parser.add_argument("--staging", action="store_true", help="download with --staging-dir")
+    parser.add_argument("--ffmpeg-location", type=Path)
+    return parser.parse_args(namespace=ArgsNamespace())
+
+
+class MediaServer:
+    """
+    serves the same generated file of each type for every video, on localhost, writing
+     at most `bandwidth` bytes/s to each connection, and cutting off a share of media
+     responses halfway through the body
+    """
+
+    def __init__(self, files: dict[str, bytes], bandwidth: int, fail_rate: float, seed: int):
+        self.files = files
+        self.bandwidth = bandwidth
+        self.fail_rate = fail_rate
+        self.stats: Counter[str] = Counter()
+        self.expires = int(time.time()) + 6 * 60 * 60
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), MediaRequestHandler)
+        self._server.daemon_threads = True
+        self._server.media = self
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, name="media-server", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def url(self, video_id: str, ext: str) -> str:
+        port = self._server.server_address[1]
+        return f"http://127.0.0.1:{port}/{video_id}.{ext}?expire={self.expires}"
+
+    def cut_off(self) -> bool:
+        with self._lock:
+            if self._rng.random() >= self.fail_rate:
+                return False
+            self.stats["cut_off"] += 1
+            return True
+
+    def write(self, wfile, data: bytes):
+        started = time.perf_counter()
+        for offset in range(0, len(data), CHUNK_SIZE):
+            wfile.write(data[offset : offset + CHUNK_SIZE])
+            if self.bandwidth:
+                delay = (offset + CHUNK_SIZE) / self.bandwidth - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+        with self._lock:
+            self.stats["bytes"] += len(data)
+
+
+class MediaRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        media: MediaServer = self.server.media
+        ext = self.path.split("?")[0].rpartition(".")[2]
+        body = media.files.get(ext)
+        if body is None:
+            self.send_error(404)
+            return
+        start, end = 0, len(body)
+        if (range_header := self.headers.get("Range")) and (match := RANGE_PATTERN.fullmatch(range_header)):
+            start = int(match[1])
+            end = min(int(match[2]) + 1, len(body)) if match[2] else len(body)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPES[ext])
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        if ext != "jpg" and media.cut_off():
+            end = start + (end - start) // 2
+            self.close_connection = True
+        try:
+            media.write(self.wfile, body[start:end])
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WallTimer:
+    """replaces owner.name with a wrapper adding up the time spent in it"""
+
+    def __init__(self, owner, name: str):
+        self.seconds = 0.0
+        self.calls = 0
+        original = getattr(owner, name)
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.seconds += time.perf_counter() - start
+                self.calls += 1
+
+        setattr(owner, name, timed)
+
+    def reset(self) -> tuple[float, int]:
+        totals = self.seconds, self.calls
+        self.seconds, self.calls = 0.0, 0
+        return totals
+
+
+def find_ffmpeg(ffmpeg_location: Path | None) -> str:
+    if ffmpeg_location is not None and ffmpeg_location.is_dir():
+        ffmpeg_location = Path(ffmpeg_location, "ffmpeg")
+    ffmpeg = shutil.which(ffmpeg_location or "ffmpeg")
+    if ffmpeg is None:
+        raise SystemExit("ffmpeg is needed to generate media and post-process; see --ffmpeg-location")
+    return ffmpeg
+
+
+def generate_files(ffmpeg: str, tmp_dir: Path, seconds: int) -> dict[str, bytes]:
+    files = {}
+    for ext, source in FFMPEG_SOURCES.items():
+        path = Path(tmp_dir, f"sample.{ext}")
+        subprocess.run(
+            [ffmpeg, "-hide_banner", "-loglevel", "error", "-y", *source(seconds), str(path)],
+            check=True,
+        )
+        files[ext] = path.read_bytes()
+    return files
+
+
+def make_archive(youtube: FakeYoutube, tmp_dir: Path) -> dict:
+    extractor_args = process_args(["-o", str(tmp_dir)], interactive=False)
+    yie = YoutubeInfoExtractor(
+        extractor_args, FakeYoutubeDL(youtube), FakeYoutubeDL(youtube, {"playlistend": 1})
+    )
+    return yie.construct_url_info_dict(youtube.batch_urls(playlist_share=0, video_share=0))
+
+
+def video_info(video: dict, media: MediaServer, webm_only: bool) -> dict:
+    """a video's info as saved at extraction, with its files on the media server"""
+    video_id = video["id"]
+    formats = [
+        {
+            "format_id": format_id,
+            "url": media.url(video_id, ext),
+            "ext": ext,
+            "acodec": acodec,
+            "vcodec": "none",
+            "abr": 128,
+            "filesize": len(media.files[ext]),
+            "protocol": "http",
+        }
+        for format_id, ext, acodec in [("140", "m4a", "mp4a.40.2"), ("251", "webm", "opus")]
+        if not (webm_only and ext == "m4a")
+    ]
+    return {
+        **video,
+        "extractor": "generic",
+        "extractor_key": "Generic",
+        "formats": formats,
+        "thumbnails": [{"id": "0", "url": media.url(video_id, "jpg"), "width": 1280, "height": 720}],
+    }
+
+
+def metric_totals() -> Counter[str]:
+    return Counter({
+        "bytes": sum(DOWNLOADED_BYTES.values.values()),
+        "transfer_seconds": sum(DOWNLOAD_SECONDS.sums.values()),
+        "retries": sum(RETRIES.values.values()),
+        "failures": sum(FAILURES.values.values()),
+    })
+
+
+def postprocessor_seconds() -> Counter[str]:
+    return Counter({
+        dict(label_key)["postprocessor"]: seconds
+        for label_key, seconds in POSTPROCESSOR_SECONDS.sums.items()
+    })
+
+
+def bench_format(
+    output_format: str, args: ArgsNamespace, infos: list[dict], archive: dict, tmp_dir: Path
+) -> dict:
+    output_dir = Path(tmp_dir, output_format)
+    info_cache = InfoCache(Path(output_dir, "_info"))
+    for info in infos:
+        info_cache.save(info)
+    argv = ["-o", str(output_dir), "-f", output_format, "--reuse-info"]
+    if args.ffmpeg_location is not None:
+        argv += ["--ffmpeg-location", str(args.ffmpeg_location)]
+    if args.staging:
+        argv += ["--staging-dir", str(Path(tmp_dir, f"{output_format}_staging"))]
+    downloader_args = process_args(argv, interactive=False)
+
+    totals, postprocessors = metric_totals(), postprocessor_seconds()
+    start = time.perf_counter()
+    downloader = Downloader(downloader_args, archive)
+    downloader.download_all()
+    result = metric_totals() - totals
+    result["seconds"] = time.perf_counter() - start
+    result["files"] = sum(len(paths) for paths in downloader.new_videos.values())
+    result["postprocessors"] = postprocessor_seconds() - postprocessors
+    return result
+
+
+def main():
+    args = get_args()
+    # the downloader has leftover breakpoint()s (one after every mp3 download) which
+    #  would otherwise stop the run
+    os.environ["PYTHONBREAKPOINT"] = "0"
+    logging.disable(logging.INFO)
+    ffmpeg = find_ffmpeg(args.ffmpeg_location)
+    ffmpeg_timer = WallTimer(FFmpegPostProcessor, "real_run_ffmpeg")
+    tag_timer = WallTimer(yt_dlq.download, "set_tag_text_mp4")
+
+    youtube = FakeYoutube(args.videos, args.seed)
+    results = {}
+    with TemporaryDirectory() as tmp_dir:
+        files = generate_files(ffmpeg, Path(tmp_dir), args.duration)
+        archive = make_archive(youtube, Path(tmp_dir))
+        rng = random.Random(args.seed)
+        with MediaServer(files, args.bandwidth * 1024, args.fail_rate, args.seed) as media:
+            infos = [
+                video_info(youtube.videos[video["id"]], media, rng.random() < args.webm_share)
+                for video in iter_videos(archive)
+                if video["id"] in youtube.videos
+            ]
+            print(
+                f"{len(infos)} videos to download ({len({info['id'] for info in infos})} distinct),"
+                f" {len(files['m4a']) / MIB:.2f} MiB m4a, {len(files['webm']) / MIB:.2f} MiB webm"
+            )
+            for output_format in args.formats:
+                ffmpeg_timer.reset()
+                tag_timer.reset()
+                results[output_format] = bench_format(output_format, args, infos, archive, Path(tmp_dir))
+                results[output_format]["ffmpeg"], results[output_format]["ffmpeg_runs"] = ffmpeg_timer.reset()
+                results[output_format]["tags"], _ = tag_timer.reset()
+            injected = {failure: count for failure, count in media.stats.items() if failure != "bytes"}
+
+    print()
+    print(
+        f"{'format':>7}{'files':>7}{'seconds':>9}{'files/s':>9}{'MB/s':>8}{'xfer MB/s':>11}"
+        f"{'ffmpeg s':>10}{'runs':>6}{'tags s':>8}{'retries':>9}{'failed':>8}"
+    )
+    for output_format, result in results.items():
+        transfer_rate = result["bytes"] / result["transfer_seconds"] / 1e6 if result["transfer_seconds"] else 0
+        print(
+            f"{output_format:>7}{result['files']:>7}{result['seconds']:>9.2f}"
+            f"{result['files'] / result['seconds']:>9.2f}{result['bytes'] / result['seconds'] / 1e6:>8.2f}"
+            f"{transfer_rate:>11.2f}{result['ffmpeg']:>10.2f}{result['ffmpeg_runs']:>6}"
+            f"{result['tags']:>8.2f}{result['retries']:>9.0f}{result['failures']:>8.0f}"
+        )
+    print()
+    print("post-processor seconds:")
+    for output_format, result in results.items():
+        print(
+            f"{output_format:>7}  "
+            + ", ".join(f"{name} {seconds:.2f}" for name, seconds in sorted(result["postprocessors"].items()))
+        )
+    if injected:
+        print(f"\ninjected failures: {injected}")
+
+
+if __name__ == "__main__":
+    main()
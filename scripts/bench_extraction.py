@@ -0,0 +1,186 @@
+"""
+Benchmark YoutubeInfoExtractor offline, on channels generated by scripts/fake_youtube.py
+at increasing sizes: construct_url_info_dict (with an SQLite store attached, and with its
+saves and fill_metadata timed apart), saving and loading whole archives, and merging
+several JSON archives (open_json_files). Each stage is reported per video, and the script
+fails if a stage's time per video grows by more than --max-growth from the smallest size
+to the largest, which is how a quadratic path shows itself
+"""
+
+import argparse
+import logging
+import time
+from collections import Counter
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from fake_youtube import FakeYoutube, FakeYoutubeDL
+
+from yt_dlq.args import process_args
+from yt_dlq.filters import count_videos
+from yt_dlq.records import open_json_files
+from yt_dlq.store import JsonStore, SqliteStore
+from yt_dlq.url.info_extractor import YoutubeInfoExtractor
+from yt_dlq.utils import dump_sorted_json
+
+STAGES = ["extract", "persist", "fill_metadata", "json_save", "json_load", "sqlite_load", "merge"]
+
+
+class ArgsNamespace(argparse.Namespace):
+    sizes: list[int]
+    seed: int
+    archives: int
+    max_growth: float
+
+
+def comma_separated_ints(input_: str) -> list[int]:
+    return sorted(int(size) for size in input_.split(","))
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes",
+        type=comma_separated_ints,
+        default=[1_000, 10_000, 100_000],
+        help="comma-separated numbers of videos (default: 1000,10000,100000)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--archives", type=int, default=4, help="JSON archives to split each archive into for merging"
+    )
+    parser.add_argument(
+        "--max-growth",
+        type=float,
+        default=3.0,
+        help="most a stage's time per video may grow by from the smallest size to the largest",
+    )
+    return parser.parse_args(namespace=ArgsNamespace())
+
+
+class TimedExtractor(YoutubeInfoExtractor):
+    """times the store's saves and fill_metadata apart from the rest of extraction"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.seconds: Counter[str] = Counter()
+
+    def persist_url_info_dict(self, ch_id=None, pl_id=None, video_id=None):
+        start = time.perf_counter()
+        super().persist_url_info_dict(ch_id, pl_id, video_id)
+        self.seconds["persist"] += time.perf_counter() - start
+
+    def persist_playlists(self, playlist_keys):
+        start = time.perf_counter()
+        super().persist_playlists(playlist_keys)
+        self.seconds["persist"] += time.perf_counter() - start
+
+    def fill_metadata(self):
+        start = time.perf_counter()
+        persist_seconds = self.seconds["persist"]
+        super().fill_metadata()
+        # its single save is counted as persistence
+        self.seconds["fill_metadata"] += (
+            time.perf_counter() - start - (self.seconds["persist"] - persist_seconds)
+        )
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def split_archive(url_info_dict: dict, parts: int) -> list[dict]:
+    """
+    url_info_dict as `parts` archives (as if collected over several runs), each with some
+     of every channel's playlists, and the first playlist of each channel in all of them
+    """
+    archives = [{} for _ in range(parts)]
+    for channel_id, channel in url_info_dict.items():
+        for index, (playlist_id, playlist) in enumerate(channel["entries"].items()):
+            for part in range(parts) if index == 0 else [index % parts]:
+                archive_channel = archives[part].setdefault(channel_id, {**channel, "entries": {}})
+                archive_channel["entries"][playlist_id] = playlist
+    return archives
+
+
+def bench_size(videos: int, args: ArgsNamespace, tmp_dir: Path) -> dict[str, float]:
+    youtube = FakeYoutube(videos, args.seed)
+    urls = youtube.batch_urls()
+    ydl = FakeYoutubeDL(youtube)
+    channel_info_ydl = FakeYoutubeDL(youtube, {"playlistend": 1})
+    extractor_args = process_args(["-o", str(tmp_dir)], interactive=False)
+    seconds = {}
+
+    yie = TimedExtractor(extractor_args, ydl, channel_info_ydl)
+    sqlite_path = Path(tmp_dir, f"{videos}.sqlite")
+    yie.store = SqliteStore(sqlite_path)
+    construct_seconds, url_info_dict = timed(lambda: yie.construct_url_info_dict(urls))
+    yie.store.close()
+    seconds["persist"] = yie.seconds["persist"]
+    seconds["fill_metadata"] = yie.seconds["fill_metadata"]
+    seconds["extract"] = construct_seconds - seconds["persist"] - seconds["fill_metadata"]
+    requests = sum(ydl.requests.values()) + sum(channel_info_ydl.requests.values())
+    print(
+        f"{videos} videos: {len(urls)} URLs, {len(youtube.channels)} channels,"
+        f" {len(youtube.playlists)} playlists; {count_videos(url_info_dict)} videos archived"
+        f" with {requests} requests ({dict(ydl.requests + channel_info_ydl.requests)})"
+    )
+
+    json_path = Path(tmp_dir, f"{videos}.json")
+    seconds["json_save"], _ = timed(lambda: JsonStore(json_path).save(url_info_dict))
+    seconds["json_load"], loaded = timed(lambda: JsonStore(json_path).load())
+    if loaded != url_info_dict:
+        raise SystemExit("JSON archive changed on reloading")
+    sqlite_store = SqliteStore(sqlite_path)
+    seconds["sqlite_load"], loaded = timed(sqlite_store.load)
+    sqlite_store.close()
+    if count_videos(loaded) != count_videos(url_info_dict):
+        raise SystemExit("SQLite archive lost videos")
+
+    archive_paths = []
+    for part, archive in enumerate(split_archive(url_info_dict, args.archives)):
+        archive_path = Path(tmp_dir, f"{videos}_{part}.json")
+        dump_sorted_json(archive, archive_path)
+        archive_paths.append(archive_path)
+    seconds["merge"], merged_videos = timed(
+        lambda: sum(channel.video_count() for channel in open_json_files(archive_paths).values())
+    )
+    if merged_videos != count_videos(url_info_dict):
+        raise SystemExit(f"merging archives gave {merged_videos} videos")
+    return seconds
+
+
+def main():
+    args = get_args()
+    # the fake's private videos and playlists mixing several releases' tracks are logged
+    #  as errors and warnings on every run
+    logging.disable(logging.ERROR)
+    results = {}
+    with TemporaryDirectory() as tmp_dir:
+        for videos in args.sizes:
+            results[videos] = bench_size(videos, args, Path(tmp_dir))
+
+    print()
+    print(f"{'us/video':>14}" + "".join(f"{videos:>10}" for videos in results) + f"{'growth':>9}")
+    smallest, largest = min(results), max(results)
+    too_slow = []
+    for stage in STAGES:
+        per_video = {videos: results[videos][stage] / videos * 1e6 for videos in results}
+        growth = per_video[largest] / per_video[smallest] if per_video[smallest] else 0
+        print(
+            f"{stage:>14}" + "".join(f"{per_video[videos]:>10.1f}" for videos in results)
+            + f"{growth:>8.1f}x"
+        )
+        if growth > args.max_growth:
+            too_slow.append(f"{stage} ({growth:.1f}x)")
+    if too_slow:
+        raise SystemExit(
+            f"time per video grew by more than {args.max_growth}x from {smallest} to"
+            f" {largest} videos: {', '.join(too_slow)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark yt_dlq.filters (split_archive with a compiled expression) against the previous
+scripts/filter.py approach on a synthetic archive, checking both keep and remove the same
+videos
+"""
+
+import argparse
+import random
+import time
+from copy import deepcopy
+
+from yt_dlq.filters import compile_filter, count_videos, split_archive
+
+
+class ArgsNamespace(argparse.Namespace):
+    videos: int
+    seed: int
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=100_000, help="videos in the archive")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(namespace=ArgsNamespace())
+
+
+TITLE_INCLUDES = ["live", "session", "acoustic"]
+TITLE_EXCLUDES = ["remix", "teaser"]
+DESCRIPTION_EXCLUDES = ["sped up"]
+DURATION_LESS_THAN = 240
+EXPRESSION = (
+    'not (title:remix or title:teaser or description:"sped up")'
+    " and (title:live or title:session or title:acoustic or duration<=240)"
+)
+
+WORDS = (
+    "night drive summer blue static echo glass river light dream fire city ghost"
+    " signal waves gold north velvet paper machine heart live session acoustic remix"
+    " teaser official audio video"
+).split()
+
+
+def words(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def make_archive(videos: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    archive = {}
+    made = 0
+    while made < videos:
+        channel_id = f"UC{len(archive):022d}"
+        channel = archive[channel_id] = {"title": words(rng, 1, 3), "entries": {}}
+        for _ in range(rng.randint(1, 20)):
+            playlist_id = f"PL{made:032d}"
+            playlist = channel["entries"][playlist_id] = {"title": words(rng, 1, 4), "entries": {}}
+            for _ in range(min(rng.randint(1, 60), videos - made)):
+                video_id = f"{made:011d}"
+                playlist["entries"][video_id] = {
+                    "id": video_id,
+                    "title": words(rng, 2, 8).title(),
+                    "description": words(rng, 20, 200) + (" sped up" if rng.random() < 0.05 else ""),
+                    "duration": rng.randint(30, 1200),
+                    "upload_date": f"{rng.randint(2008, 2024)}-{rng.randint(1, 12):02d}-01",
+                    "availability": "public",
+                }
+                made += 1
+    return archive
+
+
+def reference_split(urls_dict_input: dict) -> tuple[dict, dict]:
+    """the filtering loop as it was in scripts/filter.py (with its printing left out)"""
+    urls_dict_keep = deepcopy(urls_dict_input)
+    urls_dict_remove = deepcopy(urls_dict_input)
+    for channel_id, channel_dict in urls_dict_input.items():
+        for playlist_id, playlist_dict in channel_dict["entries"].items():
+            video_ids = set()
+            included = set()
+            excluded = set()
+            for video_id, video_dict in playlist_dict["entries"].items():
+                video_ids.add(video_id)
+                video_title = video_dict["title"].lower()
+                video_description = video_dict["description"].lower()
+                if any(include in video_title for include in TITLE_INCLUDES):
+                    included.add(video_id)
+                if any(exclude in video_title for exclude in TITLE_EXCLUDES):
+                    excluded.add(video_id)
+                if any(exclude in video_description for exclude in DESCRIPTION_EXCLUDES):
+                    excluded.add(video_id)
+                if video_dict["duration"] <= DURATION_LESS_THAN:
+                    included.add(video_id)
+            video_ids_to_keep = (video_ids - excluded) & included
+            for video_id in video_ids_to_keep:
+                del urls_dict_remove[channel_id]["entries"][playlist_id]["entries"][video_id]
+            for video_id in video_ids - video_ids_to_keep:
+                del urls_dict_keep[channel_id]["entries"][playlist_id]["entries"][video_id]
+    for urls_dict in (urls_dict_keep, urls_dict_remove):
+        for channel_id, channel_dict in list(urls_dict.items()):
+            for playlist_id, playlist_dict in list(channel_dict["entries"].items()):
+                if not playlist_dict["entries"]:
+                    del channel_dict["entries"][playlist_id]
+            if not channel_dict["entries"]:
+                del urls_dict[channel_id]
+    return urls_dict_keep, urls_dict_remove
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    args = get_args()
+    archive = make_archive(args.videos, args.seed)
+    print(f"{count_videos(archive)} videos in {len(archive)} channels")
+    print(f"filter: {EXPRESSION}")
+
+    reference_seconds, expected = timed(lambda: reference_split(archive))
+    compile_seconds, video_filter = timed(lambda: compile_filter(EXPRESSION))
+    split_seconds, actual = timed(lambda: split_archive(archive, video_filter))
+
+    print(f"  reference: {reference_seconds:7.3f}s")
+    print(
+        f"    filters: {split_seconds:7.3f}s  ({compile_seconds * 1000:.2f}ms to compile)"
+        f"  x{reference_seconds / split_seconds:5.1f}"
+    )
+    print(f"kept {count_videos(actual[0])}, removed {count_videos(actual[1])}")
+    if actual != expected:
+        raise SystemExit("Results differ from the previous filter")
+
+
+if __name__ == "__main__":
+    main()
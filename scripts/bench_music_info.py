@@ -0,0 +1,186 @@
+"""
+Benchmark yt_dlq.music_info against the previous per-call regex search on a synthetic
+corpus of auto-generated and ordinary video descriptions, checking that both give the
+same result for every description
+"""
+
+import argparse
+import random
+import re
+import time
+
+from yt_dlq import music_info
+from yt_dlq.music_info import parse_music_info, parse_music_info_batch
+
+
+class ArgsNamespace(argparse.Namespace):
+    descriptions: int
+    repeats: float
+    seed: int
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--descriptions", type=int, default=5_000, help="distinct descriptions in the corpus"
+    )
+    parser.add_argument(
+        "--repeats",
+        type=float,
+        default=2,
+        help="average number of times each description is parsed, as when a video is in several playlists",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(namespace=ArgsNamespace())
+
+
+def reference_music_info(description: str | None, hyphenate_date=True) -> dict:
+    """the parser as it was in YoutubeInfoExtractor.music_info_from_description"""
+    if description is None:
+        return {}
+    mobj = re.search(
+        r"""(?xs)
+            (?=(?P<track>[^\n·]+))(?P=track)·
+            (?=(?P<artist>[^\n]+))(?P=artist)\n+
+            (?=(?P<album>[^\n]+))(?P=album)\n
+            (?:.+?℗\s*(?P<release_year>\d{4})(?!\d))?
+            (?:.+?Released\ on\s*:\s*(?P<release_date>\d{4}-\d{2}-\d{2}))?
+            (.+?\nArtist\s*:\s*
+                (?=(?P<clean_artist>[^\n]+))(?P=clean_artist)\n
+            )?.+\nAuto-generated\ by\ YouTube\.\s*$
+        """,
+        description,
+    )
+    if not mobj:
+        return {}
+    release_year = mobj.group("release_year")
+    release_date = mobj.group("release_date")
+    if release_date:
+        if not hyphenate_date:
+            release_date = release_date.replace("-", "")
+        if not release_year:
+            release_year = release_date[:4]
+    return {
+        "album": mobj.group("album"),
+        "artists": (
+            clean_artist
+            if (clean_artist := mobj.group("clean_artist"))
+            else [a.strip() for a in mobj.group("artist").split("·")]
+        ),
+        "track": mobj.group("track").strip(),
+        "release_date": release_date,
+        "release_year": int(release_year) if release_year else None,
+    }
+
+
+WORDS = (
+    "night drive summer blue static echo glass river light dream fire city ghost"
+    " signal waves gold north velvet paper machine heart"
+).split()
+
+
+def words(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).title()
+
+
+def auto_generated_description(rng: random.Random) -> str:
+    artists = [words(rng, 1, 3) for _ in range(rng.randint(1, 3))]
+    lines = [
+        f"Provided to YouTube by {words(rng, 1, 3)} Records",
+        "",
+        f"{words(rng, 1, 5)} · {' · '.join(artists)}",
+        "",
+        words(rng, 1, 4),
+        "",
+    ]
+    if rng.random() < 0.9:
+        lines += [f"℗ {rng.randint(1960, 2024)} {words(rng, 1, 3)}", ""]
+    if rng.random() < 0.7:
+        lines += [
+            f"Released on: {rng.randint(1960, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "",
+        ]
+    credits = [f"Artist: {artists[0]}"] if rng.random() < 0.5 else []
+    credits += [
+        f"{rng.choice(('Composer', 'Lyricist', 'Producer', 'Mixer'))}: {words(rng, 2, 3)}"
+        for _ in range(rng.randint(0, 8))
+    ]
+    if credits:
+        lines += credits + [""]
+    lines.append("Auto-generated by YouTube.")
+    return "\n".join(lines)
+
+
+def ordinary_description(rng: random.Random) -> str:
+    paragraphs = [words(rng, 10, 60) + "." for _ in range(rng.randint(1, 6))]
+    if rng.random() < 0.5:
+        paragraphs.append(
+            "\n".join(f"{words(rng, 1, 2)}: https://example.com/{rng.randint(0, 9999)}" for _ in range(5))
+        )
+    if rng.random() < 0.3:
+        # tracklists with middots, which the full pattern has to scan before failing
+        paragraphs.append(
+            "\n".join(f"{i:02d}. {words(rng, 1, 4)} · {words(rng, 1, 2)}" for i in range(1, 13))
+        )
+    if rng.random() < 0.05:
+        paragraphs.append("Auto-generated by YouTube.")
+    return "\n\n".join(paragraphs)
+
+
+def make_corpus(count: int, repeats: float, seed: int) -> list[str | None]:
+    rng = random.Random(seed)
+    distinct = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.6:
+            distinct.append(auto_generated_description(rng))
+        elif roll < 0.98:
+            distinct.append(ordinary_description(rng))
+        else:
+            distinct.append(None)
+    corpus = distinct + rng.choices(distinct, k=int(count * (repeats - 1)))
+    rng.shuffle(corpus)
+    return corpus
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    args = get_args()
+    corpus = make_corpus(args.descriptions, args.repeats, args.seed)
+    print(f"{len(corpus)} descriptions ({args.descriptions} distinct)")
+
+    reference_seconds, expected = timed(lambda: [reference_music_info(d) for d in corpus])
+    music_info._parse.cache_clear()
+    cold_seconds, actual = timed(lambda: [parse_music_info(d) for d in corpus])
+    warm_seconds, warm = timed(lambda: [parse_music_info(d) for d in corpus])
+    music_info._parse.cache_clear()
+    batch_seconds, batch = timed(lambda: parse_music_info_batch(corpus))
+
+    mismatches = [
+        d
+        for d, want, got, got_warm, got_batch in zip(corpus, expected, actual, warm, batch)
+        if not (want == got == got_warm == got_batch)
+    ]
+    parsed = sum(1 for info in expected if info)
+    for label, seconds in (
+        ("reference", reference_seconds),
+        ("parse_music_info", cold_seconds),
+        ("parse_music_info (cached)", warm_seconds),
+        ("parse_music_info_batch", batch_seconds),
+    ):
+        print(
+            f"{label:>26}: {seconds:7.3f}s  {len(corpus) / seconds:>10,.0f}/s"
+            f"  x{reference_seconds / seconds:5.1f}"
+        )
+    print(f"{parsed} auto-generated, {len(mismatches)} mismatches")
+    if mismatches:
+        raise SystemExit(f"First mismatch:\n{mismatches[0]!r}")
+
+
+if __name__ == "__main__":
+    main()
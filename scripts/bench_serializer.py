@@ -0,0 +1,117 @@
+"""
+Benchmark writing an archive in canonical order (yt_dlq.utils.dump_sorted_json) on
+synthetic archives of increasing size, to check that it scales linearly
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from yt_dlq.utils import dump_sorted_json
+
+
+class ArgsNamespace(argparse.Namespace):
+    videos: int
+    steps: int
+    repeat: int
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--videos", type=int, default=50_000, help="videos in the largest archive"
+    )
+    parser.add_argument(
+        "--steps", type=int, default=4, help="number of sizes, each double the last"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="best of this many runs")
+    return parser.parse_args(namespace=ArgsNamespace())
+
+
+def make_archive(video_count: int, videos_per_playlist=25, playlists_per_channel=8, seed=0):
+    rng = random.Random(seed)
+    archive = {}
+    video_index = 0
+    while video_index < video_count:
+        channel_id = f"UC{len(archive):022d}"
+        channel = {
+            "id": channel_id,
+            "type": "channel",
+            "title": f"Channel {len(archive)}",
+            "url": f"https://www.youtube.com/channel/{channel_id}",
+            "entries": {},
+        }
+        archive[channel_id] = channel
+        for playlist_index in range(playlists_per_channel):
+            playlist_id = f"PL{channel_id}{playlist_index}"
+            playlist = {
+                "id": playlist_id,
+                "type": "release",
+                "title": f"Album {playlist_index}",
+                "url": f"https://www.youtube.com/playlist?list={playlist_id}",
+                "music_info": {"album": f"Album {playlist_index}", "release_year": "2020"},
+                "entries": {},
+                "description": None,
+            }
+            channel["entries"][playlist_id] = playlist
+            # stored out of order, as entries are when a playlist is extended
+            indices = list(range(1, videos_per_playlist + 1))
+            rng.shuffle(indices)
+            for index in indices:
+                video_id = f"{video_index:011d}"
+                playlist["entries"][video_id] = {
+                    "id": video_id,
+                    "type": "video",
+                    "title": f"Track {index}",
+                    "url": f"https://www.youtube.com/watch?v={video_id}",
+                    "upload_date": "2020-01-01",
+                    "uploader": f"https://www.youtube.com/channel/{channel_id}",
+                    "index": index,
+                    "music_info": {"album": f"Album {playlist_index}", "release_year": "2020"},
+                    "description": "Provided to YouTube by Label\n\n" + "x" * rng.randint(100, 600),
+                    "duration": rng.randint(60, 600),
+                    "availability": "public",
+                }
+                video_index += 1
+                if video_index >= video_count:
+                    return archive
+    return archive
+
+
+def best_of(repeat: int, func) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    args = get_args()
+    sizes = [args.videos // 2**i for i in reversed(range(args.steps))]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir, "archive.json")
+        print(f"{'videos':>8}  {'sorted s':>9}  {'us/video':>9}  {'json.dump s':>11}")
+        for size in sizes:
+            archive = make_archive(size)
+            sorted_seconds = best_of(args.repeat, lambda: dump_sorted_json(archive, path))
+            reloaded = json.loads(path.read_text(encoding="utf-8"))
+            assert reloaded == archive, "round trip changed the archive"
+
+            def plain_dump():
+                with open(path, "w", encoding="utf-8") as file:
+                    json.dump(archive, file, indent=4, ensure_ascii=False)
+
+            dump_seconds = best_of(args.repeat, plain_dump)
+            print(
+                f"{size:>8}  {sorted_seconds:>9.3f}  {sorted_seconds / size * 1e6:>9.1f}"
+                f"  {dump_seconds:>11.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark URL classification (yt_dlq.url.utils.parse_url and categorise_urls) on a
+batch of mixed channel, playlist and video URLs with duplicates, checking the results
+against the previous one-pattern-at-a-time classifier
+"""
+
+import argparse
+import random
+import re
+import time
+
+from yt_dlq.url.utils import (
+    PATTERN_YOUTUBE,
+    URL_CATEGORY_PATTERNS,
+    categorise_urls,
+    parse_url,
+)
+
+
+class ArgsNamespace(argparse.Namespace):
+    urls: int
+    reference_urls: int
+    seed: int
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--urls", type=int, default=100_000, help="URLs in the batch")
+    parser.add_argument(
+        "--reference-urls",
+        type=int,
+        default=10_000,
+        help="URLs to run the previous categorise_urls on (it's quadratic)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(namespace=ArgsNamespace())
+
+
+def reference_parse_url(url: str) -> dict:
+    res = {"category": None, "id": None, "url": url}
+    for url_category, pattern in URL_CATEGORY_PATTERNS.items():
+        match = re.match(pattern, url)
+        if match:
+            res["category"] = url_category
+            res["id"] = match.group(2)
+            if url_category == "video":
+                res["url"] = f"https://www.youtube.com/watch?v={res['id']}"
+            else:
+                res["url"] = match.group(1)
+            break
+    if res["category"] is None:
+        if not re.match(PATTERN_YOUTUBE, url):
+            raise ValueError(f"Could not categorise URL '{url}' (not a valid URL?)")
+        raise ValueError(f"Could not categorise URL '{url}'")
+    return res
+
+
+def reference_categorise_urls(url_list: list[str]) -> dict:
+    url_dict_categorised = {"release": {}} | {k: {} for k in URL_CATEGORY_PATTERNS} | {None: {}}
+    unknown_urls = set()
+    known_urls = set()
+    for url in url_list:
+        if url in (known_urls | unknown_urls):
+            continue
+        url_parsed_info = reference_parse_url(url)
+        url_category = url_parsed_info["category"]
+        url_categorised = url_parsed_info["url"]
+        if url_category is not None:
+            known_urls.add(url)
+            known_urls.add(url_categorised)
+        else:
+            unknown_urls.add(url)
+        url_dict_categorised[url_category][url_categorised] = ""
+    del url_dict_categorised[None]
+    return url_dict_categorised
+
+
+ID_CHARS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_"
+
+
+def random_id(rng: random.Random, length: int) -> str:
+    return "".join(rng.choices(ID_CHARS, k=length))
+
+
+def random_url(rng: random.Random) -> str:
+    roll = rng.random()
+    if roll < 0.7:
+        video_id = random_id(rng, 11)
+        return rng.choice(
+            (
+                f"https://www.youtube.com/watch?v={video_id}",
+                f"https://music.youtube.com/watch?v={video_id}",
+                f"https://youtu.be/{video_id}",
+                f"https://www.youtube.com/watch?v={video_id}&list=PL{random_id(rng, 32)}",
+                f"https://youtube.com/watch?v={video_id}&t=42",
+            )
+        )
+    if roll < 0.9:
+        playlist_id = rng.choice(("PL", "OLAK5uy_")) + random_id(rng, 32)
+        host = rng.choice(("www.youtube.com", "music.youtube.com", "youtube.com"))
+        return f"https://{host}/playlist?list={playlist_id}"
+    channel = rng.choice(
+        (
+            f"https://www.youtube.com/channel/UC{random_id(rng, 22)}",
+            f"https://www.youtube.com/@{random_id(rng, 10)}",
+            f"https://www.youtube.com/c/{random_id(rng, 10)}",
+            f"https://www.youtube.com/user/{random_id(rng, 10)}",
+        )
+    )
+    return channel + rng.choice(("", "/", "/featured", "/videos", "/releases", "/playlists"))
+
+
+def make_batch(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    distinct = [random_url(rng) for _ in range(count * 4 // 5)]
+    batch = distinct + rng.choices(distinct, k=count - len(distinct))
+    rng.shuffle(batch)
+    return batch
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    args = get_args()
+    batch = make_batch(args.urls, args.seed)
+    print(f"{len(batch)} URLs ({len(set(batch))} distinct)")
+
+    reference_parse_seconds, expected = timed(lambda: [reference_parse_url(url) for url in batch])
+    parse_seconds, actual = timed(lambda: [parse_url(url) for url in batch])
+    parse_mismatches = sum(1 for want, got in zip(expected, actual) if want != got)
+
+    sample = batch[: args.reference_urls]
+    reference_categorise_seconds, expected_categorised = timed(
+        lambda: reference_categorise_urls(sample)
+    )
+    sample_seconds, sample_categorised = timed(lambda: categorise_urls(sample))
+    categorise_seconds, categorised = timed(lambda: categorise_urls(batch))
+
+    print(
+        f"parse_url: {parse_seconds:.3f}s ({len(batch) / parse_seconds:,.0f}/s),"
+        f" previously {reference_parse_seconds:.3f}s; {parse_mismatches} mismatches"
+    )
+    print(
+        f"categorise_urls, {len(sample)} URLs: {sample_seconds:.3f}s,"
+        f" previously {reference_categorise_seconds:.3f}s;"
+        f" {'same' if sample_categorised == expected_categorised else 'DIFFERENT'} result"
+    )
+    print(
+        f"categorise_urls, {len(batch)} URLs: {categorise_seconds:.3f}s"
+        f" ({len(batch) / categorise_seconds:,.0f}/s); "
+        + ", ".join(f"{category}: {len(urls)}" for category, urls in categorised.items())
+    )
+    if parse_mismatches or sample_categorised != expected_categorised:
+        raise SystemExit("Results differ from the previous classifier")
+
+
+if __name__ == "__main__":
+    main()
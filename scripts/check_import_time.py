@@ -0,0 +1,81 @@
+"""
+Check that importing yt-dlq's entry point stays fast: heavy dependencies must only be
+imported once the work that needs them starts, not when the CLI is loaded
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+ENTRY_POINT = "yt_dlq.__main__"
+HEAVY_MODULES = ("yt_dlp", "PIL", "mutagen", "ytmusicapi", "prettyprinter")
+
+
+class ArgsNamespace(argparse.Namespace):
+    budget_ms: float
+    runs: int
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=150,
+        help="fail if the median cumulative import time of the entry point exceeds this",
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    return parser.parse_args(namespace=ArgsNamespace())
+
+
+def measure_import() -> tuple[float, set[str]]:
+    """import the entry point in a fresh interpreter; return (ms, top-level modules imported)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {ENTRY_POINT}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total_us = None
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        if not cumulative_us.strip().isdigit():
+            continue  # header line
+        name = name.strip()
+        modules.add(name.split(".")[0])
+        if name == ENTRY_POINT:
+            total_us = int(cumulative_us)
+    if total_us is None:
+        raise RuntimeError(f"{ENTRY_POINT} was not found in the -X importtime output")
+    return total_us / 1000, modules
+
+
+def main():
+    args = get_args()
+    times = []
+    heavy_imported = set()
+    for _ in range(args.runs):
+        elapsed_ms, modules = measure_import()
+        times.append(elapsed_ms)
+        heavy_imported |= modules.intersection(HEAVY_MODULES)
+    median_ms = statistics.median(times)
+    print(
+        f"import {ENTRY_POINT}: median {median_ms:.1f} ms over {args.runs} runs "
+        f"(min {min(times):.1f}, max {max(times):.1f}; budget {args.budget_ms:.0f} ms)"
+    )
+    failed = False
+    if heavy_imported:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(sorted(heavy_imported))}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print("FAIL: import time is over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Convert an archive between the JSON and SQLite formats (see `--store`)
+"""
+
+import argparse
+from pathlib import Path
+
+from yt_dlq.store import STORE_SUFFIXES, JsonStore, SqliteStore, open_store
+
+
+class ArgsNamespace(argparse.Namespace):
+    input_file: Path
+    output_file: Path | None
+    check: bool
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input_file", type=Path)
+    parser.add_argument(
+        "output_file",
+        type=Path,
+        nargs="?",
+        help="defaults to the input file with its suffix swapped (.json <-> .sqlite)",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="read the output back and check that it matches the input",
+    )
+    return parser.parse_args(namespace=ArgsNamespace())
+
+
+def main():
+    args = get_args()
+    input_store = open_store(args.input_file)
+    output_file = args.output_file
+    if output_file is None:
+        output_format = "json" if isinstance(input_store, SqliteStore) else "sqlite"
+        output_file = args.input_file.with_suffix(STORE_SUFFIXES[output_format])
+    if output_file.exists():
+        raise FileExistsError(f"{output_file} already exists")
+
+    url_info_dict = input_store.load()
+    input_store.close()
+    output_store = open_store(output_file)
+    output_store.save(url_info_dict)
+    output_store.close()
+    print(f"Wrote {len(url_info_dict)} channels to {output_file}")
+
+    if args.check:
+        check_store = open_store(output_file)
+        converted = check_store.load()
+        check_store.close()
+        if converted != url_info_dict:
+            raise SystemExit("Converted archive differs from the input")
+        print("Converted archive matches the input")
+
+
+if __name__ == "__main__":
+    main()
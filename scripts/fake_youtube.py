@@ -0,0 +1,355 @@
+"""
+A deterministic, offline stand-in for YouTube, for benchmarking extraction without
+network access: FakeYoutube generates channels with releases tabs (albums and singles
+with YouTube Music's auto-generated descriptions), playlists tabs (playlists mixing
+releases' tracks and uploads, so videos recur across playlists, and now and then across
+channels) and videos tabs (uploads), and FakeYoutubeDL answers extract_info for their
+URLs the way YoutubeDL with extract_flat does, so it can be passed to
+YoutubeInfoExtractor as its `ydl` and `channel_info_ydl`
+
+    youtube = FakeYoutube(videos=10_000, seed=0)
+    ydl = FakeYoutubeDL(youtube)
+    yie = YoutubeInfoExtractor(args, ydl, FakeYoutubeDL(youtube, {"playlistend": 1}))
+    yie.construct_url_info_dict(youtube.batch_urls())
+"""
+
+import itertools
+import random
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from yt_dlp.utils import DownloadError
+
+from yt_dlq.url.utils import parse_url
+
+VIDEOS_PER_CHANNEL = 200
+WORDS = (
+    "night drive summer blue static echo glass river light dream fire city ghost signal"
+    " waves gold north velvet paper machine heart slow morning neon silver winter coast"
+    " satellite garden electric shadow ocean hollow wild golden empty parallel"
+).split()
+LABELS = ["Lakeside Records", "Northbound Music", "Paper Tiger", "Blue Static Recordings"]
+UPLOAD_KINDS = ["Official Video", "Live Session", "Acoustic", "Lyric Video", "Behind The Scenes"]
+# one in this many uploads was a livestream
+STREAM_EVERY = 53
+
+
+@dataclass
+class FakeChannel:
+    id: str
+    handle: str
+    title: str
+    description: str
+    release_ids: list[str] = field(default_factory=list)
+    playlist_ids: list[str] = field(default_factory=list)
+    upload_ids: list[str] = field(default_factory=list)
+
+    @property
+    def url(self) -> str:
+        return f"https://www.youtube.com/channel/{self.id}"
+
+
+@dataclass
+class FakePlaylist:
+    id: str
+    title: str
+    description: str | None
+    channel_id: str
+    video_ids: list[str]
+    release_type: str | None = None
+
+    @property
+    def url(self) -> str:
+        return f"https://www.youtube.com/playlist?list={self.id}"
+
+
+class FakeYoutube:
+    def __init__(self, videos: int, seed: int = 0):
+        self.rng = random.Random(seed)
+        self.channels: dict[str, FakeChannel] = {}
+        self.playlists: dict[str, FakePlaylist] = {}
+        self.videos: dict[str, dict] = {}
+        self.private_video_ids: set[str] = set()
+        self._video_ids: list[str] = []
+        self._ids = itertools.count()
+        while len(self.videos) < videos:
+            self._make_channel(min(VIDEOS_PER_CHANNEL, videos - len(self.videos)))
+
+    def _next_id(self, prefix: str, length: int) -> str:
+        return f"{prefix}{next(self._ids):0{length - len(prefix)}d}"
+
+    def _words(self, low: int, high: int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(low, high)))
+
+    def _make_channel(self, video_count: int):
+        rng = self.rng
+        title = self._words(1, 3).title()
+        channel = FakeChannel(
+            id=self._next_id("UC", 24),
+            handle="@" + title.replace(" ", "").lower() + str(len(self.channels)),
+            title=title,
+            description=f"The official YouTube channel of {title}.\n\n{self._words(20, 60)}",
+        )
+        self.channels[channel.id] = channel
+        released = date(2008, 1, 1) + timedelta(days=rng.randint(0, 5000))
+
+        # most of a channel's videos are releases' tracks, the rest are uploads
+        track_count = int(video_count * rng.uniform(0.5, 0.8)) if rng.random() < 0.8 else 0
+        tracks_left = track_count
+        tracks = []
+        while tracks_left > 0:
+            album = self._words(1, 4).title()
+            label = rng.choice(LABELS)
+            size = min(rng.randint(4, 14), tracks_left)
+            released += timedelta(days=rng.randint(30, 400))
+            album_tracks = [
+                self._make_video(channel, self._words(1, 4).title(), released, (album, label))
+                for _ in range(size)
+            ]
+            tracks += album_tracks
+            tracks_left -= size
+            channel.release_ids.append(
+                self._make_playlist(channel, album, album_tracks, "Album" if size > 1 else "Single")
+            )
+            # a single from the album, sharing its video
+            if size > 1 and rng.random() < 0.2:
+                channel.release_ids.append(
+                    self._make_playlist(channel, self.videos[album_tracks[0]]["title"], album_tracks[:1], "Single")
+                )
+        for _ in range(video_count - track_count):
+            released += timedelta(days=rng.randint(1, 60))
+            kind = rng.choice(UPLOAD_KINDS)
+            channel.upload_ids.append(
+                self._make_video(channel, f"{title} - {self._words(1, 4).title()} ({kind})", released)
+            )
+
+        # playlists drawn from the channel's own videos, and now and then another's
+        pool = tracks + channel.upload_ids
+        for _ in range(rng.randint(1, 5)):
+            video_ids = rng.sample(pool, min(len(pool), rng.randint(5, 50)))
+            if rng.random() < 0.3:
+                video_ids += [rng.choice(self._video_ids) for _ in range(3)]
+            # a playlist can list a video twice, but yt-dlp only yields it once
+            video_ids = list(dict.fromkeys(video_ids))
+            # half of them end with a video that's since been made private
+            if rng.random() < 0.5:
+                video_ids.append(self._make_private_video())
+            channel.playlist_ids.append(
+                self._make_playlist(channel, self._words(1, 3).title(), video_ids)
+            )
+
+    def _make_video(
+        self, channel: FakeChannel, title: str, released: date, release: tuple[str, str] | None = None
+    ) -> str:
+        rng = self.rng
+        video_id = self._next_id("v", 11)
+        if release is not None:
+            album, label = release
+            description = (
+                f"Provided to YouTube by {label}\n\n{title} · {channel.title}\n\n{album}\n\n"
+                f"℗ {released.year} {label}\n\nReleased on: {released.isoformat()}\n\n"
+                f"Artist: {channel.title}\n\nAuto-generated by YouTube."
+            )
+        else:
+            description = (
+                f"{title}\n\nStream/download: https://example.com/{video_id}\n\n"
+                f"{self._words(10, 150)}\n\nFollow {channel.title}:\n"
+                f"https://instagram.com/{channel.handle[1:]}\nhttps://x.com/{channel.handle[1:]}"
+            )
+        live_status = "was_live" if release is None and rng.randrange(STREAM_EVERY) == 0 else "not_live"
+        self.videos[video_id] = {
+            "id": video_id,
+            "title": title,
+            "fulltitle": title,
+            "description": description,
+            "duration": rng.randint(90, 420) if release is not None else rng.randint(30, 3600),
+            "upload_date": released.strftime("%Y%m%d"),
+            "uploader": channel.title,
+            "uploader_id": channel.handle,
+            "uploader_url": f"https://www.youtube.com/{channel.handle}",
+            "channel": channel.title,
+            "channel_id": channel.id,
+            "channel_url": channel.url,
+            "webpage_url": f"https://www.youtube.com/watch?v={video_id}",
+            "availability": "public",
+            "live_status": live_status,
+            "is_live": False,
+            "was_live": live_status == "was_live",
+            "view_count": rng.randint(0, 10_000_000),
+            "tags": self._words(0, 8).split(),
+        }
+        self._video_ids.append(video_id)
+        return video_id
+
+    def _make_private_video(self) -> str:
+        video_id = self._next_id("v", 11)
+        self.private_video_ids.add(video_id)
+        return video_id
+
+    def _make_playlist(
+        self, channel: FakeChannel, title: str, video_ids: list[str], release_type: str | None = None
+    ) -> str:
+        if release_type is not None:
+            playlist_id = self._next_id("OLAK5uy_", 41)
+            description = None
+        else:
+            playlist_id = self._next_id("PL", 34)
+            description = self._words(0, 30) or None
+        self.playlists[playlist_id] = FakePlaylist(
+            playlist_id, title, description, channel.id, video_ids, release_type
+        )
+        return playlist_id
+
+    def batch_urls(self, playlist_share=0.05, video_share=0.01) -> list[str]:
+        """
+        every channel, plus (as a batch file would have) a few playlists and videos those
+         channels already cover, some of them by their music.youtube.com URLs
+        """
+        rng = random.Random(len(self.videos))
+        urls = [channel.url for channel in self.channels.values()]
+        for playlist in rng.sample(list(self.playlists.values()), int(len(self.playlists) * playlist_share)):
+            urls.append(playlist.url.replace("www.", "music.") if rng.random() < 0.5 else playlist.url)
+        for video_id in rng.sample(list(self.videos), int(len(self.videos) * video_share)):
+            urls.append(self.videos[video_id]["webpage_url"])
+        return urls
+
+    def flat_entry(self, video_id: str) -> dict:
+        """a video as listed in a playlist or tab"""
+        if video_id in self.private_video_ids:
+            return {
+                "_type": "url",
+                "ie_key": "Youtube",
+                "id": video_id,
+                "url": f"https://www.youtube.com/watch?v={video_id}",
+                "title": "[Private video]",
+                "description": None,
+                "duration": None,
+                "channel_id": None,
+                "channel": None,
+                "channel_url": None,
+                "uploader": None,
+                "uploader_id": None,
+                "uploader_url": None,
+                "live_status": None,
+                "availability": "private",
+            }
+        video = self.videos[video_id]
+        return {
+            "_type": "url",
+            "ie_key": "Youtube",
+            "id": video_id,
+            "url": video["webpage_url"],
+            "title": video["title"],
+            "description": None,
+            "duration": video["duration"],
+            "channel_id": video["channel_id"],
+            "channel": video["channel"],
+            "channel_url": video["channel_url"],
+            "uploader": video["uploader"],
+            "uploader_id": video["uploader_id"],
+            "uploader_url": video["uploader_url"],
+            "view_count": video["view_count"],
+            "live_status": "was_live" if video["was_live"] else None,
+            "availability": None,
+        }
+
+
+class FakeYoutubeDL:
+    """
+    answers extract_info from a FakeYoutube; counts its requests by URL category in
+     `requests`. of YoutubeDL's params, only `playlistend` is used
+    """
+
+    def __init__(self, youtube: FakeYoutube, params: dict | None = None):
+        self.youtube = youtube
+        self.params = params or {}
+        self.requests: Counter[str] = Counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        pass
+
+    def _playlist(self, info: dict, video_ids: list[str], process: bool) -> dict:
+        if (playlistend := self.params.get("playlistend")) is not None:
+            video_ids = video_ids[:playlistend]
+        entries = map(self.youtube.flat_entry, video_ids)
+        info["playlist_count"] = len(video_ids)
+        # unprocessed, a playlist's entries are a generator, as yt-dlp pages through them
+        info["entries"] = list(entries) if process else entries
+        return info
+
+    def _channel_info(self, channel: FakeChannel, title: str, url: str) -> dict:
+        return {
+            "_type": "playlist",
+            "id": channel.id,
+            "title": title,
+            "description": channel.description,
+            "webpage_url": url,
+            "original_url": url,
+            "channel": channel.title,
+            "channel_id": channel.id,
+            "channel_url": channel.url,
+            "uploader": channel.title,
+            "uploader_id": channel.handle,
+            "uploader_url": f"https://www.youtube.com/{channel.handle}",
+        }
+
+    def extract_info(self, url: str, download=True, process=True) -> dict:
+        parsed = parse_url(url)
+        category = parsed["category"]
+        self.requests[category] += 1
+        youtube = self.youtube
+        if category == "video":
+            video_id = parsed["id"]
+            if video_id in youtube.private_video_ids:
+                raise DownloadError(
+                    f"ERROR: [youtube] {video_id}: Private video. Sign in if you've been"
+                    " granted access to this video"
+                )
+            if video_id not in youtube.videos:
+                raise DownloadError(f"ERROR: [youtube] {video_id}: Video unavailable")
+            return dict(youtube.videos[video_id])
+        if category in ("playlist", "release"):
+            playlist = youtube.playlists.get(parsed["id"])
+            if playlist is None:
+                raise DownloadError(f"ERROR: [youtube:tab] {parsed['id']}: The playlist does not exist.")
+            channel = youtube.channels[playlist.channel_id]
+            info = self._channel_info(channel, playlist.title, playlist.url)
+            info |= {
+                "id": playlist.id,
+                "description": playlist.description,
+                "music_info": (
+                    {"release_type": playlist.release_type, "artists": [channel.title]}
+                    if playlist.release_type is not None
+                    else {}
+                ),
+            }
+            return self._playlist(info, playlist.video_ids, process)
+        channel = youtube.channels.get(parsed["id"])
+        if channel is None:
+            raise DownloadError(f"ERROR: [youtube:tab] {url}: This channel does not exist.")
+        tab = category.removeprefix("channel").lstrip("_") or "videos"
+        info = self._channel_info(channel, f"{channel.title} - {tab.title()}", url)
+        if tab == "videos":
+            return self._playlist(info, channel.upload_ids, process)
+        playlist_ids = channel.release_ids if tab == "releases" else channel.playlist_ids
+        if not playlist_ids:
+            raise DownloadError(f"ERROR: [youtube:tab] {url}: This channel does not have a {tab} tab")
+        info["entries"] = [
+            {
+                "_type": "url",
+                "ie_key": "YoutubeTab",
+                "id": playlist_id,
+                "url": youtube.playlists[playlist_id].url,
+                "title": youtube.playlists[playlist_id].title,
+            }
+            for playlist_id in playlist_ids
+        ]
+        info["playlist_count"] = len(info["entries"])
+        return info
@@ -1,18 +1,29 @@
 """
-Filter a JSON url file based on strings to include/exclude
+Filter a JSON url file with a filter expression (see yt_dlq/filters.py), or strings to
+include/exclude
 """
 
 import argparse
 import json
-from copy import copy, deepcopy
 from pathlib import Path
 from typing import Optional
 
+from yt_dlq.filters import (
+    FilterError,
+    compile_filter,
+    count_videos,
+    iter_videos,
+    split_archive,
+)
+from yt_dlq.utils import dump_sorted_json
+
 
 class ArgsNamespace(argparse.Namespace):
     input_file: Path
     no_modify: bool = False
     output_suffix: str = "_filtered"
+    expression: Optional[str]
+    verbose: bool
     video_includes: list[str] = []
     video_excludes: list[str] = []
     description_includes: list[str] = []
@@ -49,6 +60,14 @@ def get_args():
         Otherwise, will create one new file with matching videos and change input file to only contain non-matching videos.
         """,
     )
+    parser.add_argument(
+        "-e",
+        "--expression",
+        help="Filter expression to keep videos by, e.g. 'title:live or duration>=20:00'; combined (with 'and') with any of the options below",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="Print the title of every video kept and removed"
+    )
 
     parser.add_argument("-vi", "--video-includes", type=comma_separated_str_to_list)
     parser.add_argument("-vx", "--video-excludes", type=comma_separated_str_to_list)
@@ -68,117 +87,65 @@ def get_args():
     return parser.parse_args(namespace=ArgsNamespace)
 
 
-def remove_empties(urls_dict):
-    empty_channel_ids = set()
-    for channel_id, channel_dict in urls_dict.items():
-        # channel_playlists = set(channel_dict["entries"].keys())
-        empty_playlist_ids = set()
-        for playlist_id, playlist_dict in channel_dict["entries"].items():
-            if not playlist_dict["entries"]:
-                empty_playlist_ids.add(playlist_id)
-        for empty_playlist_id in empty_playlist_ids:
-            del channel_dict["entries"][empty_playlist_id]
-        if not channel_dict["entries"]:
-            empty_channel_ids.add(channel_id)
-    for empty_channel_id in empty_channel_ids:
-        del urls_dict[empty_channel_id]
+def quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def options_to_expression(args: ArgsNamespace) -> str:
+    """
+    the include/exclude options as a filter expression: videos matching no exclude, and
+     (if any are given) at least one include or duration bound
+    """
+    excludes = [f"title:{quote(value)}" for value in args.video_excludes or []]
+    excludes += [f"description:{quote(value)}" for value in args.description_excludes or []]
+    includes = [f"title:{quote(value)}" for value in args.video_includes or []]
+    includes += [f"description:{quote(value)}" for value in args.description_includes or []]
+    if args.duration_greater_than:
+        includes.append(f"duration>={args.duration_greater_than}")
+    if args.duration_less_than:
+        includes.append(f"duration<={args.duration_less_than}")
+    terms = [f"({args.expression})"] if args.expression else []
+    if excludes:
+        terms.append(f"not ({' or '.join(excludes)})")
+    if includes:
+        terms.append(f"({' or '.join(includes)})")
+    return " and ".join(terms)
+
+
+def print_titles(heading: str, urls_dict: dict):
+    print(heading)
+    for video in iter_videos(urls_dict):
+        print(video["title"])
+    print()
 
 
 if __name__ == "__main__":
     args = get_args()
     input_filepath = args.input_file
 
+    expression = options_to_expression(args)
+    try:
+        video_filter = compile_filter(expression)
+    except FilterError as exc:
+        raise SystemExit(f"invalid filter {expression!r}: {exc}")
+    if video_filter is None:
+        raise SystemExit("nothing to filter by")
+    print(f"filter: {expression}")
+
     with open(input_filepath) as f:
         urls_dict_input: dict = json.load(f)
-    urls_dict_keep = deepcopy(urls_dict_input)
-    urls_dict_remove = deepcopy(urls_dict_input)
-    for channel_id, channel_dict in urls_dict_input.items():
-        for playlist_id, playlist_dict in channel_dict["entries"].items():
-            video_ids = set()
-            video_ids_with_included_title = set()
-            video_ids_with_excluded_title = set()
-            video_ids_with_included_description = set()
-            video_ids_with_excluded_description = set()
-            video_ids_with_duration_greater_than = set()
-            video_ids_with_duration_less_than = set()
-
-            for video_id, video_dict in playlist_dict["entries"].items():
-                video_ids.add(video_id)
-                video_title = video_dict["title"].lower()
-                video_description = video_dict["description"].lower()
-                video_duration = video_dict["duration"]
-                if any(include in video_title for include in args.video_includes):
-                    video_ids_with_included_title.add(video_id)
-                if any(exclude in video_title for exclude in args.video_excludes):
-                    video_ids_with_excluded_title.add(video_id)
-
-                if any(
-                    include in video_description
-                    for include in args.description_includes
-                ):
-                    video_ids_with_included_description.add(video_id)
-                if any(
-                    exclude in video_description
-                    for exclude in args.description_excludes
-                ):
-                    video_ids_with_excluded_description.add(video_id)
-
-                if (
-                    args.duration_greater_than
-                    and video_duration >= args.duration_greater_than
-                ):
-                    video_ids_with_duration_greater_than.add(video_id)
-
-                if (
-                    args.duration_less_than
-                    and video_duration <= args.duration_less_than
-                ):
-                    video_ids_with_duration_less_than.add(video_id)
-
-            video_ids_to_keep = set() | (
-                video_ids
-                - (video_ids_with_excluded_title | video_ids_with_excluded_description)
-            )
-
-            if (
-                args.video_includes
-                or args.description_includes
-                or args.duration_greater_than
-                or args.duration_less_than
-            ):
-                video_ids_to_keep &= (
-                    video_ids_with_included_title
-                    | video_ids_with_included_description
-                    | video_ids_with_duration_greater_than
-                    | video_ids_with_duration_less_than
-                )
-
-            video_ids_to_remove = video_ids - video_ids_to_keep
-
-            print("  KEEPING VIDEOS:")
-            for video_id in video_ids_to_keep:
-                video_title = playlist_dict["entries"][video_id]["title"]
-                print(video_title)
-                del urls_dict_remove[channel_id]["entries"][playlist_id]["entries"][
-                    video_id
-                ]
-            remove_empties(urls_dict_remove)
-            print()
-
-            print(" REMOVING VIDEOS:")
-            for video_id in video_ids_to_remove:
-                video_title = playlist_dict["entries"][video_id]["title"]
-                print(video_title)
-                del urls_dict_keep[channel_id]["entries"][playlist_id]["entries"][
-                    video_id
-                ]
-            remove_empties(urls_dict_keep)
-            print()
+    urls_dict_keep, urls_dict_remove = split_archive(urls_dict_input, video_filter)
+    print(
+        f"keeping {count_videos(urls_dict_keep)} and removing"
+        f" {count_videos(urls_dict_remove)} of {count_videos(urls_dict_input)} videos"
+    )
+    if args.verbose:
+        print_titles("  KEEPING VIDEOS:", urls_dict_keep)
+        print_titles(" REMOVING VIDEOS:", urls_dict_remove)
 
     if urls_dict_keep:
         output_file_kept = add_stem_suffix(input_filepath, args.output_suffix)
-        with open(output_file_kept, "w+") as f:
-            json.dump(urls_dict_keep, f, indent=4)
+        dump_sorted_json(urls_dict_keep, output_file_kept)
         print(f"wrote kept urls to {output_file_kept}")
     else:
         print("no urls to keep")
@@ -191,8 +158,7 @@ if __name__ == "__main__":
         output_file_removed = input_filepath
 
     if urls_dict_remove:
-        with open(output_file_removed, "w+") as f:
-            json.dump(urls_dict_remove, f, indent=4)
+        dump_sorted_json(urls_dict_remove, output_file_removed)
         print(f"wrote removed urls to {output_file_removed}")
     else:
         if args.no_modify:
@@ -1,26 +1,83 @@
-from utils_python import get_logger_with_class, setup_config_logging
+import atexit
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from utils_python import get_logger_with_class
 from yt_dlq.args import process_args
-from yt_dlq.download import Downloader
-from yt_dlq.file import merge_json_files, resolve_json_files
-from yt_dlq.url.info_extractor import get_all_urls_dict
+from yt_dlq.file import resolve_json_files
+from yt_dlq.logs import setup_logging
+from yt_dlq.metrics import MetricsExporter
+from yt_dlq.profiling import PROFILER
+from yt_dlq.records import open_json_files
+from yt_dlq.store import SqliteStore
 from yt_dlq.utils import YtdlqLogger
 
 LOGGER = get_logger_with_class(__name__, YtdlqLogger)
 
 
 def main():
+    if sys.argv[1:2] in (["serve"], ["submit"]):
+        from yt_dlq.server import main as server_main
+
+        server_main(sys.argv[1], sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["subscriptions"]:
+        from yt_dlq.subscriptions import main as subscriptions_main
+
+        subscriptions_main(sys.argv[2:])
+        return
     args = process_args()
-    setup_config_logging(args.logging_config_path)
+    setup_logging(args)
     LOGGER.info("yt-dlq starting with args: %s", dict(args._get_kwargs()))
+    if args.metrics_textfile or args.metrics_port or args.metrics_summary:
+        metrics_exporter = MetricsExporter(
+            textfile=args.metrics_textfile,
+            port=args.metrics_port,
+            summary_path=args.metrics_summary,
+        ).start()
+        atexit.register(metrics_exporter.stop)
+    if args.profile:
+        PROFILER.start(
+            args.profile_dir
+            or Path(
+                args.output_dir,
+                "_profile",
+                datetime.now().replace(microsecond=0).isoformat().replace(":", "-"),
+            )
+        )
+    run(args)
 
+
+def run(args, extract_ydl=None, download_ydl=None, videos_in_output_dirs=None):
+    """
+    retrieve and download what args asks for; `yt-dlq serve` passes in the YoutubeDLs
+     and library index it keeps between runs. returns the Downloader, if there was one
+    """
     if args.json_file:
         json_files = resolve_json_files(args.json_file)
-        url_info_dict = merge_json_files(json_files)
+        # streamed channel by channel while downloading, rather than loaded up front
+        url_info_dict = open_json_files(json_files)
     else:
-        url_info_dict = get_all_urls_dict(args)
-    if not args.data_only:
-        downloader = Downloader(args, url_info_dict)
-        downloader.download_all()
+        # imported here so that --help and argument errors don't pay for yt_dlp
+        from yt_dlq.url.info_extractor import get_all_urls_dict
+
+        url_info_dict = get_all_urls_dict(
+            args, ydl=extract_ydl, hint_at_exit=extract_ydl is None
+        )
+    try:
+        if not (args.data_only or args.plan_only):
+            from yt_dlq.download import Downloader
+
+            downloader = Downloader(args, url_info_dict, download_ydl, videos_in_output_dirs)
+            downloader.download_all()
+            return downloader
+        return None
+    finally:
+        # a SQLite archive is read through a connection, which `yt-dlq serve` would
+        #  otherwise leak with every job
+        if isinstance(url_info_dict, SqliteStore):
+            url_info_dict.close()
 
 
 if __name__ == "__main__":
@@ -4,6 +4,9 @@ from pprint import pprint
 from configargparse import ArgumentParser, Namespace
 
 from utils_python import get_logger_with_class, get_platform
+from yt_dlq.filters import check_filter
+from yt_dlq.logs import DEFAULT_PROGRESS_INTERVAL
+from yt_dlq.shard import parse_shard
 from yt_dlq.types import Url
 from yt_dlq.utils import YtdlqLogger, get_path
 
@@ -22,6 +25,9 @@ def get_default_config_file(prefix="", suffix="", extension="yml", config_dir="c
 class ProgramArgsNamespace(Namespace):  # pylint: disable=too-few-public-methods
     _app_config_path: Path | None
     logging_config_path: Path | None
+    log_json: Path | None
+    quiet: bool
+    progress_interval: float
     urls: list[Url] | None
     batchfile: Path | None
     permit_single: bool
@@ -34,6 +40,7 @@ class ProgramArgsNamespace(Namespace):  # pylint: disable=too-few-public-methods
     use_archives: bool
     no_channels: bool
     data_only: bool
+    plan_only: bool
     output_format: str
     verbose: bool
     json_file_prefix: str | None
@@ -46,12 +53,24 @@ class ProgramArgsNamespace(Namespace):  # pylint: disable=too-few-public-methods
     loose_videos_suffix: str | None
     filter_video_title: str | None
     filter_playlist_title: str | None
+    filter: str | None
     extra_dirs: list[Path]
     dl_duplicates: bool
     cookies: Path | None = None
+    shard: tuple[int, int] | None
+    reuse_info: bool
+    lease_ttl: int
+    metrics_textfile: Path | None
+    metrics_port: int | None
+    metrics_summary: Path | None
+    profile: bool
+    profile_dir: Path | None
+    staging_dir: Path | None
+    use_catalog: bool
+    store: str
 
 
-def process_args():
+def make_parser() -> ArgumentParser:
     parser = ArgumentParser()
     parser.add_argument(
         "-c",
@@ -69,6 +88,25 @@ def process_args():
         default=get_default_config_file(prefix="logging_", extension="cfg"),
         help="Path to logging config file (default: '%(default)s')",
     )
+    parser.add_argument(
+        "--log-json",
+        type=get_path,
+        metavar="PATH",
+        help="Also write log records to $PATH as JSON lines",
+    )
+    parser.add_argument(
+        "-q",
+        "--quiet",
+        action="store_true",
+        help="Replace per-video lines on the console with periodic progress summaries",
+    )
+    parser.add_argument(
+        "--progress-interval",
+        type=float,
+        default=DEFAULT_PROGRESS_INTERVAL,
+        metavar="SECONDS",
+        help="Seconds between progress summaries with --quiet (default: %(default)s)",
+    )
     chosen_url_group = parser.add_mutually_exclusive_group()
     chosen_url_group.add_argument(
         "-j",
@@ -89,7 +127,10 @@ def process_args():
         metavar="FILE",
         help=(
             "File containing URLs to download, one URL per line. "
-            'Lines starting with "#" are considered as comments and ignored'
+            'Lines starting with "#" are considered as comments and ignored. '
+            '"-" (stdin), named pipes and .gz/.zst files are read as lines arrive, '
+            "and each URL is processed as soon as it is read; each such run gets a new archive, "
+            "unless --json-file-prefix names one to add to"
         ),
         type=Path,
     )
@@ -150,6 +191,24 @@ def process_args():
             "Don't read or write any archive files (apart from those passed as arguments to the program)"
         ),
     )
+    parser.add_argument(
+        "--store",
+        choices=["json", "sqlite"],
+        default="json",
+        help=(
+            "Format of new archives in OUTPUT_DIR/_json: a nested JSON document, rewritten in full on every change, "
+            "or an SQLite database, where each change only updates the affected rows (default: %(default)s)"
+        ),
+    )
+    parser.add_argument(
+        "--no-catalog",
+        action="store_false",
+        dest="use_catalog",
+        help=(
+            "Don't use the catalog of all archives in OUTPUT_DIR/_json (OUTPUT_DIR/_catalog.json); "
+            "videos in other batches' archives are retrieved again rather than reused from them"
+        ),
+    )
     parser.add_argument(
         "-g",
         "--no-channels",
@@ -162,6 +221,11 @@ def process_args():
         action="store_true",
         help="Only retrieve URLs; don't download videos",
     )
+    parser.add_argument(
+        "--plan-only",
+        action="store_true",
+        help="Resolve channels and print the requests retrieving the URLs would make (leaving out those already covered), then exit",
+    )
     parser.add_argument(
         "-f",
         "--output-format",
@@ -232,6 +296,13 @@ def process_args():
         help="Only download playlists whose titles contain $PATTERN",
     )
 
+    parser.add_argument(
+        "--filter",
+        metavar="EXPR",
+        type=check_filter,
+        help="Only download videos matching $EXPR, e.g. 'not title:live and duration:..10:00 and date>=2020' (see yt_dlq/filters.py)",
+    )
+
     parser.add_argument(
         "--extra-dirs",
         type=lambda dirs: [Path(dir.strip()) for dir in dirs.split(",")],
@@ -250,7 +321,97 @@ def process_args():
         type=Path,
     )
 
-    parsed: ProgramArgsNamespace = parser.parse_args(namespace=ProgramArgsNamespace())
+    parser.add_argument(
+        "--staging-dir",
+        metavar="FOLDER",
+        type=Path,
+        help=(
+            "Download and post-process videos in FOLDER (e.g. on a local SSD or tmpfs), then move each finished file into the output folder in one step. "
+            "Partially written files never appear in the output folder"
+        ),
+    )
+
+    parser.add_argument(
+        "--reuse-info",
+        action="store_true",
+        help=(
+            "Save video info while retrieving URLs and reuse it when downloading, instead of extracting each video again. "
+            "Info is re-extracted once its stream URLs have expired"
+        ),
+    )
+
+    parser.add_argument(
+        "--shard",
+        metavar="I/N",
+        type=parse_shard,
+        help=(
+            "Only download videos in shard I of N (0 <= I < N), so that several workers can share one output directory. "
+            "Workers take over the shards of crashed workers once their leases expire"
+        ),
+    )
+    parser.add_argument(
+        "--lease-ttl",
+        metavar="SECONDS",
+        type=int,
+        default=300,
+        help="Time after which a sharded worker's leases expire if it stops sending heartbeats (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--metrics-textfile",
+        metavar="FILE",
+        type=Path,
+        help="Periodically write run metrics to FILE in Prometheus text format (e.g. for node_exporter's textfile collector)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        metavar="PORT",
+        type=int,
+        help="Serve run metrics in Prometheus format on http://127.0.0.1:PORT/metrics",
+    )
+    parser.add_argument(
+        "--metrics-summary",
+        metavar="FILE",
+        type=Path,
+        help="Write a JSON summary of run metrics to FILE on exit",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record CPU (cProfile) and memory (tracemalloc) profiles for each phase of the run, and print a summary on exit",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        metavar="FOLDER",
+        type=Path,
+        help="Folder to write profiles to (default: OUTPUT_DIR/_profile/<timestamp>)",
+    )
+    return parser
+
+
+def process_args(argv: list[str] | None = None, interactive=True):
+    """
+    parse argv (default: sys.argv[1:]); with interactive=False (e.g. for jobs run by
+     `yt-dlq serve`), options that would prompt for input are rejected instead
+    """
+    parser = make_parser()
+    parsed: ProgramArgsNamespace = parser.parse_args(argv, namespace=ProgramArgsNamespace())
+
+    if not interactive:
+        if prompts := [
+            option
+            for option, dest in (
+                ("--prompt-json", "prompt_json"),
+                ("--prompt-album-override", "prompt_album_override"),
+                ("--prompt-albumartist-override", "prompt_albumartist_override"),
+            )
+            if getattr(parsed, dest)
+        ]:
+            parser.error(f"{', '.join(prompts)} can't be used non-interactively")
+        if parsed.cookies is not None:
+            assert parsed.cookies.is_file(), f"{parsed.cookies=!r} doesn't exist!"
+        return parsed
 
     if parsed.show_args_only:
         pprint(parsed.__dict__)
@@ -0,0 +1,215 @@
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+from utils_python import get_logger_with_class
+from yt_dlq.records import ChannelSpan, SpanCache, iter_channel_records
+from yt_dlq.store import STORE_SUFFIXES, SqliteStore
+from yt_dlq.utils import YtdlqLogger
+
+LOGGER = get_logger_with_class(__name__, YtdlqLogger)
+
+CATALOG_FILENAME = "_catalog.json"
+CATALOG_VERSION = 2
+# JSON archive channels kept parsed by archived_video; videos looked up one after another
+#  tend to come from a few channels
+CHANNEL_CACHE_SIZE = 4
+
+
+class ArchiveCatalog:
+    """
+    index of every archive (JSON or SQLite) in `_json`, keyed by video ID:
+
+        {video_id: {archive_name: {"channel": channel_id, "playlists": [playlist_id, ...]}}}
+
+    along with the size and mtime of each archive when it was indexed, so that
+     refreshing only re-reads archives which have been added or changed since, and where
+     each channel lies in each JSON archive, so that one video can be read back without
+     parsing the whole archive
+    """
+
+    def __init__(self, catalog_path: Path, archive_dir: Path):
+        self.catalog_path = catalog_path
+        self.archive_dir = archive_dir
+        self.archives: dict[str, dict] = {}
+        self.videos: dict[str, dict[str, dict]] = {}
+        # {archive_name: {channel_id: [offset, length]}}, for JSON archives
+        self.spans: dict[str, dict[str, list[int]]] = {}
+        self.span_cache = SpanCache(CHANNEL_CACHE_SIZE)
+        # SQLite archives opened by archived_video, until close
+        self._stores: dict[str, SqliteStore] = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.catalog_path, "r", encoding="utf-8") as file:
+                catalog = json.load(file)
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError:
+            LOGGER.warning("Catalog '%s' is unreadable; rebuilding it", self.catalog_path)
+            return
+        if catalog.get("version") != CATALOG_VERSION:
+            LOGGER.info("Catalog '%s' is from another version; rebuilding it", self.catalog_path)
+            return
+        self.archives = catalog["archives"]
+        self.videos = catalog["videos"]
+        self.spans = catalog["spans"]
+
+    def save(self):
+        tmp_path = self.catalog_path.with_name(f"{self.catalog_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "version": CATALOG_VERSION,
+                    "archives": self.archives,
+                    "videos": self.videos,
+                    "spans": self.spans,
+                },
+                file,
+            )
+        os.replace(tmp_path, self.catalog_path)
+
+    def refresh(self):
+        """bring the catalog in line with the archive dir, re-indexing only what changed"""
+        current = {}
+        with os.scandir(self.archive_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(tuple(STORE_SUFFIXES.values())):
+                    stat = entry.stat()
+                    current[entry.name] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+        stale = {
+            name
+            for name, stat in self.archives.items()
+            if current.get(name) != stat
+        }
+        new = {name for name, stat in current.items() if self.archives.get(name) != stat}
+        if not stale and not new:
+            return
+
+        self._forget(stale)
+        for name in stale:
+            del self.archives[name]
+            self.spans.pop(name, None)
+        indexed = 0
+        for name in sorted(new):
+            if self._index(name):
+                self.archives[name] = current[name]
+                indexed += 1
+            else:
+                self._forget({name})
+                self.spans.pop(name, None)
+        LOGGER.info(
+            "Updated catalog: %d archives indexed, %d removed; %d videos in %d archives",
+            indexed,
+            len(stale - new),
+            len(self.videos),
+            len(self.archives),
+        )
+        self.save()
+
+    def _forget(self, names: set[str]):
+        if not names:
+            return
+        for video_id in list(self.videos):
+            placements = self.videos[video_id]
+            for name in names.intersection(placements):
+                del placements[name]
+            if not placements:
+                del self.videos[video_id]
+
+    def _index(self, name: str) -> bool:
+        path = Path(self.archive_dir, name)
+        try:
+            if path.suffix == STORE_SUFFIXES["sqlite"]:
+                store = SqliteStore(path)
+                try:
+                    for video_id, channel_id, playlist_id in store.placements():
+                        self._add(name, video_id, channel_id, playlist_id)
+                finally:
+                    store.close()
+            else:
+                spans = self.spans[name] = {}
+                for channel_id, channel in iter_channel_records(path):
+                    spans[channel_id] = [channel.span.offset, channel.span.length]
+                    for playlist_id, playlist in channel.entries.items():
+                        for video_id in playlist.entries:
+                            self._add(name, video_id, channel_id, playlist_id)
+        except (json.JSONDecodeError, UnicodeDecodeError, sqlite3.DatabaseError) as exc:
+            # e.g. being written by another run; left out, and tried again next refresh
+            LOGGER.warning("Could not index archive '%s': %s", name, exc)
+            return False
+        return True
+
+    def _add(self, name: str, video_id: str, channel_id: str, playlist_id: str):
+        placement = self.videos.setdefault(video_id, {}).setdefault(
+            name, {"channel": channel_id, "playlists": []}
+        )
+        placement["playlists"].append(playlist_id)
+
+    def video_ids(self):
+        return self.videos.keys()
+
+    def lookup(self, video_id: str) -> dict[str, dict] | None:
+        """the archives a video is in, with its channel and playlists in each"""
+        return self.videos.get(video_id)
+
+    def archived_video(self, video_id: str, exclude: Path | None = None) -> tuple[dict, dict] | None:
+        """
+        the channel and video dicts of a video in the newest archive it's in (other than
+         exclude, e.g. the run's own archive), reading only that video's rows of a SQLite
+         archive, or its channel of a JSON archive
+        """
+        placements = {
+            name: placement
+            for name, placement in (self.lookup(video_id) or {}).items()
+            if exclude is None or name != exclude.name
+        }
+        if not placements:
+            return None
+        name = max(placements, key=lambda name: self.archives[name]["mtime_ns"])
+        channel_id = placements[name]["channel"]
+        path = Path(self.archive_dir, name)
+        try:
+            if path.suffix == STORE_SUFFIXES["sqlite"]:
+                if name not in self._stores:
+                    self._stores[name] = SqliteStore(path, read_only=True)
+                for playlist_id in placements[name]["playlists"]:
+                    if (archived := self._stores[name].video(channel_id, playlist_id, video_id)) is not None:
+                        return archived
+                return None
+            if path.stat().st_mtime_ns != self.archives[name]["mtime_ns"]:
+                # changed since it was indexed, so the channel may no longer be where it was
+                return None
+            offset, length = self.spans[name][channel_id]
+        except (OSError, KeyError, sqlite3.DatabaseError) as exc:
+            LOGGER.warning("Could not read archive '%s': %s", name, exc)
+            return None
+        channel = self.span_cache.load(ChannelSpan(path, offset, length, self.span_cache))
+        if channel is None:
+            return None
+        for playlist_id in placements[name]["playlists"]:
+            playlist = channel["entries"].get(playlist_id, {})
+            if (video := playlist.get("entries", {}).get(video_id)) is not None:
+                return {k: v for k, v in channel.items() if k != "entries"}, video
+        return None
+
+    def close(self):
+        for store in self._stores.values():
+            store.close()
+        self._stores.clear()
+
+    def find_archive(self, stem_suffix: str) -> Path | None:
+        """the most recently modified archive whose stem ends with stem_suffix"""
+        names = [
+            name
+            for name in self.archives
+            if Path(name).stem.endswith(stem_suffix)
+        ]
+        if not names:
+            return None
+        return Path(
+            self.archive_dir, max(names, key=lambda name: self.archives[name]["mtime_ns"])
+        )
@@ -2,6 +2,8 @@ import glob
 import os
 import re
 import time
+from collections.abc import Sized
+from contextlib import nullcontext
 from pathlib import Path
 
 from yt_dlp import YoutubeDL
@@ -16,11 +18,30 @@ from utils_python import (
     set_tag_text_mp4 as set_tag_text_mp4,
 )
 from yt_dlq.args import ProgramArgsNamespace
+from yt_dlq.errors import (
+    DownloadErrorAgeRestricted,
+    DownloadErrorMembersOnly,
+    DownloadErrorTOSViolation,
+    DownloadErrorUnavailableVideo,
+    LeaseLost,
+    specify_download_error,
+)
 from yt_dlq.file import restrict_filename
+from yt_dlq.filters import compile_filter
+from yt_dlq.info_cache import InfoCache
+from yt_dlq.logs import item_extra
+from yt_dlq.metrics import FAILURES, QUEUE_DEPTH, RETRIES, SKIPS, add_ydl_hooks
 from yt_dlq.postprocessors import YouTubeMusicLyricsPP, YouTubeMusicSquareThumbnailPP
-from yt_dlq.utils import DownloadErrorAgeRestricted, DownloadErrorMembersOnly, DownloadErrorTOSViolation, DownloadErrorUnavailableVideo, YtdlqLogger, match_filter_func, specify_download_error
+from yt_dlq.profiling import PROFILER
+from yt_dlq.records import ArchiveReader, MergedArchiveReader
+from yt_dlq.store import SqliteStore
+from yt_dlq.shard import LeaseManager, item_key, shard_for_key
+from yt_dlq.staging import StagingArea
+from yt_dlq.utils import YtdlqLogger, match_filter_func
 
 LOGGER = get_logger_with_class(__name__, YtdlqLogger)
+ITEM_DOWNLOADING = item_extra("download", "downloading")
+ITEM_SKIPPED = item_extra("download", "skipped")
 
 base_postprocessors = [
     {
@@ -56,16 +77,66 @@ class Downloader:
     def __init__(
         self,
         args: ProgramArgsNamespace,
-        all_urls_dict: dict,
+        all_urls_dict: dict | ArchiveReader | MergedArchiveReader | SqliteStore,
+        ydl: YoutubeDL | None = None,
+        videos_in_output_dirs: dict[str, list[Path]] | None = None,
     ):
         self.args = args
+        # a long-running process (`yt-dlq serve`) passes in a YoutubeDL it keeps warm
+        #  and reuses between runs, so it's only closed here if it was made here
+        self.owns_ydl = ydl is None
+        self.ydl = ydl if ydl is not None else self.make_ydl(args)
+        self.all_urls_dict = all_urls_dict
+        self.video_filter = compile_filter(self.args.filter)
+        self.info_cache = (
+            InfoCache(Path(self.args.output_dir, "_info")) if self.args.reuse_info else None
+        )
+
+        # with --shard, only videos hashed to this shard are downloaded, then any
+        #  left unfinished by stopped workers are taken over in further passes
+        self.leases = (
+            LeaseManager(
+                Path(self.args.output_dir, "_leases"),
+                self.args.shard,
+                ttl=self.args.lease_ttl,
+            )
+            if self.args.shard is not None
+            else None
+        )
+        # the item whose lease is held while it downloads, checked on every progress update
+        #  so that a download is stopped as soon as another worker takes its lease
+        self.lease_key: str | None = None
+        if self.leases is not None:
+            self.ydl.add_progress_hook(self.check_lease)
+        self.taking_over = False
+        # shards found stopped in the current takeover pass, and those of them with
+        #  items leased by another worker, which may yet be left to claim
+        self.live_shards: set[int] = set()
+        self.unclaimed_shards: set[int] = set()
+        # items this worker has tried taking over, which aren't retried in later passes
+        self.taken_over: set[str] = set()
+        self.staging = (
+            StagingArea(self.args.staging_dir) if self.args.staging_dir is not None else None
+        )
+
+        # create a dict of video ids in the root dir to avoid downloading duplicates,
+        #  unless one is passed in (kept up to date between runs with new_videos)
+        if videos_in_output_dirs is None:
+            with PROFILER.phase("library_scan"):
+                videos_in_output_dirs = self.get_videos_in_output_dirs()
+        self.videos_in_output_dirs = videos_in_output_dirs
+        # videos this run added to the library
+        self.new_videos: dict[str, list[Path]] = {}
+
+    @staticmethod
+    def make_ydl(args: ProgramArgsNamespace) -> YoutubeDL:
         postprocessors = (
-            format_postprocessors.get(self.args.output_format, []) + base_postprocessors
+            format_postprocessors.get(args.output_format, []) + base_postprocessors
         )
         ydl_opts = {
             "logger": LOGGER,
             "color": "never",
-            "verbose": self.args.verbose,
+            "verbose": args.verbose,
             "format": "m4a/bestaudio/best",
             "postprocessors": postprocessors,
             "postprocessor_args": {"ffmpeg": []},
@@ -76,18 +147,18 @@ class Downloader:
             # "ffmpeg_location": None,
             "match_filter": match_filter_func,
             # "prefer_ffmpeg": True,
-            "ffmpeg_location": self.args.ffmpeg_location,
+            "ffmpeg_location": args.ffmpeg_location,
             # "embedthumbnail": True,
             "writethumbnail": True,
-            "cookiefile": str(self.args.cookies),
+            "cookiefile": str(args.cookies),
         }
-        self.ydl = YoutubeDL(params=ydl_opts)
-        self.ydl.add_post_processor(YouTubeMusicSquareThumbnailPP(None))
-        self.ydl.add_post_processor(YouTubeMusicLyricsPP(None))
-        self.all_urls_dict = all_urls_dict
-
-        # create a dict of video ids in the root dir to avoid downloading duplicates
-        self.videos_in_output_dirs = self.get_videos_in_output_dirs()
+        ydl = YoutubeDL(params=ydl_opts)
+        ydl.add_post_processor(YouTubeMusicSquareThumbnailPP(None))
+        ydl.add_post_processor(YouTubeMusicLyricsPP(None))
+        add_ydl_hooks(ydl)
+        if PROFILER.enabled:
+            ydl.add_postprocessor_hook(PROFILER.postprocessor_hook)
+        return ydl
 
     def get_videos_in_output_dirs(self):
         videos_in_output_dirs: dict[str, list[Path]] = {}
@@ -112,9 +183,12 @@ class Downloader:
                 continue
             _video_id = match.group(1)
 
-            id_partial_files = {suffix_filepath for suffix in partial_suffixes if (suffix_filepath:=format_filepath.with_suffix(suffix)).exists()}
-            if id_partial_files:
-                partial_files.setdefault(_video_id, set()).update(id_partial_files)
+            # with staging, files only reach the library once they're complete, so
+            #  there's no need to stat each one's possible partial files
+            if self.staging is None:
+                id_partial_files = {suffix_filepath for suffix in partial_suffixes if (suffix_filepath:=format_filepath.with_suffix(suffix)).exists()}
+                if id_partial_files:
+                    partial_files.setdefault(_video_id, set()).update(id_partial_files)
 
             videos_in_output_dirs.setdefault(_video_id, []).append(format_filepath)
 
@@ -129,26 +203,76 @@ class Downloader:
 
     def download_all(self):
         failed_downloads = []
-        with self.ydl:
-            channels = self.all_urls_dict
-
-            for ch_idx, (_channel_id, channel) in enumerate(channels.items()):
-                self.download_channel(
-                    ch_idx,
-                    channel,
-                    channels,
+        with (
+            self.ydl if self.owns_ydl else nullcontext(),
+            self.leases or nullcontext(),
+            self.staging or nullcontext(),
+        ):
+            self.download_channels(self.all_urls_dict)
+            if self.leases is not None:
+                LOGGER.info(
+                    "FINISHED SHARD %d/%d; TAKING OVER VIDEOS OF STOPPED WORKERS",
+                    self.leases.shard_index,
+                    self.leases.shard_count,
                 )
+                self.taking_over = True
+                self.take_over()
         if failed_downloads:
             raise RuntimeError(f"{len(failed_downloads)} failed downloads")
 
+    def download_channels(self, channels):
+        # channels may be streamed from an archive (see yt_dlq.records), in which case
+        #  neither the channel count nor the number of videos is known up front
+        channel_count = len(channels) if isinstance(channels, Sized) else None
+        for ch_idx, (_channel_id, channel) in enumerate(channels.items()):
+            QUEUE_DEPTH.inc(
+                sum(len(playlist["entries"]) for playlist in channel["entries"].values()),
+                queue="download",
+            )
+            self.download_channel(
+                ch_idx,
+                channel,
+                channel_count,
+            )
+
+    def take_over(self):
+        """
+        download the items of stopped shards, pass after pass, until every shard is
+         running or finished, or has nothing left to claim: items leased by another
+         worker are claimable again if that worker stops too
+        """
+        while True:
+            self.live_shards = {
+                shard_index
+                for shard_index in range(self.leases.shard_count)
+                if self.leases.shard_alive(shard_index)
+            }
+            self.unclaimed_shards = set()
+            self.download_channels(self.all_urls_dict)
+            if not self.unclaimed_shards:
+                return
+            LOGGER.info(
+                "SHARDS %s HAVE ITEMS LEASED BY OTHER WORKERS; CHECKING AGAIN",
+                sorted(self.unclaimed_shards),
+            )
+            time.sleep(self.leases.heartbeat_interval)
+
+    def skip_for_shard(self, video_id) -> bool:
+        if self.leases is None:
+            return False
+        shard_index = shard_for_key(video_id, self.leases.shard_count)
+        if not self.taking_over:
+            return shard_index != self.leases.shard_index
+        return shard_index in self.live_shards
+
     def download_channel(
         self,
         ch_idx: int,
         channel: dict,
-        channels,
+        channel_count: int | None,
     ):
         log_string = (
-            f"DOWNLOADING CHANNEL {ch_idx+1}/{len(channels)}: {channel['title']!r}"
+            f"DOWNLOADING CHANNEL {ch_idx+1}/{channel_count or '?'}: {channel['title']!r}"
         )
         if self.args.albumartist_override:
             channel_title = self.args.albumartist_override
@@ -200,6 +324,8 @@ class Downloader:
             ):
                 log_string = f"  SKIPPING TITLE-FILTERED PLAYLIST {pl_idx+1}/{len(playlists)}: {playlist['title']!r} (filter='{self.args.filter_playlist_title}')"
                 LOGGER.info(log_string)
+                SKIPS.inc(stage="download", reason="playlist_title_filtered")
+                QUEUE_DEPTH.dec(len(videos), queue="download")
                 return
             log_string = f" DOWNLOADING PLAYLIST {pl_idx+1}/{len(playlists)}: {playlist["title"]!r}"
 
@@ -280,13 +406,29 @@ class Downloader:
         playlist_dir: Path,
         postprocess_args: list[str],
     ):
+        QUEUE_DEPTH.dec(queue="download")
         if self.args.filter_video_title is not None and not re.search(
             self.args.filter_video_title,
             video["title"],
             flags=re.IGNORECASE,
         ):
-            log_string = f"  SKIPPING TITLE-FILTERED VIDEO {video_index+1}/{len(videos)}: {video['title']!r} (filter='{self.args.filter_video_title}')"
-            LOGGER.info(log_string)
+            LOGGER.info(
+                "  SKIPPING TITLE-FILTERED VIDEO %d/%d: %r (filter='%s')",
+                video_index + 1, len(videos), video["title"], self.args.filter_video_title,
+                extra=ITEM_SKIPPED,
+            )
+            SKIPS.inc(stage="download", reason="title_filtered")
+            return
+        if self.video_filter is not None and not self.video_filter(video):
+            LOGGER.info(
+                "  SKIPPING FILTERED VIDEO %d/%d: %r (filter=%r)",
+                video_index + 1, len(videos), video["title"], self.args.filter,
+                extra=ITEM_SKIPPED,
+            )
+            SKIPS.inc(stage="download", reason="filtered")
+            return
+
+        if self.skip_for_shard(video_id):
             return
 
         # downloaded = False
@@ -294,34 +436,93 @@ class Downloader:
             playlist_dir,
             f"{restrict_filename(video['title'])}[{video_id}].{self.args.output_format}",
         ))))
-        LOGGER.info(f"Expected path: {expected_path!r}")
+        LOGGER.debug("Expected path: %r", expected_path)
         placeholder_path = expected_path.with_suffix(".txt")
-        log_string = (
-            f"  DOWNLOADING VIDEO {video_index+1}/{len(videos)}: {video['title']!r}"
-        )
+        # formatted only if logged
+        log_format = "  DOWNLOADING VIDEO %d/%d: %r"
+        log_args = (video_index + 1, len(videos), video["title"])
 
         if video["title"] == "[Private video]":
-            LOGGER.info(log_string + " - UNAVAILABLE (PRIVATE); SKIPPING")
+            LOGGER.info(log_format + " - UNAVAILABLE (PRIVATE); SKIPPING", *log_args, extra=ITEM_SKIPPED)
+            SKIPS.inc(stage="download", reason="private")
             return
         elif video["availability"] == "subscriber_only":
-            LOGGER.info(log_string + " - UNAVAILABLE (MEMBERS-ONLY); SKIPPING")
+            LOGGER.info(log_format + " - UNAVAILABLE (MEMBERS-ONLY); SKIPPING", *log_args, extra=ITEM_SKIPPED)
+            SKIPS.inc(stage="download", reason="members_only")
             return
 
         remove_placeholder = False
         if video["id"] in self.videos_in_output_dirs:
-            log_string += " - EXISTS IN OUTPUT DIRS"
+            log_format += " - EXISTS IN OUTPUT DIRS"
             if self.args.playlist_duplicates and playlist["type"] != "videos_loose" and self.videos_in_output_dirs[video["id"]] != [expected_path]:
-                log_string += " - DUPLICATES ENABLED"
+                log_format += " - DUPLICATES ENABLED"
             elif self.args.text_placeholders and not placeholder_path.exists():
-                LOGGER.info(log_string + " - CREATING PLACEHOLDER")
+                LOGGER.info(log_format + " - CREATING PLACEHOLDER", *log_args, extra=ITEM_SKIPPED)
                 make_parent_dir(placeholder_path)
                 open(placeholder_path, "w+").close()
+                SKIPS.inc(stage="download", reason="placeholder")
                 return
             else:
-                LOGGER.info(log_string + " - SKIPPING")
+                LOGGER.info(log_format + " - SKIPPING", *log_args, extra=ITEM_SKIPPED)
+                SKIPS.inc(stage="download", reason="exists")
                 return
-        LOGGER.info(log_string)
 
+        if self.leases is not None:
+            lease_key = item_key(video_id, playlist_id)
+            if self.leases.is_done(lease_key):
+                LOGGER.info(log_format + " - DONE BY ANOTHER WORKER; SKIPPING", *log_args, extra=ITEM_SKIPPED)
+                SKIPS.inc(stage="download", reason="done_by_other_worker")
+                return
+            if self.taking_over and lease_key in self.taken_over:
+                return
+            if not self.leases.acquire(lease_key):
+                LOGGER.info(log_format + " - LEASED BY ANOTHER WORKER; SKIPPING", *log_args, extra=ITEM_SKIPPED)
+                SKIPS.inc(stage="download", reason="leased_by_other_worker")
+                if self.taking_over:
+                    self.unclaimed_shards.add(shard_for_key(video_id, self.leases.shard_count))
+                return
+            if self.taking_over:
+                self.taken_over.add(lease_key)
+            self.lease_key = lease_key
+        LOGGER.info(log_format, *log_args, extra=ITEM_DOWNLOADING)
+
+        # an exception escaping here means this worker is going down; the item is left
+        #  unfinished, to be taken over
+        downloaded = self.process_video(
+            playlist_id,
+            playlist,
+            videos,
+            video_index,
+            video,
+            expected_path,
+            placeholder_path,
+            postprocess_args,
+            playlist_dir,
+            remove_placeholder,
+        )
+        if self.leases is not None:
+            # a failed download isn't marked done, so that a later run retries it
+            self.leases.release(lease_key, done=downloaded)
+            self.lease_key = None
+
+    def check_lease(self, _progress: dict | None = None):
+        if self.lease_key is not None and not self.leases.holds(self.lease_key):
+            raise LeaseLost(f"lease {self.lease_key!r} was taken by another worker")
+
+    def process_video(
+        self,
+        playlist_id,
+        playlist,
+        videos,
+        video_index: int,
+        video: dict,
+        expected_path: Path,
+        placeholder_path: Path,
+        postprocess_args: list[str],
+        playlist_dir: Path,
+        remove_placeholder: bool,
+    ) -> bool:
+        """download, tag and move a video into place; whether it was downloaded"""
         if playlist_id and len(playlist["entries"]) > 1:
             postprocess_args.extend([
                 "-metadata",
@@ -337,20 +538,38 @@ class Downloader:
             postprocess_args + uploader_metadata + year_metadata
         )
 
-        self.ydl.params["outtmpl"]["default"] = os.path.join(
-            playlist_dir, "%(title)s[%(id)s].%(ext)s"
-        )
         if self.args.output_format == "mp3":
             self.ydl.params["keepvideo"] = expected_path.with_suffix(".m4a").is_file()
 
-        try:
-            self.execute_download(
-                video,
-                expected_path,
+        # with --staging-dir, the video is downloaded and post-processed in its own
+        #  staging subdirectory, then moved into the playlist dir in one step
+        staging_context = (
+            self.staging.item_dir(video["id"]) if self.staging is not None else nullcontext()
+        )
+        with staging_context as item_dir:
+            download_dir = item_dir or playlist_dir
+            download_path = Path(download_dir, expected_path.name)
+            self.ydl.params["outtmpl"]["default"] = os.path.join(
+                download_dir, "%(title)s[%(id)s].%(ext)s"
             )
-        except DownloadError as _exc:
-            LOGGER.error(f"   FAILED DOWNLOADING UNAVAILABLE VIDEO {video_index+1}/{len(videos)}: {video['title']!r}; SKIPPING")
-        else:
+
+            try:
+                with PROFILER.phase("download"):
+                    self.execute_download(
+                        video,
+                        download_path,
+                    )
+                # the lease may have been lost after the last progress update
+                self.check_lease()
+            except LeaseLost as exc:
+                LOGGER.warning(f"   ABANDONED DOWNLOADING VIDEO {video_index+1}/{len(videos)}: {video['title']!r} ({exc.msg})")
+                SKIPS.inc(stage="download", reason="lease_lost")
+                return False
+            except DownloadError as _exc:
+                LOGGER.error(f"   FAILED DOWNLOADING UNAVAILABLE VIDEO {video_index+1}/{len(videos)}: {video['title']!r}; SKIPPING")
+                FAILURES.inc(stage="download")
+                return False
+
             if not self.args.text_placeholders:
                 if self.args.output_format == "m4a":
                     if video.get("uploader") is not None:
@@ -363,14 +582,14 @@ class Downloader:
                         uploader = None
                     if uploader is not None:
                         try:
-                            with preserve_filedate(expected_path):
+                            with PROFILER.phase("tag_uploader"), preserve_filedate(download_path):
                                 set_tag_text_mp4(
-                                    expected_path,
+                                    download_path,
                                     "uploader",
                                     uploader,
                                 )
                         except FileNotFoundError as exc:
-                            LOGGER.exception(f"Expected path {expected_path!r} not found! Maybe title of '{video['url']}' was updated between data retrieval and now?")
+                            LOGGER.exception(f"Expected path {download_path!r} not found! Maybe title of '{video['url']}' was updated between data retrieval and now?")
                             # TODO: retrieve data before/during download for expected path?
                             # but then how will placeholders work if nothing downloaded?
                             # placeholders are for duplicates, maybe we can get info on the original download
@@ -379,8 +598,27 @@ class Downloader:
                         LOGGER.error("uploader is none???")
                         # breakpoint()
                         # pass
+            if item_dir is not None:
+                with PROFILER.phase("move_into_library"):
+                    self.staging.commit(
+                        item_dir, playlist_dir, {f".{self.args.output_format}"}
+                    )
             if remove_placeholder:
                 os.remove(placeholder_path)
+        if expected_path.is_file():
+            self.new_videos.setdefault(video["id"], []).append(expected_path)
+        return True
+
+    def download_url_or_info(self, video: dict):
+        if self.info_cache is not None and (info := self.info_cache.load(video["id"])) is not None:
+            try:
+                self.ydl.process_ie_result(info, download=True)
+                return
+            except DownloadError as exc:
+                LOGGER.info(f"  Downloading from saved info failed ({exc.msg}); extracting again")
+                RETRIES.inc(stage="download", reason="saved_info_failed")
+                self.info_cache.discard(video["id"])
+        self.ydl.download([video["url"]])
 
     def execute_download(
         self,
@@ -392,7 +630,7 @@ class Downloader:
             tries += 1
             try:
                 success = False
-                self.ydl.download([video["url"]])
+                self.download_url_or_info(video)
                 # TODO: add configuration to allow creating shortcuts?
                 # from yt_dlq.utils import make_shortcut
                 # make_shortcut(placeholder_path.with_suffix(".url"), url=video["url"])
@@ -404,10 +642,13 @@ class Downloader:
                 if exc.msg is None:
                     raise NotImplementedError("exc.msg is None")
                 if "WinError" in exc.msg:
+                    RETRIES.inc(stage="download", reason="os_error")
                     continue
                 elif "Read timed out" in exc.msg:
+                    RETRIES.inc(stage="download", reason="timeout")
                     continue
                 elif "more expected" in exc.msg:
+                    RETRIES.inc(stage="download", reason="incomplete")
                     continue
                 elif isinstance(exc_specific, DownloadErrorMembersOnly):
                     raise
@@ -439,6 +680,7 @@ class Downloader:
                     if tries > 1:
                         breakpoint()
                         pass
+                    RETRIES.inc(stage="download", reason="thumbnail_format")
                     continue
                 else:
                     breakpoint()
@@ -448,6 +690,7 @@ class Downloader:
                 if tries >= 5:
                     raise
                 LOGGER.warning(exc)
+                RETRIES.inc(stage="download", reason="permission")
                 time.sleep(5)
                 continue
             except Exception as exc:
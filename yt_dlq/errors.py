@@ -0,0 +1,35 @@
+from yt_dlp.utils import DownloadCancelled, DownloadError
+
+
+class DownloadErrorPrivateVideo(DownloadError): ...
+class DownloadErrorMembersOnly(DownloadError): ...
+class DownloadErrorCaptchaChallenge(DownloadError): ...
+class DownloadErrorUnavailableVideo(DownloadError): ...
+class DownloadErrorAgeRestricted(DownloadError): ...
+class DownloadErrorTOSViolation(DownloadError): ...
+
+
+class LeaseLost(DownloadCancelled):
+    """a sharded worker's lease on the item being downloaded was taken by another worker"""
+
+
+def specify_download_error(exc: DownloadError):
+    if exc.msg is None:
+        breakpoint()
+        pass
+        return exc
+    if "Private video" in exc.msg:
+        return DownloadErrorPrivateVideo(*exc.args)
+    if "members-only content" in exc.msg:
+        return DownloadErrorMembersOnly(*exc.args)
+    if "captcha challenge" in exc.msg:
+        return DownloadErrorCaptchaChallenge(*exc.args)
+    if "Video unavailable" in exc.msg:
+        return DownloadErrorUnavailableVideo(*exc.args)
+    if "Sign in to confirm your age." in exc.msg:
+        return DownloadErrorAgeRestricted(*exc.args)
+    if "removed for violating YouTube's Terms of Service" in exc.msg:
+        return DownloadErrorTOSViolation(*exc.args)
+    breakpoint()
+    pass
+    return exc
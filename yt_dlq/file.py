@@ -1,14 +1,10 @@
 import json
-from copy import deepcopy
 from datetime import datetime
 from glob import glob
 from pathlib import Path
 import re
 from typing import Optional
 
-from mergedeep import merge
-from yt_dlp.utils import sanitize_filename
-
 from utils_python import download, get_logger_with_class, PathInput, get_tag_text_mp4
 
 from yt_dlq.utils import YtdlqLogger
@@ -43,6 +39,9 @@ def video_id_from_file_meta(path: PathInput):
 
 
 def restrict_filename(filename: str):
+    # deferred: importing yt_dlp costs more than the rest of startup combined
+    from yt_dlp.utils import sanitize_filename
+
     return sanitize_filename(filename, restricted=True)
 
 
@@ -50,26 +49,6 @@ def resolve_json_files(json_file_expression: Path):
     return [Path(json_file) for json_file in glob(str(json_file_expression))]
 
 
-def merge_json_files(json_files: list[Path]):
-    url_info_dict = {}
-    for json_file in json_files:
-        with open(json_file, "r", encoding="utf-8") as file:
-            url_info_dict_part = json.load(file)
-        url_info_dict_part_mutable = deepcopy(url_info_dict_part)
-
-        for channel_id, channel_dict in url_info_dict_part.items():
-            for playlist_id, playlist_dict in channel_dict["entries"].items():
-                if playlist_dict["title"] and not playlist_id:
-                    del url_info_dict_part_mutable[channel_id]["entries"][playlist_id]
-                    playlist_id = restrict_filename(playlist_dict["title"])
-                    playlist_dict["id"] = playlist_id
-                    url_info_dict_part_mutable[channel_id]["entries"][
-                        playlist_id
-                    ] = playlist_dict
-        merge(url_info_dict, url_info_dict_part_mutable)
-    return url_info_dict
-
-
 def download_ytdl():
     ytdl_url = "https://github.com/yt-dlp/yt-dlp/releases/latest/download/yt-dlp.exe"
     ytdl_filename = filename_from_url(ytdl_url)
@@ -0,0 +1,388 @@
+"""
+video filter expressions, compiled once into a single Python function
+
+    title:live                      title contains "live" (case-insensitive)
+    title~"\\b(remix|edit)\\b"      title matches a regex (case-insensitive)
+    title="intro"                   title is exactly "intro" (case-insensitive)
+    description:"provided to youtube"
+    duration>=60  duration<10:00    comparisons (seconds, m:ss or h:mm:ss)
+    duration:2:00..8:00             range (either end may be left out)
+    date>=2020  date:2019-06..2021  upload date, compared on the given precision
+    availability:public,unlisted
+
+terms combine with `and` (or just a space), `or`, `not` and parentheses:
+
+    not title:live and (duration:..10:00 or description:"auto-generated by youtube")
+
+videos with no value for a field never match a term on it
+"""
+
+import re
+from argparse import ArgumentTypeError
+from typing import Callable, Iterable, Mapping
+
+TEXT_FIELDS = {"title": "title", "description": "description"}
+FIELDS = {
+    **TEXT_FIELDS,
+    "duration": "duration",
+    "date": "upload_date",
+    "availability": "availability",
+}
+COMPARISONS = (">=", "<=", ">", "<")
+
+TOKEN_PATTERN = re.compile(
+    r"""\s*(?:
+        (?P<lparen>\() | (?P<rparen>\)) |
+        (?P<term>(?P<field>[a-z_]+)(?P<op>>=|<=|[:~<>=])
+            (?P<value>"(?:[^"\\]|\\.)*"|[^\s()]+)) |
+        (?P<word>[A-Za-z]+)
+    )""",
+    re.VERBOSE,
+)
+DATE_PATTERN = re.compile(r"\d{4}(?:-\d{2}(?:-\d{2})?)?")
+
+
+class FilterError(ValueError):
+    pass
+
+
+def _tokenize(expression: str) -> list[tuple]:
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = TOKEN_PATTERN.match(expression, position)
+        if match is None or match.end() == position:
+            raise FilterError(f"can't parse filter at {expression[position:]!r}")
+        position = match.end()
+        if match["lparen"]:
+            tokens.append(("(",))
+        elif match["rparen"]:
+            tokens.append((")",))
+        elif match["term"]:
+            value = match["value"]
+            if value.startswith('"'):
+                # only quotes and backslashes are escaped; any other backslash is kept,
+                #  as it's part of a regex (e.g. title~"\bdemo\b")
+                value = re.sub(r'\\(["\\])', r"\1", value[1:-1])
+            tokens.append(("term", match["field"], match["op"], value))
+        else:
+            word = match["word"].lower()
+            if word not in ("and", "or", "not"):
+                raise FilterError(f"unexpected {match['word']!r} in filter (expected a term like title:WORD)")
+            tokens.append((word,))
+    return tokens
+
+
+class _Parser:
+    """
+    or_expr  = and_expr ("or" and_expr)*
+    and_expr = not_expr (["and"] not_expr)*
+    not_expr = "not" not_expr | "(" or_expr ")" | term
+    """
+
+    def __init__(self, tokens: list[tuple]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> str | None:
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def take(self) -> tuple:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            return ("all",)
+        node = self.or_expr()
+        if self.peek() is not None:
+            raise FilterError(f"unexpected {self.peek()!r} in filter")
+        return node
+
+    def or_expr(self):
+        nodes = [self.and_expr()]
+        while self.peek() == "or":
+            self.take()
+            nodes.append(self.and_expr())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def and_expr(self):
+        nodes = [self.not_expr()]
+        while self.peek() in ("and", "not", "(", "term"):
+            if self.peek() == "and":
+                self.take()
+            nodes.append(self.not_expr())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def not_expr(self):
+        kind = self.peek()
+        if kind == "not":
+            self.take()
+            return ("not", self.not_expr())
+        if kind == "(":
+            self.take()
+            node = self.or_expr()
+            if self.peek() != ")":
+                raise FilterError("missing ')' in filter")
+            self.take()
+            return node
+        if kind == "term":
+            return self.take()
+        raise FilterError(f"expected a term in filter, got {kind or 'the end'!r}")
+
+
+def parse_duration(value: str) -> int:
+    try:
+        seconds = 0
+        for part in value.split(":"):
+            seconds = seconds * 60 + int(part)
+        return seconds
+    except ValueError:
+        raise FilterError(f"invalid duration {value!r} (expected seconds, m:ss or h:mm:ss)")
+
+
+def parse_date(value: str) -> str:
+    if not DATE_PATTERN.fullmatch(value):
+        raise FilterError(f"invalid date {value!r} (expected YYYY, YYYY-MM or YYYY-MM-DD)")
+    return value
+
+
+class _Compiler:
+    """turns a parsed filter into the source of one function, with its constants"""
+
+    def __init__(self):
+        self.constants: dict[str, object] = {}
+        self.fields: set[str] = set()
+
+    def constant(self, value) -> str:
+        name = f"_c{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def compile(self, node) -> str:
+        kind = node[0]
+        if kind == "all":
+            return "True"
+        if kind == "not":
+            return f"not {self.compile(node[1])}"
+        if kind == "and":
+            return "(" + " and ".join(self.compile(child) for child in node[1]) + ")"
+        if kind == "or":
+            return "(" + " or ".join(self.compile_or(node[1])) + ")"
+        return self.compile_term(*node[1:])
+
+    def compile_or(self, nodes) -> list[str]:
+        # fast path: substrings of the same field are found with one regex scan,
+        #  instead of one `in` scan per substring
+        substrings: dict[str, list[str]] = {}
+        compiled = []
+        for node in nodes:
+            if node[0] == "term" and node[1] in TEXT_FIELDS and node[2] == ":":
+                substrings.setdefault(node[1], []).append(node[3].lower())
+            else:
+                compiled.append(self.compile(node))
+        for field, values in substrings.items():
+            if len(values) == 1:
+                compiled.insert(0, self.compile_term(field, ":", values[0]))
+            else:
+                self.fields.add(field)
+                pattern = re.compile("|".join(map(re.escape, values)))
+                compiled.insert(0, f"{self.constant(pattern)}.search({field}) is not None")
+        return compiled
+
+    def compile_term(self, field: str, op: str, value: str) -> str:
+        if field not in FIELDS:
+            raise FilterError(f"unknown filter field {field!r} (expected one of {', '.join(FIELDS)})")
+        self.fields.add(field)
+        if field in TEXT_FIELDS:
+            if op == ":":
+                return f"{self.constant(value.lower())} in {field}"
+            if op == "~":
+                try:
+                    pattern = re.compile(value, re.IGNORECASE)
+                except re.error as exc:
+                    raise FilterError(f"invalid regex {value!r}: {exc}")
+                return f"{self.constant(pattern)}.search({field}) is not None"
+            if op == "=":
+                return f"{field} == {self.constant(value.lower())}"
+        elif field == "availability":
+            if op in (":", "="):
+                return f"{field} in {self.constant(frozenset(value.split(',')))}"
+        elif field == "duration":
+            return self.compile_comparison(field, op, value, parse_duration, field)
+        elif field == "date":
+            return self.compile_comparison(field, op, value, parse_date, None)
+        raise FilterError(f"{field!r} can't be used with {op!r}")
+
+    def compile_comparison(self, field, op, value, parse, operand) -> str:
+        if op == "~":
+            raise FilterError(f"{field!r} can't be used with '~'")
+
+        def side(bound) -> str:
+            # dates compare on the precision given: date<=2020 includes all of 2020
+            return operand or f"{field}[:{len(bound)}]"
+
+        if op in COMPARISONS or op == "=":
+            bound = parse(value)
+            comparison = "==" if op == "=" else op
+            return f"({field} is not None and {side(str(bound))} {comparison} {self.constant(bound)})"
+        low, separator, high = value.partition("..")
+        if not separator:
+            bound = parse(value)
+            return f"({field} is not None and {side(str(bound))} == {self.constant(bound)})"
+        checks = [f"{field} is not None"]
+        if low:
+            bound = parse(low)
+            checks.append(f"{side(str(bound))} >= {self.constant(bound)}")
+        if high:
+            bound = parse(high)
+            checks.append(f"{side(str(bound))} <= {self.constant(bound)}")
+        return "(" + " and ".join(checks) + ")"
+
+
+FIELD_LOADERS = {
+    "title": 'title = (video.get("title") or "").lower()',
+    "description": 'description = (video.get("description") or "").lower()',
+    "duration": 'duration = video.get("duration")',
+    "date": 'date = video.get("upload_date")',
+    "availability": 'availability = video.get("availability")',
+}
+
+
+FLAT_ENTRY_FIELDS = ("title", "duration", "availability")
+
+
+def flat_entry_fields(entry: Mapping) -> dict:
+    """
+    the fields of a flat playlist entry that are as they would be in the video's full info
+     (its description, if any, is only a snippet, and its date isn't hyphenated)
+    """
+    fields = {key: entry[key] for key in FLAT_ENTRY_FIELDS if entry.get(key) is not None}
+    if (upload_date := entry.get("upload_date")) is not None:
+        fields["upload_date"] = f"{upload_date[:4]}-{upload_date[4:6]}-{upload_date[6:]}"
+    return fields
+
+
+def _compile_function(node) -> tuple[str, frozenset[str], Callable]:
+    compiler = _Compiler()
+    body = compiler.compile(node)
+    source = "\n".join(
+        [
+            "def match(video):",
+            *(f"    {FIELD_LOADERS[field]}" for field in FIELDS if field in compiler.fields),
+            f"    return {body}",
+        ]
+    )
+    namespace = dict(compiler.constants)
+    exec(compile(source, "<filter>", "exec"), namespace)
+    return source, frozenset(compiler.fields), namespace["match"]
+
+
+def _iter_terms(node):
+    if node[0] == "term":
+        yield node
+    elif node[0] == "not":
+        yield from _iter_terms(node[1])
+    elif node[0] in ("and", "or"):
+        for child in node[1]:
+            yield from _iter_terms(child)
+
+
+class VideoFilter:
+    """a compiled filter expression; call it with a video dict (or VideoRecord)"""
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.tree = _Parser(_tokenize(expression)).parse()
+        self.source, self.fields, self._match = _compile_function(self.tree)
+        self.matches_all = self.tree == ("all",)
+        # each term on its own, for evaluating with only some fields known
+        self._terms = {term: _compile_function(term)[2] for term in _iter_terms(self.tree)}
+
+    def __call__(self, video: Mapping) -> bool:
+        return self._match(video)
+
+    def rejects_entry(self, entry: Mapping) -> bool:
+        """
+        whether a flat playlist entry certainly fails the filter, whatever its full info
+         turns out to be, so that info needn't be retrieved
+        """
+        return self._evaluate_partial(self.tree, flat_entry_fields(entry)) is False
+
+    def _evaluate_partial(self, node, fields: dict) -> bool | None:
+        """the filter's result given only some fields, or None if it depends on the others"""
+        kind = node[0]
+        if kind == "all":
+            return True
+        if kind == "term":
+            if FIELDS[node[1]] not in fields:
+                return None
+            return self._terms[node](fields)
+        if kind == "not":
+            result = self._evaluate_partial(node[1], fields)
+            return None if result is None else not result
+        # and: False if any child is False; or: True if any child is True
+        decisive = kind == "or"
+        result = not decisive
+        for child in node[1]:
+            child_result = self._evaluate_partial(child, fields)
+            if child_result is decisive:
+                return decisive
+            if child_result is None:
+                result = None
+        return result
+
+    def __repr__(self):
+        return f"VideoFilter({self.expression!r})"
+
+
+def compile_filter(expression: str | None) -> VideoFilter | None:
+    if expression is None or not expression.strip():
+        return None
+    return VideoFilter(expression)
+
+
+def check_filter(expression: str) -> str:
+    """argparse type for --filter: the expression, if it compiles"""
+    try:
+        VideoFilter(expression)
+    except FilterError as exc:
+        raise ArgumentTypeError(str(exc)) from None
+    return expression
+
+
+def split_archive(url_info_dict: Mapping, video_filter: VideoFilter) -> tuple[dict, dict]:
+    """
+    the archive's videos split into those the filter keeps and those it removes, in one
+     pass; channel and playlist dicts are copied shallowly and video dicts are shared,
+     and playlists and channels left empty are dropped
+    """
+    keep = {}
+    remove = {}
+    for channel_id, channel in url_info_dict.items():
+        for playlist_id, playlist in channel["entries"].items():
+            kept_videos = {}
+            removed_videos = {}
+            for video_id, video in playlist["entries"].items():
+                (kept_videos if video_filter(video) else removed_videos)[video_id] = video
+            for output, videos in ((keep, kept_videos), (remove, removed_videos)):
+                if videos:
+                    output_channel = output.setdefault(channel_id, {**channel, "entries": {}})
+                    output_channel["entries"][playlist_id] = {**playlist, "entries": videos}
+    return keep, remove
+
+
+def count_videos(url_info_dict: Mapping) -> int:
+    return sum(
+        len(playlist["entries"])
+        for channel in url_info_dict.values()
+        for playlist in channel["entries"].values()
+    )
+
+
+def iter_videos(url_info_dict: Mapping) -> Iterable[Mapping]:
+    for channel in url_info_dict.values():
+        for playlist in channel["entries"].values():
+            yield from playlist["entries"].values()
@@ -0,0 +1,91 @@
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+from yt_dlp import YoutubeDL
+
+from utils_python import get_logger_with_class
+from yt_dlq.utils import YtdlqLogger
+
+LOGGER = get_logger_with_class(__name__, YtdlqLogger)
+
+# stream URLs carry their expiry as `expire=<unix time>` (or `/expire/<unix time>/`
+#  for manifests); when there isn't one, assume YouTube's usual ~6h lifetime
+EXPIRE_PATTERN = re.compile(r"[?&/]expire[=/](\d+)")
+DEFAULT_TTL = 5 * 60 * 60
+EXPIRY_MARGIN = 10 * 60
+
+# not needed to select formats, download or post-process, but often the bulk of the info
+DROPPED_KEYS = ("automatic_captions", "subtitles", "heatmap", "comments")
+
+
+def get_stream_expiry(info: dict) -> float:
+    expiries = []
+    for format_ in info.get("formats") or []:
+        for url in (format_.get("url"), format_.get("manifest_url")):
+            if url and (match := EXPIRE_PATTERN.search(url)):
+                expiries.append(int(match.group(1)))
+    if expiries:
+        return min(expiries) - EXPIRY_MARGIN
+    return info.get("epoch", time.time()) + DEFAULT_TTL
+
+
+def strip_info(info: dict) -> dict:
+    info = YoutubeDL.sanitize_info(info, remove_private_keys=True)
+    for key in DROPPED_KEYS:
+        info.pop(key, None)
+    info["formats"] = [
+        format_
+        for format_ in info.get("formats") or []
+        if format_.get("format_note") != "storyboard"
+    ]
+    return info
+
+
+class InfoCache:
+    """
+    video info dicts saved at extraction time, so that the downloader can hand them
+     straight to yt-dlp instead of extracting every video a second time
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+
+    def save(self, info: dict):
+        if not info.get("formats"):
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(info["id"])
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"expires": get_stream_expiry(info), "info": strip_info(info)}, file)
+        os.replace(tmp_path, path)
+
+    def load(self, video_id: str) -> dict | None:
+        path = self._path(video_id)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                cached = json.load(file)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
+            LOGGER.warning("Discarding unreadable cached info '%s'", path)
+            self.discard(video_id)
+            return None
+        if cached["expires"] <= time.time():
+            LOGGER.info("Cached info for %r has expired", video_id)
+            self.discard(video_id)
+            return None
+        return cached["info"]
+
+    def __contains__(self, video_id: str) -> bool:
+        """whether the video's info is cached (it may since have expired)"""
+        return self._path(video_id).is_file()
+
+    def discard(self, video_id: str):
+        self._path(video_id).unlink(missing_ok=True)
+
+    def _path(self, video_id: str):
+        return Path(self.cache_dir, f"{video_id}.json")
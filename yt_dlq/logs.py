@@ -0,0 +1,153 @@
+"""
+logging set up from the logging config, with the configured handlers moved behind a
+ queue: records are put on the queue by whichever thread logs them, and formatted and
+ written (to the console and files) by one background listener thread, so that
+ extraction, download and server worker threads don't wait on each other or on I/O
+
+    --log-json PATH     also write every record to PATH as a line of JSON
+    --quiet             on the console, replace per-video lines with a progress summary
+                         every --progress-interval seconds
+
+per-video lines are logged with `extra=item_extra(stage, outcome)`, which is what the
+ summaries count, and what JSON lines carry as `stage` and `outcome`
+"""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import time
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+
+from utils_python import make_parent_dir, setup_config_logging
+
+DEFAULT_PROGRESS_INTERVAL = 30
+EXCEPTION_FORMATTER = logging.Formatter()
+
+
+def item_extra(stage: str, outcome: str) -> dict:
+    """`extra` for a per-video log line"""
+    return {"item": (stage, outcome)}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "location": f"{record.filename}:{record.lineno}",
+            "message": record.getMessage(),
+        }
+        if (item := getattr(record, "item", None)) is not None:
+            entry["stage"], entry["outcome"] = item
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RecordQueueHandler(QueueHandler):
+    """
+    a QueueHandler which keeps a record's traceback apart from its message (for the JSON
+     lines), rather than formatting it into the message
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or EXCEPTION_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class ProgressSummaryFilter(logging.Filter):
+    """drops per-video records, letting through a summary of them every `interval` seconds"""
+
+    def __init__(self, interval: float):
+        super().__init__()
+        self.interval = interval
+        self.counts: Counter[tuple[str, str]] = Counter()
+        self.last_summary = time.monotonic()
+
+    def filter(self, record: logging.LogRecord) -> bool | logging.LogRecord:
+        item = getattr(record, "item", None)
+        if item is None:
+            return True
+        self.counts[item] += 1
+        if time.monotonic() - self.last_summary < self.interval:
+            return False
+        return self.summary_record(record) or False
+
+    def summary_record(self, record: logging.LogRecord) -> logging.LogRecord | None:
+        """the counts since the last summary, as a record made from `record`"""
+        self.last_summary = time.monotonic()
+        if not self.counts:
+            return None
+        stages: dict[str, list[str]] = {}
+        for (stage, outcome), count in self.counts.items():
+            stages.setdefault(stage, []).append(f"{count} {outcome}")
+        self.counts.clear()
+        summary = copy.copy(record)
+        summary.msg = "PROGRESS: %s"
+        summary.args = ("; ".join(f"{stage}: {', '.join(outcomes)}" for stage, outcomes in stages.items()),)
+        summary.levelno = logging.INFO
+        summary.levelname = logging.getLevelName(logging.INFO)
+        summary.item = None
+        return summary
+
+
+def is_console_handler(handler: logging.Handler) -> bool:
+    return isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler)
+
+
+def setup_logging(args):
+    """
+    configure logging from args.logging_config_path, then move the configured handlers
+     (and a JSON lines one, with --log-json) behind a queue, until exit
+    """
+    setup_config_logging(args.logging_config_path)
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    if args.log_json is not None:
+        make_parent_dir(args.log_json)
+        json_handler = logging.FileHandler(args.log_json, "a", encoding="utf-8")
+        json_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(json_handler)
+    summary_filters = []
+    if args.quiet:
+        for handler in filter(is_console_handler, handlers):
+            summary_filter = ProgressSummaryFilter(args.progress_interval)
+            handler.addFilter(summary_filter)
+            summary_filters.append((handler, summary_filter))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = RecordQueueHandler(log_queue)
+    loggers = [root] + [
+        logger for logger in logging.Logger.manager.loggerDict.values() if isinstance(logger, logging.Logger)
+    ]
+    for logger in loggers:
+        moved = [handler for handler in logger.handlers if handler in handlers]
+        for handler in moved:
+            logger.removeHandler(handler)
+        if moved or logger is root:
+            logger.addHandler(queue_handler)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+
+    def stop():
+        listener.stop()
+        for handler, summary_filter in summary_filters:
+            record = summary_filter.summary_record(
+                logging.makeLogRecord({"name": __name__, "msg": "", "levelno": logging.INFO})
+            )
+            if record is not None:
+                handler.handle(record)
+
+    atexit.register(stop)
@@ -0,0 +1,355 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from utils_python import get_logger_with_class, make_parent_dir
+from yt_dlq.utils import YtdlqLogger
+
+LOGGER = get_logger_with_class(__name__, YtdlqLogger)
+
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, float("inf"))
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _label_key(labels: dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(label_key: LabelKey, extra: dict[str, str] | None = None) -> str:
+    pairs = [*label_key, *(extra or {}).items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric:
+    type_name = ""
+
+    def __init__(self, name: str, help_: str, lock: threading.Lock):
+        self.name = name
+        self.help = help_
+        self._lock = lock
+        self.values: dict[LabelKey, float] = {}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+        for label_key, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(label_key)} {_format_value(value)}")
+        return lines
+
+    def summary(self):
+        return [{**dict(label_key), "value": value} for label_key, value in self.values.items()]
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self.values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, help_, lock, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_, lock)
+        self.buckets = buckets
+        self.bucket_counts: dict[LabelKey, list[int]] = {}
+        self.sums: dict[LabelKey, float] = {}
+        self.maxima: dict[LabelKey, float] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            counts = self.bucket_counts.setdefault(key, [0] * len(self.buckets))
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    counts[i] += 1
+            self.sums[key] = self.sums.get(key, 0) + value
+            self.maxima[key] = max(self.maxima.get(key, value), value)
+
+    def time(self, **labels):
+        return _HistogramTimer(self, labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+        for label_key, counts in self.bucket_counts.items():
+            for upper_bound, count in zip(self.buckets, counts):
+                labels = _format_labels(label_key, {"le": _format_value(upper_bound)})
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(label_key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(self.sums[label_key])}")
+            lines.append(f"{self.name}_count{labels} {counts[-1]}")
+        return lines
+
+    def summary(self):
+        result = []
+        for label_key, counts in self.bucket_counts.items():
+            count = counts[-1]
+            total = self.sums[label_key]
+            result.append({
+                **dict(label_key),
+                "count": count,
+                "sum": total,
+                "mean": total / count if count else None,
+                "max": self.maxima[label_key],
+            })
+        return result
+
+
+class _HistogramTimer:
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.metrics: dict[str, Metric] = {}
+        self.started = time.time()
+
+    def _register(self, metric: Metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_: str) -> Counter:
+        return self._register(Counter(name, help_, self._lock))
+
+    def gauge(self, name: str, help_: str) -> Gauge:
+        return self._register(Gauge(name, help_, self._lock))
+
+    def histogram(self, name: str, help_: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_, self._lock, buckets))
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            lines = [line for metric in self.metrics.values() for line in metric.render()]
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        with self._lock:
+            summary = {
+                name: metric.summary() for name, metric in self.metrics.items()
+            }
+        elapsed = time.time() - self.started
+        downloaded_bytes = sum(v["value"] for v in summary[DOWNLOADED_BYTES.name])
+        download_seconds = sum(v["sum"] for v in summary[DOWNLOAD_SECONDS.name])
+        return {
+            "started": self.started,
+            "elapsed_seconds": elapsed,
+            "mean_transfer_rate_bytes_per_second": (
+                downloaded_bytes / download_seconds if download_seconds else None
+            ),
+            "metrics": summary,
+        }
+
+
+METRICS = MetricsRegistry()
+
+EXTRACT_INFO_SECONDS = METRICS.histogram(
+    "yt_dlq_extract_info_seconds",
+    "Time taken by each extract_info call, by URL category",
+)
+DOWNLOADED_BYTES = METRICS.counter(
+    "yt_dlq_downloaded_bytes_total",
+    "Bytes downloaded by yt-dlp",
+)
+DOWNLOAD_SPEED = METRICS.gauge(
+    "yt_dlq_download_speed_bytes_per_second",
+    "Transfer rate of the download in progress",
+)
+DOWNLOAD_SECONDS = METRICS.histogram(
+    "yt_dlq_download_seconds",
+    "Time taken to transfer each downloaded file",
+)
+POSTPROCESSOR_SECONDS = METRICS.histogram(
+    "yt_dlq_postprocessor_seconds",
+    "Time taken by each post-processor run, by post-processor",
+)
+QUEUE_DEPTH = METRICS.gauge(
+    "yt_dlq_queue_depth",
+    "Items remaining in the current extraction or download queue",
+)
+PLANNED_REQUESTS = METRICS.gauge(
+    "yt_dlq_planned_requests",
+    "Requests planned for extraction before it started, by kind",
+)
+RETRIES = METRICS.counter(
+    "yt_dlq_retries_total",
+    "Retried extractions and downloads, by reason",
+)
+SKIPS = METRICS.counter(
+    "yt_dlq_skips_total",
+    "Videos and playlists skipped, by stage and reason",
+)
+FAILURES = METRICS.counter(
+    "yt_dlq_failures_total",
+    "Videos which could not be downloaded, by stage",
+)
+
+
+def progress_hook(d: dict):
+    if d["status"] == "downloading":
+        if d.get("speed") is not None:
+            DOWNLOAD_SPEED.set(d["speed"])
+    elif d["status"] == "finished":
+        DOWNLOAD_SPEED.set(0)
+        downloaded_bytes = d.get("downloaded_bytes") or d.get("total_bytes")
+        if downloaded_bytes:
+            DOWNLOADED_BYTES.inc(downloaded_bytes)
+        if d.get("elapsed") is not None:
+            DOWNLOAD_SECONDS.observe(d["elapsed"])
+
+
+class PostprocessorTimer:
+    """postprocessor hook recording how long each post-processor takes"""
+
+    def __init__(self):
+        self.started: dict[str, float] = {}
+
+    def __call__(self, d: dict):
+        if d["status"] == "started":
+            self.started[d["postprocessor"]] = time.perf_counter()
+        elif d["status"] == "finished":
+            if (start := self.started.pop(d["postprocessor"], None)) is not None:
+                POSTPROCESSOR_SECONDS.observe(
+                    time.perf_counter() - start, postprocessor=d["postprocessor"]
+                )
+
+
+def add_ydl_hooks(ydl):
+    ydl.add_progress_hook(progress_hook)
+    ydl.add_postprocessor_hook(PostprocessorTimer())
+
+
+def _make_request_handler():
+    # http.server is only needed with --metrics-port, so it is imported on demand
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = METRICS.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            LOGGER.debug("metrics endpoint: " + format, *args)
+
+    return MetricsRequestHandler
+
+
+class MetricsExporter:
+    """
+    publishes METRICS as a Prometheus textfile (for node_exporter's textfile collector)
+     and/or on a localhost HTTP endpoint, and writes a JSON summary when stopped
+    """
+
+    def __init__(
+        self,
+        textfile: Path | None = None,
+        port: int | None = None,
+        summary_path: Path | None = None,
+        interval: float = 15,
+    ):
+        self.textfile = textfile
+        self.port = port
+        self.summary_path = summary_path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._server = None
+
+    def start(self):
+        if self.textfile is not None:
+            make_parent_dir(self.textfile)
+            thread = threading.Thread(
+                target=self._write_textfile_periodically,
+                name="yt-dlq-metrics-textfile",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+        if self.port is not None:
+            from http.server import ThreadingHTTPServer
+
+            self._server = ThreadingHTTPServer(("127.0.0.1", self.port), _make_request_handler())
+            thread = threading.Thread(
+                target=self._server.serve_forever,
+                name="yt-dlq-metrics-http",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+            LOGGER.info("Serving metrics on http://127.0.0.1:%d/metrics", self.port)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        if self.textfile is not None:
+            self.write_textfile()
+        if self.summary_path is not None:
+            make_parent_dir(self.summary_path)
+            with open(self.summary_path, "w", encoding="utf-8") as file:
+                json.dump(METRICS.summary(), file, indent=4)
+            LOGGER.info("Wrote metrics summary to '%s'", self.summary_path)
+
+    def write_textfile(self):
+        # node_exporter may read at any time, so never expose a half-written file
+        tmp_path = self.textfile.with_name(f"{self.textfile.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(METRICS.render_prometheus())
+        os.replace(tmp_path, self.textfile)
+
+    def _write_textfile_periodically(self):
+        while not self._stop.wait(self.interval):
+            self.write_textfile()
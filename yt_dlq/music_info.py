@@ -0,0 +1,108 @@
+"""
+track/artist/album/release info from YouTube Music's auto-generated video descriptions:
+
+    Provided to YouTube by <label>
+
+    <track> · <artist> · <artist>
+
+    <album>
+
+    ℗ <year> <label>
+
+    Released on: <yyyy-mm-dd>
+
+    Artist: <artist>
+    ...
+
+    Auto-generated by YouTube.
+"""
+
+import re
+from functools import lru_cache
+from typing import Iterable
+
+AUTO_GENERATED_SUFFIX = "\nAuto-generated by YouTube."
+
+# from yt-dlp's youtube extractor
+MUSIC_INFO_PATTERN = re.compile(
+    r"""(?xs)
+        (?=(?P<track>[^\n·]+))(?P=track)·
+        (?=(?P<artist>[^\n]+))(?P=artist)\n+
+        (?=(?P<album>[^\n]+))(?P=album)\n
+        (?:.+?℗\s*(?P<release_year>\d{4})(?!\d))?
+        (?:.+?Released\ on\s*:\s*(?P<release_date>\d{4}-\d{2}-\d{2}))?
+        (.+?\nArtist\s*:\s*
+            (?=(?P<clean_artist>[^\n]+))(?P=clean_artist)\n
+        )?.+\nAuto-generated\ by\ YouTube\.\s*$
+    """
+)
+
+# descriptions repeat within a run (a video in several playlists, re-extraction), and
+#  str caches its own hash, so a repeat costs one dict lookup
+CACHE_SIZE = 8192
+
+
+def is_auto_generated(description: str) -> bool:
+    # the pattern can only match a description ending with this, so anything else is
+    #  rejected without running it
+    return "·" in description and description.rstrip().endswith(AUTO_GENERATED_SUFFIX)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse(description: str) -> tuple | None:
+    if not is_auto_generated(description):
+        return None
+    mobj = MUSIC_INFO_PATTERN.search(description)
+    if not mobj:
+        return None
+    clean_artist = mobj.group("clean_artist")
+    return (
+        mobj.group("album"),
+        clean_artist or tuple(a.strip() for a in mobj.group("artist").split("·")),
+        mobj.group("track").strip(),
+        mobj.group("release_date"),
+        mobj.group("release_year"),
+    )
+
+
+def _to_dict(parsed: tuple | None, hyphenate_date: bool) -> dict:
+    if parsed is None:
+        return {}
+    album, artists, track, release_date, release_year = parsed
+    if release_date:
+        if not release_year:
+            release_year = release_date[:4]
+        if not hyphenate_date:
+            release_date = release_date.replace("-", "")
+    return {
+        "album": album,
+        # a new list each time, as callers may change the result
+        "artists": artists if isinstance(artists, str) else list(artists),
+        "track": track,
+        "release_date": release_date,
+        "release_year": int(release_year) if release_year else None,
+    }
+
+
+def parse_music_info(description: str | None, hyphenate_date=True) -> dict:
+    """music info from a description, or {} if it isn't auto-generated"""
+    if description is None:
+        return {}
+    return _to_dict(_parse(description), hyphenate_date)
+
+
+def parse_music_info_batch(
+    descriptions: Iterable[str | None], hyphenate_date=True
+) -> list[dict]:
+    """parse_music_info for each description, parsing each distinct one once"""
+    parsed = {None: None}
+    results = []
+    for description in descriptions:
+        if description not in parsed:
+            parsed[description] = _parse(description)
+        results.append(_to_dict(parsed[description], hyphenate_date))
+    return results
+
+
+def cache_info():
+    return _parse.cache_info()
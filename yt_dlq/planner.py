@@ -0,0 +1,125 @@
+"""
+planning the requests extraction will make for a batch, before making them
+
+a batch is a graph: channels have tabs (releases, playlists, videos), tabs list
+ playlists, and playlists list videos. planning drops the items which something broader
+ in the batch or the archive already covers, and counts the listing and video requests
+ left, so that a run can be budgeted before it starts; a video whose info the info cache
+ or another batch's archive (via the catalog) has costs no request. which videos are new
+ to a playlist or videos tab isn't known until it's listed, so those requests aren't
+ counted
+"""
+
+from collections.abc import Collection
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from utils_python import get_logger_with_class
+from yt_dlq.metrics import PLANNED_REQUESTS, SKIPS
+from yt_dlq.types import PLAYLIST_CATEGORIES, UrlCategoryDict
+from yt_dlq.url.utils import get_url_id
+from yt_dlq.utils import YtdlqLogger
+
+if TYPE_CHECKING:
+    from yt_dlq.info_cache import InfoCache
+
+LOGGER = get_logger_with_class(__name__, YtdlqLogger)
+
+# requests to list a URL of each category; a channel is resolved by listing its releases,
+#  playlists and videos tabs
+LISTING_REQUESTS = {"channel": 3}
+CHANNEL_TAB_CATEGORIES = ("channel_releases", "channel_playlists", "channel_videos")
+
+
+@dataclass
+class RequestPlan:
+    urls: UrlCategoryDict
+    # (category, URL, why it's not needed)
+    dropped: list[tuple[str, str, str]] = field(default_factory=list)
+    listing_requests: int = 0
+    video_requests: int = 0
+    cached_videos: int = 0
+
+    @property
+    def requests(self) -> int:
+        return self.listing_requests + self.video_requests
+
+    def summary(self) -> str:
+        counts = ", ".join(
+            f"{len(urls)} {category}" for category, urls in self.urls.items() if urls
+        )
+        return (
+            f"{self.requests} requests planned ({self.listing_requests} listings,"
+            f" {self.video_requests} videos; {self.cached_videos} videos cached),"
+            f" plus one per new video listed; {len(self.dropped)} URLs dropped;"
+            f" {counts or 'nothing'} left"
+        )
+
+    def describe(self) -> str:
+        lines = [self.summary()]
+        lines += [f"  dropped {category} {url}: {reason}" for category, url, reason in self.dropped]
+        return "\n".join(lines)
+
+
+def _url_id(url: str) -> str:
+    try:
+        return get_url_id(url)
+    except ValueError:
+        return url
+
+
+def plan_requests(
+    url_dict: UrlCategoryDict,
+    seen_video_ids: set[str],
+    info_cache: "InfoCache | None" = None,
+    archived_video_ids: Collection[str] = (),
+) -> RequestPlan:
+    """
+    the URLs of url_dict (categorised, or with channels resolved) which need fetching, and
+     the requests that will take; archived_video_ids are those in other batches' archives
+    """
+    plan = RequestPlan({category: {} for category in url_dict})
+    # the same playlist can come from several URLs (e.g. www. and music.) or categories
+    #  (a release given on its own and in its channel's releases tab)
+    playlist_urls: dict[str, str] = {}
+    channel_urls = set(url_dict.get("channel", ()))
+    for category, urls in url_dict.items():
+        for url, title in urls.items():
+            reason = None
+            cached = False
+            if category in CHANNEL_TAB_CATEGORIES:
+                channel_url = url.removesuffix(f"/{category.removeprefix('channel_')}")
+                if channel_url in channel_urls:
+                    reason = f"covered by channel {channel_url}"
+            elif category in PLAYLIST_CATEGORIES:
+                kept_url = playlist_urls.setdefault(_url_id(url), url)
+                if kept_url != url:
+                    reason = f"same playlist as {kept_url}"
+            elif category == "video":
+                video_id = _url_id(url)
+                if video_id in seen_video_ids:
+                    reason = "already archived"
+                else:
+                    cached = video_id in archived_video_ids or (
+                        info_cache is not None and video_id in info_cache
+                    )
+            if reason is not None:
+                plan.dropped.append((category, url, reason))
+                continue
+            plan.urls[category][url] = title
+            if category != "video":
+                plan.listing_requests += LISTING_REQUESTS.get(category, 1)
+            elif cached:
+                plan.cached_videos += 1
+            else:
+                plan.video_requests += 1
+    return plan
+
+
+def report_plan(plan: RequestPlan, stage: str):
+    for category, url, reason in plan.dropped:
+        LOGGER.info(f"PLAN: SKIPPING {category} {url!r} ({reason})")
+        SKIPS.inc(stage="plan", reason="covered")
+    LOGGER.info(f"PLAN ({stage}): {plan.summary()}")
+    PLANNED_REQUESTS.set(plan.listing_requests, kind="listing")
+    PLANNED_REQUESTS.set(plan.video_requests, kind="video")
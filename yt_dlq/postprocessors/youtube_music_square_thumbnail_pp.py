@@ -1,5 +1,6 @@
 import logging
 from io import BytesIO
+from pathlib import Path
 from typing import Any
 
 from mutagen.mp4 import MP4, MP4Cover
@@ -9,6 +10,9 @@ from yt_dlp.postprocessor.common import PostProcessor
 
 LOGGER = logging.getLogger(__name__)
 
+# the cover is read from and written to an MP4 tag, which mp3 and mkv output doesn't have
+MP4_SUFFIXES = {".m4a", ".mp4"}
+
 
 class MissingCoverError(Exception): ...
 
@@ -44,6 +48,8 @@ class YouTubeMusicSquareThumbnailPP(PostProcessor):
     def run(self, information: dict[str, Any]):
         if not information["description"].endswith("Auto-generated by YouTube."):
             return [], information
+        if Path(information["filepath"]).suffix not in MP4_SUFFIXES:
+            return [], information
         mp4 = MP4(information["filepath"])
         img = load_album_art(mp4)
         img_cropped = crop_center_square(img)
@@ -0,0 +1,159 @@
+import atexit
+import cProfile
+import pstats
+import re
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+from utils_python import get_logger_with_class
+from yt_dlq.utils import YtdlqLogger
+
+LOGGER = get_logger_with_class(__name__, YtdlqLogger)
+
+TOP_ALLOCATIONS = 25
+MIB = 1024 * 1024
+
+
+class PhaseStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.wall_seconds = 0.0
+        self.peak_bytes = 0
+        self.profile = cProfile.Profile()
+        self.snapshot: tracemalloc.Snapshot | None = None
+
+    def record(self, wall_seconds: float, peak_bytes: int):
+        self.calls += 1
+        self.wall_seconds += wall_seconds
+        if peak_bytes > self.peak_bytes:
+            self.peak_bytes = peak_bytes
+            # only the worst call's allocations are kept, which bounds the cost of snapshots
+            self.snapshot = tracemalloc.take_snapshot()
+
+
+class _Frame:
+    def __init__(self, stats: PhaseStats):
+        self.stats = stats
+        self.start = time.perf_counter()
+        self.peak_bytes = 0
+
+
+class Profiler:
+    """
+    per-phase cProfile stats and tracemalloc peaks
+
+    phases nest: while a child phase runs, its parent's profile is paused, so each
+     .prof file holds only the time spent in that phase itself; wall times and memory
+     peaks include child phases
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.profile_dir: Path | None = None
+        self.phases: dict[str, PhaseStats] = {}
+        self._stack: list[_Frame] = []
+
+    def start(self, profile_dir: Path):
+        self.enabled = True
+        self.profile_dir = profile_dir
+        tracemalloc.start()
+        atexit.register(self.finish)
+        LOGGER.info("Profiling enabled; results will be written to '%s'", profile_dir)
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        self.push(name)
+        try:
+            yield
+        finally:
+            self.pop(name)
+
+    def push(self, name: str):
+        if self._stack:
+            parent = self._stack[-1]
+            parent.stats.profile.disable()
+            parent.peak_bytes = max(parent.peak_bytes, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        stats = self.phases.setdefault(name, PhaseStats(name))
+        self._stack.append(_Frame(stats))
+        stats.profile.enable()
+
+    def pop(self, name: str):
+        # unwinds any phases left open, e.g. a post-processor which raised before its
+        #  "finished" hook could run
+        while self._stack:
+            frame = self._stack.pop()
+            frame.stats.profile.disable()
+            peak_bytes = max(frame.peak_bytes, tracemalloc.get_traced_memory()[1])
+            frame.stats.record(time.perf_counter() - frame.start, peak_bytes)
+            if self._stack:
+                parent = self._stack[-1]
+                parent.peak_bytes = max(parent.peak_bytes, peak_bytes)
+                tracemalloc.reset_peak()
+                parent.stats.profile.enable()
+            if frame.stats.name == name:
+                break
+
+    def postprocessor_hook(self, d: dict):
+        name = f"postprocess:{d['postprocessor']}"
+        if d["status"] == "started":
+            self.push(name)
+        elif d["status"] == "finished":
+            self.pop(name)
+
+    def finish(self):
+        if not self.enabled:
+            return
+        while self._stack:
+            self.pop(self._stack[0].stats.name)
+        self.enabled = False
+        tracemalloc.stop()
+
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        for stats in self.phases.values():
+            file_stem = re.sub(r"[^\w.-]", "_", stats.name)
+            stats.profile.dump_stats(Path(self.profile_dir, f"{file_stem}.prof"))
+            if stats.snapshot is not None:
+                top_stats = stats.snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+                with open(Path(self.profile_dir, f"{file_stem}.alloc.txt"), "w") as file:
+                    file.write(f"peak: {stats.peak_bytes / MIB:.1f} MiB\n")
+                    file.writelines(f"{stat}\n" for stat in top_stats)
+
+        summary = self.summary_table()
+        with open(Path(self.profile_dir, "summary.txt"), "w") as file:
+            file.write(summary + "\n")
+        LOGGER.info("Profile summary (written to '%s'):\n%s", self.profile_dir, summary)
+
+    def summary_table(self) -> str:
+        rows = [("phase", "calls", "wall s", "self s", "peak MiB")]
+        for stats in sorted(
+            self.phases.values(), key=lambda stats: stats.wall_seconds, reverse=True
+        ):
+            try:
+                self_seconds = pstats.Stats(stats.profile).total_tt
+            except TypeError:  # nothing was recorded
+                self_seconds = 0.0
+            rows.append((
+                stats.name,
+                str(stats.calls),
+                f"{stats.wall_seconds:.3f}",
+                f"{self_seconds:.3f}",
+                f"{stats.peak_bytes / MIB:.1f}",
+            ))
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        return "\n".join(
+            "  ".join(
+                cell.ljust(width) if i == 0 else cell.rjust(width)
+                for i, (cell, width) in enumerate(zip(row, widths))
+            )
+            for row in rows
+        )
+
+
+PROFILER = Profiler()
@@ -0,0 +1,442 @@
+"""
+compact, read-only records for archive entries, streamed from `_json` archives one
+ channel at a time
+
+records support the subset of the mapping interface used on archive dicts (`r["key"]`,
+ `r.get("key")`, `"key" in r`), so code handling archive dicts works on either.
+ descriptions, usually the bulk of an archive, are left on disk and re-read from
+ their channel the first time one is accessed
+"""
+
+import codecs
+import json
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Iterator, Sequence
+
+from utils_python import get_logger_with_class
+from yt_dlq.file import restrict_filename
+from yt_dlq.store import STORE_SUFFIXES, SqliteStore
+from yt_dlq.utils import YtdlqLogger
+
+LOGGER = get_logger_with_class(__name__, YtdlqLogger)
+
+CHUNK_SIZE = 1024 * 1024
+JSON_WHITESPACE = " \t\n\r"
+
+
+@dataclass(slots=True, frozen=True)
+class ChannelSpan:
+    """where a channel's JSON lies in an archive file, for re-reading descriptions"""
+
+    path: Path
+    offset: int
+    length: int
+    # the reader's cache of re-read channels
+    cache: "SpanCache | None" = field(default=None, compare=False, repr=False)
+
+
+def _read_channel_dict(span: ChannelSpan) -> dict | None:
+    try:
+        with open(span.path, "rb") as file:
+            file.seek(span.offset)
+            return json.loads(file.read(span.length))
+    except (OSError, json.JSONDecodeError):
+        LOGGER.warning("Could not re-read descriptions from '%s'; was it modified?", span.path)
+        return None
+
+
+class SpanCache:
+    """
+    the channels most recently re-read by a reader, by span. records are consumed
+     channel by channel, so a reader needs as many as one channel has spans: one for a
+     single archive, and one per archive for merged archives, whose channels' videos
+     come from the span of each archive in turn
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.channels: OrderedDict[ChannelSpan, dict | None] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, span: ChannelSpan) -> dict | None:
+        with self._lock:
+            if span in self.channels:
+                self.channels.move_to_end(span)
+                return self.channels[span]
+        channel = _read_channel_dict(span)
+        with self._lock:
+            self.channels[span] = channel
+            while len(self.channels) > self.size:
+                self.channels.popitem(last=False)
+        return channel
+
+
+def _load_channel_dict(span: ChannelSpan) -> dict | None:
+    if span.cache is None:
+        return _read_channel_dict(span)
+    return span.cache.load(span)
+
+
+class _Record:
+    __slots__ = ()
+
+    def __getitem__(self, key: str):
+        if key in self._field_names:
+            return getattr(self, key)
+        if key == "description":
+            return self.description
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        # a field which was absent from the archive is stored as None
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def __contains__(self, key: str):
+        return self.get(key) is not None
+
+    def _description_path(self) -> list[str]:
+        raise NotImplementedError
+
+    @property
+    def span(self) -> ChannelSpan | None:
+        """where the record's channel lies in its archive"""
+        return self._span
+
+    @property
+    def description(self) -> str | None:
+        if self._span is None:
+            return None
+        item = _load_channel_dict(self._span)
+        for key in self._description_path():
+            if item is None:
+                return None
+            item = item.get("entries", {}).get(key)
+        return item and item.get("description")
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _intern_values(value: dict | None) -> dict | None:
+    if not value:
+        return value
+    return {sys.intern(k): _intern(v) for k, v in value.items()}
+
+
+def _merge_scalars(record: _Record, newer: _Record):
+    for name in record._field_names - {"id", "entries"}:
+        if (value := getattr(newer, name)) is not None:
+            setattr(record, name, value)
+    record._span = newer._span
+
+
+def _split_known(cls, data: dict) -> tuple[dict, dict | None]:
+    known, extra = {}, {}
+    for key, value in data.items():
+        if key in cls._field_names:
+            known[key] = value
+        elif key not in ("description", "entries"):
+            extra[key] = value
+    return known, extra or None
+
+
+@dataclass(slots=True)
+class VideoRecord(_Record):
+    id: str
+    type: str = "video"
+    title: str | None = None
+    url: str | None = None
+    upload_date: str | None = None
+    uploader: str | None = None
+    index: int | None = None
+    music_info: dict | None = None
+    duration: float | None = None
+    availability: str | None = None
+    extra: dict | None = None
+    _span: ChannelSpan | None = field(default=None, repr=False)
+    _playlist_key: str = field(default="", repr=False)
+
+    def _description_path(self):
+        return [self._playlist_key, self.id]
+
+    @classmethod
+    def from_dict(cls, data: dict, span: ChannelSpan | None, playlist_key: str):
+        known, extra = _split_known(cls, data)
+        record = cls(**known, extra=extra, _span=span, _playlist_key=playlist_key)
+        # repeated across many videos, so share one copy of each
+        record.type = _intern(record.type)
+        record.upload_date = _intern(record.upload_date)
+        record.uploader = _intern(record.uploader)
+        record.availability = _intern(record.availability)
+        record.music_info = _intern_values(record.music_info)
+        return record
+
+
+@dataclass(slots=True)
+class PlaylistRecord(_Record):
+    id: str
+    type: str
+    title: str | None = None
+    url: str | None = None
+    music_info: dict | None = None
+    entries: dict[str, VideoRecord] = field(default_factory=dict)
+    extra: dict | None = None
+    _span: ChannelSpan | None = field(default=None, repr=False)
+    _playlist_key: str = field(default="", repr=False)
+
+    def _description_path(self):
+        return [self._playlist_key]
+
+    @classmethod
+    def from_dict(cls, data: dict, span: ChannelSpan | None, playlist_key: str):
+        known, extra = _split_known(cls, data)
+        known.setdefault("id", playlist_key)
+        record = cls(**known, extra=extra, _span=span, _playlist_key=playlist_key)
+        record.type = _intern(record.type)
+        record.music_info = _intern_values(record.music_info)
+        record.entries = {
+            sys.intern(video_id): VideoRecord.from_dict(video, span, playlist_key)
+            for video_id, video in data.get("entries", {}).items()
+        }
+        return record
+
+    def merge(self, newer: "PlaylistRecord"):
+        _merge_scalars(self, newer)
+        self._playlist_key = newer._playlist_key
+        # a video in both is taken whole from the newer archive, in its original position
+        self.entries.update(newer.entries)
+
+
+@dataclass(slots=True)
+class ChannelRecord(_Record):
+    id: str
+    type: str = "channel"
+    title: str | None = None
+    url: str | None = None
+    entries: dict[str, PlaylistRecord] = field(default_factory=dict)
+    extra: dict | None = None
+    _span: ChannelSpan | None = field(default=None, repr=False)
+
+    def _description_path(self):
+        return []
+
+    @classmethod
+    def from_dict(cls, data: dict, span: ChannelSpan | None, channel_key: str):
+        known, extra = _split_known(cls, data)
+        known.setdefault("id", channel_key)
+        record = cls(**known, extra=extra, _span=span)
+        record.title = _intern(record.title)
+        for playlist_key, playlist in data.get("entries", {}).items():
+            playlist_record = PlaylistRecord.from_dict(playlist, span, playlist_key)
+            if playlist_record.title and not playlist_key:
+                # a titled playlist stored without an ID is keyed by its filename-safe title
+                playlist_record.id = restrict_filename(playlist_record.title)
+            record.entries[sys.intern(playlist_record.id)] = playlist_record
+        return record
+
+    def merge(self, newer: "ChannelRecord"):
+        _merge_scalars(self, newer)
+        for playlist_id, playlist in newer.entries.items():
+            if (existing := self.entries.get(playlist_id)) is None:
+                self.entries[playlist_id] = playlist
+            else:
+                existing.merge(playlist)
+
+    def video_count(self) -> int:
+        return sum(len(playlist.entries) for playlist in self.entries.values())
+
+
+for _cls in (VideoRecord, PlaylistRecord, ChannelRecord):
+    # a plain class attribute, so that it isn't taken for a dataclass field
+    _cls._field_names = frozenset(f.name for f in fields(_cls) if not f.name.startswith("_"))
+
+
+class _JsonObjectStream:
+    """
+    iterates over the members of a top-level JSON object, decoding one value at a time
+     and tracking the byte offset of each
+    """
+
+    def __init__(self, file, chunk_size: int = CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.byte_pos = 0  # byte offset in the file of buffer[pos]
+        self.eof = False
+
+    def _fill(self, size: int) -> bool:
+        if self.eof:
+            return False
+        if self.pos > len(self.buffer) // 2:
+            self.buffer = self.buffer[self.pos :]
+            self.pos = 0
+        data = self.file.read(size)
+        self.eof = not data
+        self.buffer += self.text_decoder.decode(data, final=self.eof)
+        return True
+
+    def _advance(self, new_pos: int):
+        self.byte_pos += len(self.buffer[self.pos : new_pos].encode("utf-8"))
+        self.pos = new_pos
+
+    def _next_char(self) -> str:
+        """skip whitespace, then return (without consuming) the next character"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in JSON_WHITESPACE:
+                self._advance(self.pos + 1)
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill(self.chunk_size):
+                raise json.JSONDecodeError("Unexpected end of file", self.buffer, self.pos)
+
+    def _expect(self, chars: str) -> str:
+        char = self._next_char()
+        if char not in chars:
+            raise json.JSONDecodeError(f"Expected one of {chars!r}", self.buffer, self.pos)
+        self._advance(self.pos + 1)
+        return char
+
+    def _decode_value(self):
+        self._next_char()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # value is incomplete: read at least as much again, so that a huge
+                #  value is decoded in O(size) rather than O(size^2)
+                if not self._fill(max(self.chunk_size, len(self.buffer) - self.pos)):
+                    raise
+                continue
+            start_byte = self.byte_pos
+            self._advance(end)
+            return value, start_byte, self.byte_pos - start_byte
+
+    def __iter__(self) -> Iterator[tuple[str, object, int, int]]:
+        self._expect("{")
+        if self._next_char() == "}":
+            return
+        while True:
+            key, _, _ = self._decode_value()
+            self._expect(":")
+            value, offset, length = self._decode_value()
+            yield key, value, offset, length
+            if self._expect(",}") == "}":
+                return
+
+
+def iter_channel_records(
+    path: Path, cache: SpanCache | None = None
+) -> Iterator[tuple[str, ChannelRecord]]:
+    with open(path, "rb") as file:
+        for channel_key, channel, offset, length in _JsonObjectStream(file):
+            span = ChannelSpan(path, offset, length, cache)
+            yield channel_key, ChannelRecord.from_dict(channel, span, channel_key)
+
+
+class ArchiveReader:
+    """
+    the channels of a `_json` archive, streamed from disk on each iteration so that
+     only one channel is held in memory at a time
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.span_cache = SpanCache(1)
+
+    def items(self) -> Iterator[tuple[str, ChannelRecord]]:
+        return iter_channel_records(self.path, self.span_cache)
+
+    def values(self) -> Iterator[ChannelRecord]:
+        return (channel for _, channel in self.items())
+
+    def __iter__(self) -> Iterator[str]:
+        return (channel_id for channel_id, _ in self.items())
+
+
+class MergedArchiveReader:
+    """
+    the channels of several `_json` archives merged into one, streamed channel by channel
+
+    precedence: archives are applied oldest first (by mtime), so for a channel, playlist
+     or video present in several, the newest archive's values win. a video collected as
+     a loose video in one archive but in a playlist in another is only kept in the
+     playlist, as it would have been had both been collected in the same run
+
+    an index pass records where each channel lies in each archive; each iteration then
+     reads only the spans of one channel at a time, so memory stays in proportion to the
+     largest channel rather than to the merged archive
+    """
+
+    def __init__(self, paths: Sequence[Path]):
+        self.paths = sorted(paths, key=lambda path: (path.stat().st_mtime, str(path)))
+        self.spans: dict[str, list[ChannelSpan]] = {}
+        self.playlisted_video_ids: set[str] = set()
+        self.span_cache = SpanCache(len(self.paths))
+        for path in self.paths:
+            with open(path, "rb") as file:
+                for channel_key, channel, offset, length in _JsonObjectStream(file):
+                    self.spans.setdefault(sys.intern(channel_key), []).append(
+                        ChannelSpan(path, offset, length, self.span_cache)
+                    )
+                    for playlist in channel.get("entries", {}).values():
+                        if playlist.get("type") != "videos_loose":
+                            self.playlisted_video_ids.update(playlist.get("entries", {}))
+        LOGGER.info(
+            "Indexed %d channels across %d archives", len(self.spans), len(self.paths)
+        )
+
+    def __len__(self):
+        return len(self.spans)
+
+    def items(self) -> Iterator[tuple[str, ChannelRecord]]:
+        for channel_key, spans in self.spans.items():
+            merged = None
+            for span in spans:
+                with open(span.path, "rb") as file:
+                    file.seek(span.offset)
+                    channel = json.loads(file.read(span.length))
+                record = ChannelRecord.from_dict(channel, span, channel_key)
+                if merged is None:
+                    merged = record
+                else:
+                    merged.merge(record)
+            for playlist in merged.entries.values():
+                if playlist.type == "videos_loose":
+                    for video_id in self.playlisted_video_ids.intersection(playlist.entries):
+                        del playlist.entries[video_id]
+            yield channel_key, merged
+
+    def values(self) -> Iterator[ChannelRecord]:
+        return (channel for _, channel in self.items())
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.spans)
+
+
+def open_json_files(
+    json_files: Sequence[Path],
+) -> ArchiveReader | MergedArchiveReader | SqliteStore:
+    sqlite_files = [path for path in json_files if path.suffix == STORE_SUFFIXES["sqlite"]]
+    if sqlite_files:
+        if len(json_files) > 1:
+            raise ValueError(
+                f"SQLite archives can't be merged with other archives: {sqlite_files}"
+            )
+        return SqliteStore(json_files[0])
+    if len(json_files) == 1:
+        return ArchiveReader(json_files[0])
+    return MergedArchiveReader(json_files)
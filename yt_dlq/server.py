@@ -0,0 +1,552 @@
+"""
+`yt-dlq serve`: a long-running process that takes jobs over localhost HTTP and runs
+ them with YoutubeDLs and library indexes kept warm between jobs, so each job skips
+ the yt-dlp import, YoutubeDL construction, cookie loading and library scan
+
+`yt-dlq submit`: queue a job (the usual yt-dlq arguments) and follow its log
+
+    yt-dlq serve [--port PORT] [--workers N] [yt-dlq options applied to every job]
+    yt-dlq submit [--server URL] [--detach] [yt-dlq arguments]
+
+API (JSON):
+    POST /jobs                      {"argv": [...], "cwd": "..."} -> job
+    GET  /jobs                      -> [job, ...]
+    GET  /jobs/<id>                 -> job
+    GET  /jobs/<id>/log?offset=N    -> {"status", "offset", "text"}, waiting briefly
+                                        for new output if there isn't any yet
+
+jobs are kept as JSON files in the queue dir, so pending jobs (and any interrupted
+ while running) are picked up again when the server restarts
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import urllib.error
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from utils_python import get_logger_with_class
+from yt_dlq.args import ProgramArgsNamespace, make_parser, process_args
+from yt_dlq.logs import setup_logging
+from yt_dlq.metrics import QUEUE_DEPTH, MetricsExporter
+from yt_dlq.utils import YtdlqLogger
+
+LOGGER = get_logger_with_class(__name__, YtdlqLogger)
+
+DEFAULT_PORT = 8765
+LOG_WAIT_SECONDS = 20
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+# options set up once by `yt-dlq serve` for the whole process, which a job can't change
+SERVER_ONLY_OPTIONS = {
+    "logging_config_path": "--logging-config-path",
+    "log_json": "--log-json",
+    "quiet": "--quiet",
+    "progress_interval": "--progress-interval",
+    "metrics_textfile": "--metrics-textfile",
+    "metrics_port": "--metrics-port",
+    "metrics_summary": "--metrics-summary",
+    "profile": "--profile",
+    "profile_dir": "--profile-dir",
+}
+_UNSET = object()
+
+
+class JobQueue:
+    """jobs as `<queue_dir>/<id>.json`, with each job's log in `<queue_dir>/<id>.log`"""
+
+    def __init__(self, queue_dir: Path):
+        self.queue_dir = queue_dir
+        self.queue_dir.mkdir(parents=True, exist_ok=True)
+        self.jobs: dict[str, dict] = {}
+        # notified whenever a job is added, changes status or logs something
+        self.changed = threading.Condition()
+        for path in sorted(self.queue_dir.glob("*.json")):
+            with open(path, "r", encoding="utf-8") as file:
+                job = json.load(file)
+            if job["status"] == RUNNING:
+                LOGGER.info("Job %s was interrupted; queueing it again", job["id"])
+                job["status"] = PENDING
+                self._write(job)
+            self.jobs[job["id"]] = job
+        self._update_queue_depth()
+
+    def _write(self, job: dict):
+        path = Path(self.queue_dir, f"{job['id']}.json")
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(job, file, indent=4)
+        os.replace(tmp_path, path)
+
+    def _update_queue_depth(self):
+        QUEUE_DEPTH.set(
+            sum(1 for job in self.jobs.values() if job["status"] == PENDING), queue="jobs"
+        )
+
+    def log_path(self, job_id: str) -> Path:
+        return Path(self.queue_dir, f"{job_id}.log")
+
+    def submit(self, argv: list[str], cwd: str) -> dict:
+        job_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        job = {
+            "id": job_id,
+            "argv": argv,
+            "cwd": cwd,
+            "status": PENDING,
+            "submitted": time.time(),
+            "started": None,
+            "finished": None,
+            "error": None,
+        }
+        with self.changed:
+            self._write(job)
+            self.jobs[job_id] = job
+            self._update_queue_depth()
+            self.changed.notify_all()
+        return job
+
+    def take(self) -> dict:
+        """wait for the oldest pending job, and mark it as running"""
+        with self.changed:
+            while True:
+                pending = [job for job in self.jobs.values() if job["status"] == PENDING]
+                if pending:
+                    job = min(pending, key=lambda job: job["submitted"])
+                    self.update(job, status=RUNNING, started=time.time())
+                    return job
+                self.changed.wait()
+
+    def update(self, job: dict, **changes):
+        with self.changed:
+            job.update(changes)
+            self._write(job)
+            self._update_queue_depth()
+            self.changed.notify_all()
+
+    def read_log(self, job_id: str, offset: int, wait: float) -> tuple[str, int]:
+        """log text from offset on, waiting up to `wait` seconds if there's none yet"""
+        deadline = time.monotonic() + wait
+        log_path = self.log_path(job_id)
+        with self.changed:
+            while True:
+                try:
+                    with open(log_path, "r", encoding="utf-8") as file:
+                        file.seek(offset)
+                        text = file.read()
+                        new_offset = file.tell()
+                except FileNotFoundError:
+                    text, new_offset = "", offset
+                remaining = deadline - time.monotonic()
+                if text or self.jobs[job_id]["status"] in FINISHED or remaining <= 0:
+                    return text, new_offset
+                self.changed.wait(remaining)
+
+
+class JobLogHandler(logging.Handler):
+    """copies log records from each worker thread into the log of the job it's running"""
+
+    def __init__(self, queue: JobQueue):
+        super().__init__(logging.INFO)
+        self.queue = queue
+        self.files: dict[int, io.TextIOBase] = {}
+        self.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+
+    @contextmanager
+    def capture(self, job_id: str):
+        thread_id = threading.get_ident()
+        with open(self.queue.log_path(job_id), "a", encoding="utf-8") as file:
+            self.files[thread_id] = file
+            try:
+                yield
+            finally:
+                del self.files[thread_id]
+
+    def emit(self, record: logging.LogRecord):
+        file = self.files.get(record.thread)
+        if file is None:
+            return
+        try:
+            file.write(self.format(record) + "\n")
+            file.flush()
+        except Exception:
+            self.handleError(record)
+            return
+        with self.queue.changed:
+            self.queue.changed.notify_all()
+
+
+class YdlPool:
+    """idle YoutubeDLs, keyed by the options they were made with"""
+
+    def __init__(self, make_ydl, key_attrs: tuple[str, ...]):
+        self.make_ydl = make_ydl
+        self.key_attrs = key_attrs
+        self.idle: dict[tuple, list] = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self, args: ProgramArgsNamespace):
+        key = tuple(str(getattr(args, attr)) for attr in self.key_attrs)
+        with self.lock:
+            idle = self.idle.setdefault(key, [])
+            ydl = idle.pop() if idle else None
+        if ydl is None:
+            LOGGER.info("Creating YoutubeDL for %s", dict(zip(self.key_attrs, key)))
+            ydl = self.make_ydl(args)
+        try:
+            yield ydl
+        finally:
+            with self.lock:
+                self.idle[key].append(ydl)
+
+    def close(self):
+        with self.lock:
+            for ydls in self.idle.values():
+                for ydl in ydls:
+                    ydl.close()
+            self.idle.clear()
+
+
+class Libraries:
+    """
+    the index of videos already in each library (output dir, extra dirs and format),
+     scanned by the first job for it and then kept up to date with each job's downloads;
+     jobs for the same library run one at a time
+    """
+
+    def __init__(self):
+        self.indexes: dict[tuple, dict[str, list[Path]]] = {}
+        self.locks: dict[tuple, threading.Lock] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(args: ProgramArgsNamespace) -> tuple:
+        return (
+            args.output_dir.resolve(),
+            tuple(path.resolve() for path in args.extra_dirs),
+            args.output_format,
+            args.dl_duplicates,
+            args.staging_dir is None,
+        )
+
+    @contextmanager
+    def use(self, args: ProgramArgsNamespace):
+        key = self.key(args)
+        with self.lock:
+            lock = self.locks.setdefault(key, threading.Lock())
+        with lock:
+            yield self.indexes.get(key)
+
+    def update(self, args: ProgramArgsNamespace, index: dict, new_videos: dict):
+        for video_id, paths in new_videos.items():
+            index.setdefault(video_id, []).extend(paths)
+        self.indexes[self.key(args)] = index
+
+
+def resolve_paths(args: ProgramArgsNamespace, cwd: Path, names: set[str] | None = None):
+    """make relative paths in args (or only those of `names`) relative to cwd"""
+    for name, value in vars(args).items():
+        if names is not None and name not in names:
+            continue
+        if isinstance(value, Path) and not value.is_absolute():
+            setattr(args, name, Path(cwd, value))
+        elif isinstance(value, list) and value and all(isinstance(v, Path) for v in value):
+            setattr(args, name, [v if v.is_absolute() else Path(cwd, v) for v in value])
+
+
+def given_options(argv: list[str]) -> set[str]:
+    """the dests of the options argv gives, leaving out defaults"""
+    parser = make_parser()
+    namespace = argparse.Namespace(**dict.fromkeys(ProgramArgsNamespace.__annotations__, _UNSET))
+    parsed = parser.parse_args(argv, namespace=namespace)
+    return {name for name, value in vars(parsed).items() if value is not _UNSET}
+
+
+def parse_job_args(base_argv: list[str], job: dict) -> ProgramArgsNamespace:
+    """
+    the job's arguments after the server's; raises ValueError if they're invalid.
+     relative paths given by the job are the client's, and all others (the server's
+     options and defaults) are the server's
+    """
+    stderr = io.StringIO()
+    try:
+        with contextlib.redirect_stderr(stderr):
+            args = process_args([*base_argv, *job["argv"]], interactive=False)
+    except SystemExit as exc:
+        # the last line is the error; the rest is usage
+        message = stderr.getvalue().strip().splitlines()[-1:] or [f"exit code {exc.code}"]
+        raise ValueError(f"invalid arguments: {message[0]}")
+    except AssertionError as exc:
+        raise ValueError(str(exc))
+    if not any((args.json_file, args.batchfile, args.urls)):
+        raise ValueError("no URLs, batch file or JSON file given")
+    if args.batchfile == Path("-"):
+        raise ValueError("the server can't read the client's stdin; pass a file instead")
+    job_options = given_options(job["argv"])
+    if server_only := [
+        option for name, option in SERVER_ONLY_OPTIONS.items() if name in job_options
+    ]:
+        raise ValueError(f"{', '.join(server_only)} can only be given to `yt-dlq serve`")
+    resolve_paths(args, Path(job["cwd"]), job_options)
+    resolve_paths(args, Path.cwd())
+    return args
+
+
+class Server:
+    def __init__(self, base_argv: list[str], queue_dir: Path, workers: int):
+        # the yt_dlp import is paid once, here, rather than by each job
+        from yt_dlq.download import Downloader
+        from yt_dlq.url.info_extractor import YoutubeInfoExtractor
+
+        self.base_argv = base_argv
+        self.queue = JobQueue(queue_dir)
+        self.workers = workers
+        self.extract_ydls = YdlPool(YoutubeInfoExtractor.make_ydl, ("verbose", "cookies"))
+        self.download_ydls = YdlPool(
+            Downloader.make_ydl, ("verbose", "output_format", "ffmpeg_location", "cookies")
+        )
+        self.libraries = Libraries()
+        self.log_handler = JobLogHandler(self.queue)
+        logging.getLogger().addHandler(self.log_handler)
+
+    def start_workers(self):
+        for index in range(self.workers):
+            threading.Thread(
+                target=self.work, name=f"yt-dlq-worker-{index}", daemon=True
+            ).start()
+
+    def work(self):
+        while True:
+            job = self.queue.take()
+            with self.log_handler.capture(job["id"]):
+                LOGGER.info("Starting job %s: %s", job["id"], job["argv"])
+                try:
+                    self.run_job(job)
+                except BaseException as exc:
+                    LOGGER.error("Job %s failed:\n%s", job["id"], traceback.format_exc())
+                    self.queue.update(
+                        job,
+                        status=FAILED,
+                        finished=time.time(),
+                        error=f"{type(exc).__name__}: {exc}",
+                    )
+                else:
+                    LOGGER.info("Finished job %s", job["id"])
+                    self.queue.update(job, status=DONE, finished=time.time())
+
+    def run_job(self, job: dict):
+        from yt_dlq.__main__ import run
+
+        args = parse_job_args(self.base_argv, job)
+        with (
+            self.libraries.use(args) as index,
+            self.extract_ydls.acquire(args) as extract_ydl,
+            self.download_ydls.acquire(args) as download_ydl,
+        ):
+            downloader = run(args, extract_ydl, download_ydl, index)
+            if downloader is not None:
+                self.libraries.update(
+                    args, downloader.videos_in_output_dirs, downloader.new_videos
+                )
+
+    def make_request_handler(self):
+        server = self
+
+        class JobRequestHandler(BaseHTTPRequestHandler):
+            def send_json(self, status: int, data):
+                body = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                if urlsplit(self.path).path != "/jobs":
+                    self.send_error(404)
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    request = json.loads(self.rfile.read(length))
+                    job = {"argv": list(request["argv"]), "cwd": str(request["cwd"])}
+                    # checked now so that the client hears about bad arguments straight away
+                    parse_job_args(server.base_argv, job)
+                except (ValueError, KeyError, TypeError) as exc:
+                    self.send_json(400, {"error": str(exc)})
+                    return
+                self.send_json(201, server.queue.submit(job["argv"], job["cwd"]))
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                parts = url.path.strip("/").split("/")
+                if parts == ["jobs"]:
+                    self.send_json(200, list(server.queue.jobs.values()))
+                    return
+                if len(parts) < 2 or parts[0] != "jobs" or parts[1] not in server.queue.jobs:
+                    self.send_error(404)
+                    return
+                job = server.queue.jobs[parts[1]]
+                if len(parts) == 2:
+                    self.send_json(200, job)
+                elif parts[2:] == ["log"]:
+                    query = parse_qs(url.query)
+                    text, offset = server.queue.read_log(
+                        job["id"],
+                        int(query.get("offset", ["0"])[0]),
+                        min(float(query.get("wait", [LOG_WAIT_SECONDS])[0]), LOG_WAIT_SECONDS),
+                    )
+                    self.send_json(200, {"status": job["status"], "offset": offset, "text": text})
+                else:
+                    self.send_error(404)
+
+            def log_message(self, format, *args):
+                LOGGER.debug("job API: " + format, *args)
+
+        return JobRequestHandler
+
+    def serve(self, host: str, port: int):
+        self.start_workers()
+        http_server = ThreadingHTTPServer((host, port), self.make_request_handler())
+        LOGGER.info(
+            "Serving jobs on http://%s:%d/jobs with %d worker(s); queue in '%s'",
+            host,
+            port,
+            self.workers,
+            self.queue.queue_dir,
+        )
+        try:
+            http_server.serve_forever()
+        except KeyboardInterrupt:
+            LOGGER.info("Stopping; unfinished jobs will resume on the next start")
+        finally:
+            http_server.server_close()
+            self.extract_ydls.close()
+            self.download_ydls.close()
+
+
+class ServeArgsNamespace(argparse.Namespace):
+    host: str
+    port: int
+    queue_dir: Path | None
+    workers: int
+
+
+def serve_main(argv: list[str]):
+    parser = argparse.ArgumentParser(
+        prog="yt-dlq serve",
+        allow_abbrev=False,
+        description="Run yt-dlq jobs submitted with `yt-dlq submit`. Other arguments are yt-dlq options applied to every job.",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="(default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="(default: %(default)s)")
+    parser.add_argument(
+        "--queue-dir",
+        type=Path,
+        help="Folder to keep jobs and their logs in (default: OUTPUT_DIR/_queue)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Jobs to run at once; jobs for the same library still run one at a time (default: %(default)s)",
+    )
+    serve_args, base_argv = parser.parse_known_args(argv, namespace=ServeArgsNamespace())
+    base_args = process_args(base_argv, interactive=False)
+    setup_logging(base_args)
+    if base_args.metrics_textfile or base_args.metrics_port or base_args.metrics_summary:
+        MetricsExporter(
+            textfile=base_args.metrics_textfile,
+            port=base_args.metrics_port,
+            summary_path=base_args.metrics_summary,
+        ).start()
+    Server(
+        base_argv,
+        serve_args.queue_dir or Path(base_args.output_dir, "_queue"),
+        serve_args.workers,
+    ).serve(serve_args.host, serve_args.port)
+
+
+class SubmitArgsNamespace(argparse.Namespace):
+    server: str
+    detach: bool
+
+
+def request_json(url: str, data=None):
+    request = urllib.request.Request(
+        url,
+        data=None if data is None else json.dumps(data).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as exc:
+        try:
+            message = json.load(exc)["error"]
+        except (ValueError, KeyError):
+            message = exc.reason
+        raise SystemExit(f"yt-dlq submit: {message}")
+    except urllib.error.URLError as exc:
+        raise SystemExit(f"yt-dlq submit: can't reach '{url}' ({exc.reason}); is `yt-dlq serve` running?")
+
+
+def submit_main(argv: list[str]):
+    parser = argparse.ArgumentParser(
+        prog="yt-dlq submit",
+        allow_abbrev=False,
+        description="Queue a job on a running `yt-dlq serve` and print its log. Other arguments are passed to the job as yt-dlq arguments.",
+    )
+    parser.add_argument(
+        "--server",
+        default=f"http://127.0.0.1:{DEFAULT_PORT}",
+        help="(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--detach", action="store_true", help="Print the job ID and exit without waiting"
+    )
+    submit_args, job_argv = parser.parse_known_args(argv, namespace=SubmitArgsNamespace())
+    if job_argv[:1] == ["--"]:
+        job_argv = job_argv[1:]
+    server = submit_args.server.rstrip("/")
+    job = request_json(f"{server}/jobs", {"argv": job_argv, "cwd": os.getcwd()})
+    print(f"Queued job {job['id']}", file=sys.stderr)
+    if submit_args.detach:
+        print(job["id"])
+        return
+
+    offset = 0
+    while True:
+        log = request_json(f"{server}/jobs/{job['id']}/log?offset={offset}")
+        sys.stdout.write(log["text"])
+        sys.stdout.flush()
+        offset = log["offset"]
+        if log["status"] in FINISHED and not log["text"]:
+            break
+    job = request_json(f"{server}/jobs/{job['id']}")
+    if job["status"] == FAILED:
+        raise SystemExit(f"Job {job['id']} failed: {job['error']}")
+
+
+def main(command: str, argv: list[str]):
+    if command == "serve":
+        serve_main(argv)
+    else:
+        submit_main(argv)
@@ -0,0 +1,244 @@
+import argparse
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+
+from utils_python import get_logger_with_class
+from yt_dlq.utils import YtdlqLogger
+
+LOGGER = get_logger_with_class(__name__, YtdlqLogger)
+
+LEASE_SUFFIX = ".lease"
+DONE_SUFFIX = ".done"
+WORKER_SUFFIX = ".worker"
+
+
+def parse_shard(shard: str) -> tuple[int, int]:
+    """parse '--shard i/N' into (i, N), where 0 <= i < N"""
+    try:
+        index_str, count_str = shard.split("/")
+        index, count = int(index_str), int(count_str)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard must be given as 'i/N', got {shard!r}") from None
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must satisfy 0 <= i < N, got {shard!r}")
+    return index, count
+
+
+def _score(shard_index: int, key: str) -> int:
+    digest = hashlib.sha1(f"{shard_index}:{key}".encode()).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def shard_for_key(key: str, shard_count: int) -> int:
+    """
+    rendezvous (highest random weight) hashing: stable across hosts and
+     processes, and only ~1/N of keys move when N changes
+    """
+    return max(range(shard_count), key=lambda shard_index: _score(shard_index, key))
+
+
+def item_key(video_id: str, playlist_id: str) -> str:
+    # a video can be downloaded into several playlists, so the lease is per-placement
+    playlist_digest = hashlib.sha1(playlist_id.encode()).hexdigest()[:8]
+    return f"{video_id}_{playlist_digest}"
+
+
+class LeaseManager:
+    """
+    file-based leases in a directory shared between workers (e.g. on a NAS)
+
+    - `<key>.lease` is held by one worker while it downloads an item; it carries an
+       expiry which a background thread keeps pushing forward (heartbeat)
+    - `<key>.done` marks an item as finished so no other worker retries it
+    - `shard-<i>-of-<N>.worker` is a per-shard heartbeat, used by other workers to
+       decide whether the shard's worker has crashed and its items can be taken over;
+       a worker which exits cleanly marks it as finished rather than removing it, so
+       that it isn't mistaken for a crashed one
+
+    a worker which stalls for longer than the TTL can have its leases broken and taken
+     by another worker; leases are only renewed or removed while they're still its own,
+     and one found taken is dropped, so that its item can be abandoned (see `holds`)
+
+    expiry uses wall-clock time, so hosts sharing a directory need synchronised clocks
+    """
+
+    def __init__(
+        self,
+        lease_dir: Path,
+        shard: tuple[int, int],
+        ttl: float = 300,
+    ):
+        self.lease_dir = lease_dir
+        self.shard_index, self.shard_count = shard
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.held: set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat_thread: threading.Thread | None = None
+        self.started: float | None = None
+
+    def __enter__(self):
+        self.started = time.time()
+        self.lease_dir.mkdir(parents=True, exist_ok=True)
+        self._write(self._worker_path(self.shard_index), self._lease_data())
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat, name="yt-dlq-lease-heartbeat", daemon=True
+        )
+        self._heartbeat_thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+        for key in list(self.held):
+            self.release(key)
+        if exc_type is None:
+            self._write(
+                self._worker_path(self.shard_index),
+                {"owner": self.owner, "finished": time.time()},
+            )
+        else:
+            # stopped partway: leave the shard to be taken over
+            self._worker_path(self.shard_index).unlink(missing_ok=True)
+
+    @property
+    def heartbeat_interval(self) -> float:
+        return max(self.ttl / 3, 1)
+
+    def shard_alive(self, shard_index: int) -> bool:
+        """
+        whether a shard's worker is running or has finished; a finished marker left
+         from before this worker started (e.g. by a previous run) doesn't count
+        """
+        if shard_index == self.shard_index:
+            return True
+        lease = self._read(self._worker_path(shard_index))
+        if lease is None:
+            return False
+        if "finished" in lease:
+            return self.started is not None and lease["finished"] >= self.started
+        return lease["expires"] > time.time()
+
+    def is_done(self, key: str) -> bool:
+        return self._path(key, DONE_SUFFIX).exists()
+
+    def holds(self, key: str) -> bool:
+        """whether this worker still holds a lease, i.e. it hasn't been taken over"""
+        with self._lock:
+            return key in self.held
+
+    def acquire(self, key: str) -> bool:
+        path = self._path(key, LEASE_SUFFIX)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                lease = self._read(path)
+                if not self._expired(path, lease):
+                    return False
+                LOGGER.info(
+                    "Breaking expired lease %r (held by %r)",
+                    path.name,
+                    lease and lease["owner"],
+                )
+                self._break(path)
+                continue
+            with os.fdopen(fd, "w") as file:
+                json.dump(self._lease_data(), file)
+            with self._lock:
+                self.held.add(key)
+            # the done marker may have appeared while the previous holder was finishing
+            if self.is_done(key):
+                self.release(key)
+                return False
+            return True
+        return False
+
+    def release(self, key: str, done: bool = False):
+        with self._lock:
+            if key not in self.held:
+                return
+            self.held.discard(key)
+            if not self._owns(key):
+                self._report_lost(key)
+                return
+            if done:
+                self._path(key, DONE_SUFFIX).touch()
+            self._path(key, LEASE_SUFFIX).unlink(missing_ok=True)
+
+    def _break(self, path: Path):
+        # rename is atomic, so only one worker can move a given lease file away
+        tombstone = path.with_name(f"{path.name}.{os.getpid()}.stale")
+        try:
+            os.rename(path, tombstone)
+        except FileNotFoundError:
+            return
+        if not self._expired(tombstone, self._read(tombstone)):
+            # renewed or re-acquired between our read and rename: hand it back
+            try:
+                os.link(tombstone, path)
+            except FileExistsError:
+                pass
+        tombstone.unlink(missing_ok=True)
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            data = self._lease_data()
+            self._write(self._worker_path(self.shard_index), data)
+            with self._lock:
+                for key in list(self.held):
+                    if self._owns(key):
+                        self._write(self._path(key, LEASE_SUFFIX), data)
+                    else:
+                        self.held.discard(key)
+                        self._report_lost(key)
+
+    def _owns(self, key: str) -> bool:
+        lease = self._read(self._path(key, LEASE_SUFFIX))
+        return lease is not None and lease["owner"] == self.owner
+
+    @staticmethod
+    def _report_lost(key: str):
+        LOGGER.warning("Lease %r was broken and taken by another worker; abandoning it", key)
+
+    def _expired(self, path: Path, lease: dict | None) -> bool:
+        if lease is not None:
+            return lease["expires"] <= time.time()
+        # unreadable: either half-written by a live worker, or left by a crashed one
+        try:
+            return path.stat().st_mtime + self.ttl <= time.time()
+        except FileNotFoundError:
+            return True
+
+    def _lease_data(self):
+        return {"owner": self.owner, "expires": time.time() + self.ttl}
+
+    def _path(self, key: str, suffix: str):
+        return Path(self.lease_dir, f"{key}{suffix}")
+
+    def _worker_path(self, shard_index: int):
+        return Path(
+            self.lease_dir, f"shard-{shard_index}-of-{self.shard_count}{WORKER_SUFFIX}"
+        )
+
+    @staticmethod
+    def _read(path: Path) -> dict | None:
+        try:
+            with open(path, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    @staticmethod
+    def _write(path: Path, data: dict):
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(data, file)
+        os.replace(tmp_path, path)
@@ -0,0 +1,81 @@
+import errno
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from utils_python import get_logger_with_class, make_parent_dir
+from yt_dlq.utils import YtdlqLogger
+
+LOGGER = get_logger_with_class(__name__, YtdlqLogger)
+
+
+def move_into_place(src: Path, dst: Path):
+    """
+    move src to dst so that dst only ever appears complete: a rename on the same
+     filesystem, otherwise a copy to a hidden file next to dst which is then renamed
+    """
+    make_parent_dir(dst)
+    try:
+        os.replace(src, dst)
+        return
+    except OSError as exc:
+        if exc.errno != errno.EXDEV:
+            raise
+    tmp_path = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    try:
+        shutil.copy2(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    src.unlink()
+
+
+class StagingArea:
+    """
+    a per-process directory on fast local storage where videos are downloaded and
+     post-processed before being moved into the library
+
+    each item gets its own subdirectory, which is removed as soon as the item has been
+     moved into place or has failed, so at most one item's files are staged at a time
+    """
+
+    def __init__(self, staging_root: Path):
+        self.staging_root = staging_root
+        self.staging_dir: Path | None = None
+
+    def __enter__(self):
+        self.staging_root.mkdir(parents=True, exist_ok=True)
+        self.staging_dir = Path(tempfile.mkdtemp(prefix="yt-dlq-", dir=self.staging_root))
+        LOGGER.info("Staging downloads in '%s'", self.staging_dir)
+        return self
+
+    def __exit__(self, *exc_info):
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        self.staging_dir = None
+
+    @contextmanager
+    def item_dir(self, video_id: str):
+        item_dir = Path(self.staging_dir, video_id)
+        item_dir.mkdir()
+        try:
+            yield item_dir
+        finally:
+            shutil.rmtree(item_dir, ignore_errors=True)
+
+    @staticmethod
+    def commit(item_dir: Path, target_dir: Path, suffixes: set[str]) -> list[Path]:
+        """
+        move an item's finished files (those with the given suffixes) into target_dir;
+         anything else, e.g. thumbnails or .part files, is discarded with the item dir
+        """
+        moved = []
+        for staged_path in sorted(item_dir.iterdir()):
+            if not staged_path.is_file() or staged_path.suffix not in suffixes:
+                continue
+            target_path = Path(target_dir, staged_path.name)
+            move_into_place(staged_path, target_path)
+            moved.append(target_path)
+        return moved
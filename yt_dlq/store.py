@@ -0,0 +1,285 @@
+"""
+storage backends for the url info dict (channel -> entries -> playlist -> entries -> video)
+
+- JsonStore: the nested dict as one JSON document, rewritten in full on every change
+- SqliteStore: tables of channels, playlists, videos and playlist memberships, where a
+   change only touches the affected rows, and writes are batched into transactions
+"""
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterator
+
+from utils_python import get_logger_with_class, read_dict_from_file
+from yt_dlq.utils import YtdlqLogger, dump_sorted_json
+
+LOGGER = get_logger_with_class(__name__, YtdlqLogger)
+
+STORE_SUFFIXES = {"json": ".json", "sqlite": ".sqlite"}
+
+# per-placement video fields: the same video can have a different index and album in
+#  each playlist it's in. all other video fields are shared between playlists
+MEMBERSHIP_KEYS = ("index", "music_info")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS playlists (
+    channel_id TEXT NOT NULL REFERENCES channels (id),
+    id TEXT NOT NULL,
+    type TEXT,
+    title TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (channel_id, id)
+);
+CREATE TABLE IF NOT EXISTS videos (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    uploader TEXT,
+    upload_date TEXT,
+    availability TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS memberships (
+    channel_id TEXT NOT NULL,
+    playlist_id TEXT NOT NULL,
+    video_id TEXT NOT NULL REFERENCES videos (id),
+    data TEXT NOT NULL,
+    PRIMARY KEY (channel_id, playlist_id, video_id),
+    FOREIGN KEY (channel_id, playlist_id) REFERENCES playlists (channel_id, id)
+);
+CREATE INDEX IF NOT EXISTS memberships_video_id ON memberships (video_id);
+"""
+
+
+def _without(data: dict, keys) -> dict:
+    return {k: v for k, v in data.items() if k not in keys}
+
+
+class JsonStore:
+    def __init__(self, path: Path):
+        self.path = path
+
+    def load(self) -> dict:
+        return read_dict_from_file(self.path)
+
+    def save(self, url_info_dict: dict, ch_id=None, pl_id=None, video_id=None):
+        # the whole document is rewritten whatever changed
+        if not self.path.exists():
+            LOGGER.info(f"Saving to '{self.path}'")
+        dump_sorted_json(url_info_dict, self.path)
+
+    def save_playlists(self, url_info_dict: dict, playlist_keys):
+        self.save(url_info_dict)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SqliteStore:
+    def __init__(
+        self,
+        path: Path,
+        batch_size: int = 200,
+        batch_seconds: float = 2,
+        read_only: bool = False,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_seconds = batch_seconds
+        if read_only:
+            # another run's archive: neither created nor changed by reading it
+            self.connection = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.connection = sqlite3.connect(self.path)
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.execute("PRAGMA synchronous = NORMAL")
+            self.connection.executescript(SCHEMA)
+        self.pending = 0
+        self.last_commit = time.monotonic()
+
+    def load(self) -> dict:
+        return {channel_id: channel for channel_id, channel in self.items()}
+
+    def items(self) -> Iterator[tuple[str, dict]]:
+        """channels as nested dicts, built one at a time"""
+        channel_rows = self.connection.execute(
+            "SELECT id, data FROM channels ORDER BY rowid"
+        ).fetchall()
+        for channel_id, channel_data in channel_rows:
+            channel = json.loads(channel_data)
+            channel["entries"] = {}
+            for playlist_id, playlist_data in self.connection.execute(
+                "SELECT id, data FROM playlists WHERE channel_id = ? ORDER BY rowid",
+                (channel_id,),
+            ):
+                playlist = json.loads(playlist_data)
+                playlist["entries"] = {}
+                channel["entries"][playlist_id] = playlist
+            for playlist_id, video_id, membership_data, video_data in self.connection.execute(
+                "SELECT m.playlist_id, m.video_id, m.data, v.data"
+                " FROM memberships m JOIN videos v ON v.id = m.video_id"
+                " WHERE m.channel_id = ? ORDER BY m.rowid",
+                (channel_id,),
+            ):
+                channel["entries"][playlist_id]["entries"][video_id] = {
+                    **json.loads(video_data),
+                    **json.loads(membership_data),
+                }
+            yield channel_id, channel
+
+    def values(self) -> Iterator[dict]:
+        return (channel for _, channel in self.items())
+
+    def video(self, channel_id: str, playlist_id: str, video_id: str) -> tuple[dict, dict] | None:
+        """a video in one playlist, with its channel's own fields (without entries)"""
+        row = self.connection.execute(
+            "SELECT c.data, m.data, v.data FROM memberships m"
+            " JOIN videos v ON v.id = m.video_id JOIN channels c ON c.id = m.channel_id"
+            " WHERE m.channel_id = ? AND m.playlist_id = ? AND m.video_id = ?",
+            (channel_id, playlist_id, video_id),
+        ).fetchone()
+        if row is None:
+            return None
+        channel_data, membership_data, video_data = row
+        return json.loads(channel_data), {**json.loads(video_data), **json.loads(membership_data)}
+
+    def __iter__(self) -> Iterator[str]:
+        return (row[0] for row in self.connection.execute("SELECT id FROM channels ORDER BY rowid"))
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM channels").fetchone()[0]
+
+    def save(self, url_info_dict: dict, ch_id=None, pl_id=None, video_id=None):
+        """
+        write what changed: a channel's own fields (ch_id), a playlist's fields and
+         memberships (ch_id, pl_id) or one video in one playlist (all three); with no
+         IDs, everything is written
+        """
+        if ch_id is None:
+            for channel_id, channel in url_info_dict.items():
+                self._write_channel(channel_id, channel, recursive=True)
+        else:
+            channel = url_info_dict[ch_id]
+            if pl_id is None:
+                self._write_channel(ch_id, channel)
+            elif video_id is None:
+                self._write_playlist(ch_id, pl_id, channel["entries"][pl_id], recursive=True)
+            else:
+                playlist = channel["entries"][pl_id]
+                self._write_video(ch_id, pl_id, video_id, playlist["entries"][video_id])
+        self._count_write()
+
+    def save_playlists(self, url_info_dict: dict, playlist_keys):
+        """write several playlists and their memberships, as one batched write"""
+        for ch_id, pl_id in playlist_keys:
+            playlist = url_info_dict[ch_id]["entries"][pl_id]
+            self._write_playlist(ch_id, pl_id, playlist, recursive=True)
+        self._count_write()
+
+    def _count_write(self):
+        self.pending += 1
+        if (
+            self.pending >= self.batch_size
+            or time.monotonic() - self.last_commit >= self.batch_seconds
+        ):
+            self.flush()
+
+    def _write_channel(self, channel_id: str, channel: dict, recursive=False):
+        data = _without(channel, ("entries",))
+        self.connection.execute(
+            "INSERT INTO channels (id, title, data) VALUES (?, ?, ?)"
+            " ON CONFLICT (id) DO UPDATE SET title = excluded.title, data = excluded.data",
+            (channel_id, channel.get("title"), json.dumps(data, ensure_ascii=False)),
+        )
+        if recursive:
+            for playlist_id, playlist in channel["entries"].items():
+                self._write_playlist(channel_id, playlist_id, playlist, recursive=True)
+
+    def _write_playlist(self, channel_id: str, playlist_id: str, playlist: dict, recursive=False):
+        data = _without(playlist, ("entries",))
+        self.connection.execute(
+            "INSERT INTO playlists (channel_id, id, type, title, data) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (channel_id, id) DO UPDATE"
+            " SET type = excluded.type, title = excluded.title, data = excluded.data",
+            (
+                channel_id,
+                playlist_id,
+                playlist.get("type"),
+                playlist.get("title"),
+                json.dumps(data, ensure_ascii=False),
+            ),
+        )
+        if recursive:
+            # rewritten from scratch, so that videos removed from the playlist go too
+            self.connection.execute(
+                "DELETE FROM memberships WHERE channel_id = ? AND playlist_id = ?",
+                (channel_id, playlist_id),
+            )
+            for video_id, video in playlist["entries"].items():
+                self._write_video(channel_id, playlist_id, video_id, video)
+
+    def _write_video(self, channel_id: str, playlist_id: str, video_id: str, video: dict):
+        shared = _without(video, MEMBERSHIP_KEYS)
+        membership = {k: video[k] for k in MEMBERSHIP_KEYS if k in video}
+        self.connection.execute(
+            "INSERT INTO videos (id, title, uploader, upload_date, availability, data)"
+            " VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (id) DO UPDATE SET title = excluded.title,"
+            " uploader = excluded.uploader, upload_date = excluded.upload_date,"
+            " availability = excluded.availability, data = excluded.data",
+            (
+                video_id,
+                video.get("title"),
+                video.get("uploader"),
+                video.get("upload_date"),
+                video.get("availability"),
+                json.dumps(shared, ensure_ascii=False),
+            ),
+        )
+        self.connection.execute(
+            "INSERT INTO memberships (channel_id, playlist_id, video_id, data) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (channel_id, playlist_id, video_id) DO UPDATE SET data = excluded.data",
+            (channel_id, playlist_id, video_id, json.dumps(membership, ensure_ascii=False)),
+        )
+
+    def flush(self):
+        if self.pending:
+            self.connection.commit()
+            self.pending = 0
+        self.last_commit = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def placements(self) -> Iterator[tuple[str, str, str]]:
+        """(video_id, channel_id, playlist_id) for every video in every playlist"""
+        return self.connection.execute(
+            "SELECT video_id, channel_id, playlist_id FROM memberships ORDER BY rowid"
+        )
+
+    def videos_in_multiple_playlists(self) -> dict[str, list[tuple[str, str]]]:
+        placements = {}
+        for video_id, channel_id, playlist_id in self.connection.execute(
+            "SELECT video_id, channel_id, playlist_id FROM memberships WHERE video_id IN"
+            " (SELECT video_id FROM memberships GROUP BY video_id HAVING COUNT(*) > 1)"
+            " ORDER BY video_id, rowid"
+        ):
+            placements.setdefault(video_id, []).append((channel_id, playlist_id))
+        return placements
+
+
+def open_store(path: Path) -> JsonStore | SqliteStore:
+    if path.suffix == STORE_SUFFIXES["sqlite"]:
+        return SqliteStore(path)
+    return JsonStore(path)
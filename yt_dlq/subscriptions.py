@@ -0,0 +1,318 @@
+"""
+`yt-dlq subscriptions`: keep a list of channels up to date, checking each one on its own
+ schedule instead of re-resolving every channel on every run
+
+    yt-dlq subscriptions FILE [--once] [--state FILE] [yt-dlq options applied to every run]
+
+the subscriptions file has one channel per line, with an optional refresh interval
+ (s/m/h/d/w; default --default-interval):
+
+    https://www.youtube.com/@SomeArtist 6h
+    https://www.youtube.com/channel/UC... 2w   # comment
+
+a check fetches only the newest video on the channel's videos and releases tabs. the
+ channel is only resolved and downloaded in full when one of those has changed
+
+each channel's first check is offset by a hash of its URL, so checks are spread evenly
+ over the interval rather than all falling due at once; after that, the interval adapts:
+ it shrinks (to a quarter of the configured one) while the channel keeps changing and
+ grows (to four times it) while it doesn't
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from utils_python import get_logger_with_class
+from yt_dlq.args import process_args
+from yt_dlq.logs import setup_logging
+from yt_dlq.server import Libraries, YdlPool
+from yt_dlq.url.utils import get_url_category, parse_url
+from yt_dlq.utils import YtdlqLogger
+
+LOGGER = get_logger_with_class(__name__, YtdlqLogger)
+
+INTERVAL_UNITS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60, "w": 7 * 24 * 60 * 60}
+PROBED_TABS = ("videos", "releases")
+MIN_INTERVAL_FACTOR = 0.25
+MAX_INTERVAL_FACTOR = 4
+# the longest to sleep between looking for due channels, so that edits to the
+#  subscriptions file are picked up
+MAX_SLEEP_SECONDS = 5 * 60
+
+
+def parse_interval(interval: str) -> float:
+    try:
+        return float(interval[:-1]) * INTERVAL_UNITS[interval[-1]]
+    except (KeyError, ValueError, IndexError):
+        raise argparse.ArgumentTypeError(
+            f"invalid interval {interval!r} (expected e.g. 30m, 6h, 2d, 1w)"
+        )
+
+
+@dataclass
+class Subscription:
+    url: str
+    interval: float
+
+    @property
+    def phase(self) -> float:
+        """a stable fraction of the interval, to spread first checks evenly"""
+        digest = hashlib.sha1(self.url.encode()).digest()
+        return int.from_bytes(digest[:4]) / 2**32
+
+
+def read_subscriptions(path: Path, default_interval: float, comment_char="#") -> list[Subscription]:
+    """
+    the subscriptions in path; a bad line is logged and left out, so that an edit can't
+     stop a running scheduler
+    """
+    subscriptions = {}
+    with open(path, "r", encoding="utf-8") as file:
+        for line_number, rawline in enumerate(file, 1):
+            fields = rawline.split(comment_char)[0].split()
+            if not fields:
+                continue
+            url = fields[0]
+            try:
+                if get_url_category(url) != "channel":
+                    raise ValueError(f"{url!r} is not a channel URL")
+                interval = parse_interval(fields[1]) if len(fields) > 1 else default_interval
+                url = parse_url(url)["url"]
+            except (ValueError, argparse.ArgumentTypeError) as exc:
+                LOGGER.warning("Skipping %s:%d: %s", path, line_number, exc)
+                continue
+            subscriptions[url] = Subscription(url, interval)
+    return list(subscriptions.values())
+
+
+class SubscriptionState:
+    """
+    per channel URL: when it was last checked, how long that took, the newest video on
+     each probed tab, when that last changed, and the current (adapted) interval
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                self.channels: dict[str, dict] = json.load(file)
+        except FileNotFoundError:
+            self.channels = {}
+
+    def save(self):
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.channels, file, indent=4)
+        os.replace(tmp_path, self.path)
+
+    def due_at(self, subscription: Subscription, now: float) -> float:
+        """when a channel is next due; a new channel is added, for the caller to save"""
+        state = self.channels.get(subscription.url)
+        if state is None:
+            state = self.channels[subscription.url] = {
+                "added": now,
+                "last_checked": None,
+                "newest_video_ids": {},
+                "last_changed": None,
+                "interval": subscription.interval,
+            }
+        if state["last_checked"] is None:
+            return state["added"] + subscription.phase * subscription.interval
+        return state["last_checked"] + state["interval"]
+
+    def forget_newest(self, subscription: Subscription):
+        """make the next check count as a change"""
+        self.channels[subscription.url]["newest_video_ids"] = {}
+        self.save()
+
+    def record(
+        self,
+        subscription: Subscription,
+        started: float,
+        duration: float,
+        newest_video_ids: dict[str, str | None],
+        error: str | None,
+    ) -> bool:
+        """store a check's result and adapt the interval; whether the channel changed"""
+        state = self.channels[subscription.url]
+        changed = error is None and newest_video_ids != state["newest_video_ids"]
+        if changed:
+            state["newest_video_ids"] = newest_video_ids
+            state["last_changed"] = started
+            interval = state["interval"] / 2
+        else:
+            interval = state["interval"] * 1.5
+        state["interval"] = min(
+            max(interval, subscription.interval * MIN_INTERVAL_FACTOR),
+            subscription.interval * MAX_INTERVAL_FACTOR,
+        )
+        state["last_checked"] = started
+        state["last_duration"] = duration
+        state["last_error"] = error
+        self.save()
+        return changed
+
+
+class SubscriptionScheduler:
+    def __init__(self, subscriptions_path: Path, state_path: Path, default_interval: float, base_argv: list[str]):
+        from yt_dlp import YoutubeDL
+
+        from yt_dlq.download import Downloader
+        from yt_dlq.url.info_extractor import YoutubeInfoExtractor
+
+        self.subscriptions_path = subscriptions_path
+        self.default_interval = default_interval
+        self.base_argv = base_argv
+        self.base_args = process_args(base_argv, interactive=False)
+        self.state = SubscriptionState(state_path)
+        self.probe_ydl = YoutubeDL(
+            params={
+                "extract_flat": True,
+                "playlistend": 1,
+                "quiet": True,
+                "no_warnings": True,
+                "cookiefile": self.base_args.cookies,
+            }
+        )
+        self.extract_ydls = YdlPool(YoutubeInfoExtractor.make_ydl, ("verbose", "cookies"))
+        self.download_ydls = YdlPool(
+            Downloader.make_ydl, ("verbose", "output_format", "ffmpeg_location", "cookies")
+        )
+        self.libraries = Libraries()
+
+    def probe(self, subscription: Subscription) -> dict[str, str | None]:
+        """the newest video ID on each probed tab (None for a tab the channel doesn't have)"""
+        from yt_dlp.utils import DownloadError
+
+        newest_video_ids = {}
+        errors = []
+        for tab in PROBED_TABS:
+            try:
+                info = self.probe_ydl.extract_info(f"{subscription.url}/{tab}", download=False)
+            except DownloadError as exc:
+                # e.g. topic channels have releases but no videos tab
+                errors.append(exc)
+                newest_video_ids[tab] = None
+                continue
+            entries = list(info.get("entries") or [])
+            newest_video_ids[tab] = entries[0]["id"] if entries else None
+        if len(errors) == len(PROBED_TABS):
+            raise errors[0]
+        return newest_video_ids
+
+    def refresh(self, subscription: Subscription):
+        from yt_dlq.__main__ import run
+
+        args = process_args([*self.base_argv, subscription.url], interactive=False)
+        with (
+            self.libraries.use(args) as index,
+            self.extract_ydls.acquire(args) as extract_ydl,
+            self.download_ydls.acquire(args) as download_ydl,
+        ):
+            downloader = run(args, extract_ydl, download_ydl, index)
+            if downloader is not None:
+                self.libraries.update(
+                    args, downloader.videos_in_output_dirs, downloader.new_videos
+                )
+
+    def check(self, subscription: Subscription):
+        started = time.time()
+        error = None
+        newest_video_ids = {}
+        try:
+            newest_video_ids = self.probe(subscription)
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            LOGGER.warning("Checking %s failed: %s", subscription.url, error)
+        changed = self.state.record(
+            subscription, started, time.time() - started, newest_video_ids, error
+        )
+        if changed:
+            LOGGER.info("%s has new videos (%s); refreshing", subscription.url, newest_video_ids)
+            try:
+                self.refresh(subscription)
+            except Exception:
+                LOGGER.exception("Refreshing %s failed; it will be refreshed on its next check", subscription.url)
+                self.state.forget_newest(subscription)
+        else:
+            LOGGER.info("%s unchanged", subscription.url)
+        LOGGER.info(
+            "Next check of %s in %.1fh",
+            subscription.url,
+            self.state.channels[subscription.url]["interval"] / 3600,
+        )
+
+    def run(self, once=False):
+        subscriptions = []
+        while True:
+            try:
+                subscriptions = read_subscriptions(self.subscriptions_path, self.default_interval)
+            except OSError as exc:
+                if once:
+                    raise
+                LOGGER.warning(
+                    "Could not read '%s' (%s); keeping the last %d subscriptions",
+                    self.subscriptions_path, exc, len(subscriptions),
+                )
+            now = time.time()
+            channel_count = len(self.state.channels)
+            due_times = sorted(
+                (self.state.due_at(subscription, now), subscription.url, subscription)
+                for subscription in subscriptions
+            )
+            if len(self.state.channels) != channel_count:
+                self.state.save()
+            due = [subscription for due_at, _, subscription in due_times if due_at <= now]
+            for subscription in due:
+                self.check(subscription)
+            if once:
+                LOGGER.info("Checked %d of %d channels", len(due), len(subscriptions))
+                return
+            if not due:
+                next_due_at = due_times[0][0] if due_times else now + MAX_SLEEP_SECONDS
+                time.sleep(min(max(next_due_at - now, 1), MAX_SLEEP_SECONDS))
+
+
+class SubscriptionsArgsNamespace(argparse.Namespace):
+    subscriptions_file: Path
+    state: Path | None
+    default_interval: float
+    once: bool
+
+
+def main(argv: list[str]):
+    parser = argparse.ArgumentParser(
+        prog="yt-dlq subscriptions",
+        allow_abbrev=False,
+        description="Check subscribed channels on their own schedules, downloading those with new videos. Other arguments are yt-dlq options applied to every run.",
+    )
+    parser.add_argument("subscriptions_file", type=Path)
+    parser.add_argument(
+        "--state",
+        type=Path,
+        help="File to keep check times and newest videos in (default: SUBSCRIPTIONS_FILE with a .state.json suffix)",
+    )
+    parser.add_argument(
+        "--default-interval",
+        type=parse_interval,
+        default="1d",
+        help="Refresh interval for channels without one (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Check the channels that are due, then exit (e.g. to run from cron)",
+    )
+    args, base_argv = parser.parse_known_args(argv, namespace=SubscriptionsArgsNamespace())
+    setup_logging(process_args(base_argv, interactive=False))
+    SubscriptionScheduler(
+        args.subscriptions_file,
+        args.state or args.subscriptions_file.with_suffix(".state.json"),
+        args.default_interval,
+        base_argv,
+    ).run(once=args.once)
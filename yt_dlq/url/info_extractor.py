@@ -5,7 +5,6 @@ import hashlib
 import json
 import logging
 import os.path
-import re
 import sys
 import time
 from collections import Counter
@@ -16,27 +15,37 @@ from pathlib import Path
 from pprint import pformat, pprint
 from typing import TYPE_CHECKING, Callable, Optional
 
-from prettyprinter import cpprint
 from yt_dlp import YoutubeDL
-from yt_dlp.utils import DownloadError, int_or_none
+from yt_dlp.utils import DownloadError
 
-from utils_python import dump_data, get_logger_with_class, read_dict_from_file
+from utils_python import get_logger_with_class
 from yt_dlq.args import ProgramArgsNamespace
-from yt_dlq.file import restrict_filename
-from yt_dlq.patches import patch_extract_metadata_from_tabs, patch_releases_tab
-from yt_dlq.types import PLAYLIST_CATEGORIES, UrlSet
-from yt_dlq.url.utils import *
-from yt_dlq.utils import (
+from yt_dlq.catalog import CATALOG_FILENAME, ArchiveCatalog
+from yt_dlq.errors import (
     DownloadErrorAgeRestricted,
     DownloadErrorMembersOnly,
     DownloadErrorPrivateVideo,
     DownloadErrorTOSViolation,
     DownloadErrorUnavailableVideo,
+    specify_download_error,
+)
+from yt_dlq.file import restrict_filename
+from yt_dlq.filters import compile_filter
+from yt_dlq.info_cache import InfoCache
+from yt_dlq.logs import item_extra
+from yt_dlq.metrics import EXTRACT_INFO_SECONDS, QUEUE_DEPTH, RETRIES, SKIPS
+from yt_dlq.music_info import parse_music_info
+from yt_dlq.patches import patch_extract_metadata_from_tabs, patch_releases_tab
+from yt_dlq.planner import RequestPlan, plan_requests, report_plan
+from yt_dlq.profiling import PROFILER
+from yt_dlq.store import MEMBERSHIP_KEYS, STORE_SUFFIXES, JsonStore, SqliteStore, open_store
+from yt_dlq.types import PLAYLIST_CATEGORIES, UrlSet
+from yt_dlq.url.utils import *
+from yt_dlq.utils import (
     YtdlqLogger,
     hyphenate_date,
+    is_livestream,
     matches_filter,
-    sorted_nested_with_entries,
-    specify_download_error,
 )
 
 if TYPE_CHECKING:
@@ -52,64 +61,179 @@ patch_extract_metadata_from_tabs()
 
 
 DELIMITER = "%"
+ITEM_RETRIEVED = item_extra("extract", "retrieved")
+ITEM_SKIPPED = item_extra("extract", "skipped")
+ITEM_REUSED = item_extra("extract", "reused")
 
 
 class YoutubeInfoExtractor:
-    def __init__(self, args: ProgramArgsNamespace) -> None:
+    def __init__(
+        self,
+        args: ProgramArgsNamespace,
+        ydl: YoutubeDL | None = None,
+        channel_info_ydl: YoutubeDL | None = None,
+    ) -> None:
         self.args = args
+        # a long-running process (`yt-dlq serve`) passes in a YoutubeDL it keeps warm, and
+        #  a benchmark passes in a fake one (see scripts/fake_youtube.py)
+        self.ydl = ydl if ydl is not None else self.make_ydl(args)
+        # made on first use; one is enough for every channel looked up in a run
+        self.channel_info_ydl = channel_info_ydl
+        self.url_to_channel_id = {}
+        self.channel_id_to_channel_title = {}
+        self.url_info_dict = {}
+        self.store: JsonStore | SqliteStore | None = None
+        self.seen_video_ids = set()
+        # unless --no-catalog, videos collected by other batches are added to this run's
+        #  dict from their archives rather than retrieved again
+        self.catalog: ArchiveCatalog | None = None
+        # (channel ID, playlist ID) of playlists whose entries changed since their
+        #  metadata was last filled
+        self.dirty_playlists: set[tuple[str, str]] = set()
+        self.video_filter = compile_filter(self.args.filter)
+        self.info_cache = (
+            InfoCache(Path(self.args.output_dir, "_info")) if self.args.reuse_info else None
+        )
+
+    @staticmethod
+    def make_ydl(args: ProgramArgsNamespace) -> YoutubeDL:
         ydl_opts = {
             "extract_flat": True,
             "quiet": True,
             "no_warnings": True,
-            "verbose": self.args.verbose,
-            "cookiefile": self.args.cookies,
+            "verbose": args.verbose,
+            "cookiefile": args.cookies,
         }
-        self.ydl = YoutubeDL(params=ydl_opts)
-        self.url_to_channel_id = {}
-        self.channel_id_to_channel_title = {}
-        self.url_info_dict = {}
-        self.url_info_dict_path: Path | None = None
-        self.seen_video_ids = set()
+        return YoutubeDL(params=ydl_opts)
+
+    @staticmethod
+    def make_channel_info_ydl() -> YoutubeDL:
+        channel_info_ydl_opts = {
+            "extract_flat": True,
+            "playlistend": 1,
+            "skip_download": True,
+            "quiet": True,
+        }
+        return YoutubeDL(channel_info_ydl_opts)
 
     def load_info_dict_from_path(self, allow_empty=False):
-        if self.url_info_dict_path:
-            loaded_url_info_dict = read_dict_from_file(self.url_info_dict_path)
+        if self.store is not None:
+            loaded_url_info_dict = self.store.load()
             if loaded_url_info_dict or allow_empty:
-                LOGGER.info("Loaded info dict from '%s'", self.url_info_dict_path)
+                LOGGER.info("Loaded info dict from '%s'", self.store.path)
                 self.url_info_dict = loaded_url_info_dict
                 self.apply_seen_videos()
 
     def apply_seen_videos(self):
-        for channel_dict in self.url_info_dict.values():
-            for playlist_dict in channel_dict["entries"].values():
+        for channel_id, channel_dict in self.url_info_dict.items():
+            for playlist_id, playlist_dict in channel_dict["entries"].items():
                 for video_dict in playlist_dict["entries"].values():
                     self.seen_video_ids.add(video_dict["id"])
+                    # filling always gives titled playlists' videos an album, so one
+                    #  without means an earlier run stopped before filling metadata
+                    if playlist_dict["title"] and not (video_dict.get("music_info") or {}).get("album"):
+                        self.dirty_playlists.add((channel_id, playlist_id))
 
     def construct_url_info_dict(
         self,
         urls_input_list: UrlCategoryDict,
     ):
-        urls_input_dict_categorised = categorise_urls(urls_input_list)
-        urls_input_dict_channels_resolved = self.resolve_channel_urls(
-            urls_input_dict_categorised
-        )
+        with PROFILER.phase("categorise_urls"):
+            urls_input_dict_categorised = categorise_urls(urls_input_list)
+        # loaded first, so that planning can leave out what the archive already has
+        with PROFILER.phase("load_archive"):
+            self.load_info_dict_from_path()
+        with PROFILER.phase("plan"):
+            plan = self.plan(urls_input_dict_categorised, "before resolving channels")
+        with PROFILER.phase("resolve_channel_urls"):
+            urls_input_dict_channels_resolved = self.resolve_channel_urls(plan.urls)
         # urls_input_dict_resolved = self.resolve_playlist_groups(
         #     urls_input_dict_channels_resolved, self.args
         # )
-        urls_input_dict_resolved = urls_input_dict_channels_resolved
-        self.load_info_dict_from_path()
-        self.add_playlists_to_url_info_dict(urls_input_dict_resolved)
-        self.add_channels_to_url_info_dict(urls_input_dict_resolved)
-        self.add_videos_to_url_info_dict(urls_input_dict_resolved)
-        self.fill_metadata()
+        with PROFILER.phase("plan"):
+            plan = self.plan(urls_input_dict_channels_resolved, "channels resolved")
+        if self.args.plan_only:
+            print(plan.describe())
+            return self.url_info_dict
+        urls_input_dict_resolved = plan.urls
+        with PROFILER.phase("extract_playlists"):
+            self.add_playlists_to_url_info_dict(urls_input_dict_resolved)
+        with PROFILER.phase("extract_channels"):
+            self.add_channels_to_url_info_dict(urls_input_dict_resolved)
+        with PROFILER.phase("extract_videos"):
+            self.add_videos_to_url_info_dict(urls_input_dict_resolved)
+        with PROFILER.phase("fill_metadata"):
+            self.fill_metadata()
+        if self.store is not None:
+            self.store.flush()
         return self.url_info_dict
 
-    def persist_url_info_dict(self):
-        if self.url_info_dict_path is not None:
-            url_info_dict_sorted = sorted_nested_with_entries(self.url_info_dict)
-            if not self.url_info_dict_path.exists():
-                LOGGER.info(f"Saving to '{self.url_info_dict_path}'")
-            dump_data(url_info_dict_sorted, self.url_info_dict_path)
+    def construct_url_info_dict_streaming(self, urls_input: Iterable[Url]):
+        """
+        as construct_url_info_dict, but for URLs that arrive over time (e.g. from a pipe):
+         each URL is categorised and extracted as soon as it arrives, instead of every
+         URL being categorised before extraction starts
+        """
+        with PROFILER.phase("load_archive"):
+            self.load_info_dict_from_path()
+        seen_urls: UrlSet = set()
+        for url in urls_input:
+            if url in seen_urls:
+                continue
+            seen_urls.add(url)
+            with PROFILER.phase("categorise_urls"):
+                try:
+                    url_dict_categorised = categorise_urls([url])
+                except ValueError as exc:
+                    # one bad line shouldn't end a stream that may run for hours
+                    LOGGER.warning("Skipping URL: %s", exc)
+                    continue
+            url_categorised = next(
+                url_categorised
+                for urls in url_dict_categorised.values()
+                for url_categorised in urls
+            )
+            if url_categorised != url:
+                if url_categorised in seen_urls:
+                    continue
+                seen_urls.add(url_categorised)
+            with PROFILER.phase("resolve_channel_urls"):
+                url_dict_resolved = self.resolve_channel_urls(url_dict_categorised)
+            with PROFILER.phase("extract_playlists"):
+                self.add_playlists_to_url_info_dict(url_dict_resolved)
+            with PROFILER.phase("extract_channels"):
+                self.add_channels_to_url_info_dict(url_dict_resolved)
+            with PROFILER.phase("extract_videos"):
+                self.add_videos_to_url_info_dict(url_dict_resolved)
+            # only the playlists this URL changed are filled, so this stays cheap
+            with PROFILER.phase("fill_metadata"):
+                self.fill_metadata()
+            if self.store is not None:
+                self.store.flush()
+        return self.url_info_dict
+
+    def plan(self, url_dict: UrlCategoryDict, stage: str) -> RequestPlan:
+        """what of url_dict needs fetching, logged with the requests that will take"""
+        plan = plan_requests(
+            url_dict,
+            self.seen_video_ids,
+            self.info_cache,
+            self.catalog.video_ids() if self.catalog is not None else (),
+        )
+        report_plan(plan, stage)
+        return plan
+
+    def persist_url_info_dict(self, ch_id=None, pl_id=None, video_id=None):
+        """save the url info dict; the IDs of what changed let the store skip the rest"""
+        if self.store is not None:
+            with PROFILER.phase("persist"):
+                self.store.save(self.url_info_dict, ch_id, pl_id, video_id)
+
+    def persist_playlists(self, playlist_keys: list[tuple[str, str]]):
+        """save several playlists (with their videos) at once"""
+        if self.store is not None:
+            with PROFILER.phase("persist"):
+                self.store.save_playlists(self.url_info_dict, playlist_keys)
 
     @staticmethod
     def get_uploader_url(video_info, quiet=False):
@@ -122,18 +246,7 @@ class YoutubeInfoExtractor:
         return None
         # breakpoint()
 
-    @staticmethod
-    def retrieve_channel_info(
-        url: Url,
-        quiet: bool=True,
-    ):
-        channel_info_ydl_opts = {
-            "extract_flat": True,
-            "playlistend": 1,
-            "skip_download": True,
-            "quiet": quiet,
-        }
-
+    def retrieve_channel_info(self, url: Url):
         keys_to_keep = [
             "channel",
             "channel_id",
@@ -143,7 +256,9 @@ class YoutubeInfoExtractor:
             "uploader_url",
         ]
 
-        channel_info_ydl = YoutubeDL(channel_info_ydl_opts)
+        if self.channel_info_ydl is None:
+            self.channel_info_ydl = self.make_channel_info_ydl()
+        channel_info_ydl = self.channel_info_ydl
 
         url_category = parse_url(url)["category"]
         if url_category == "playlist":
@@ -189,14 +304,16 @@ class YoutubeInfoExtractor:
                     LOGGER.info(
                         f"SKIPPING FILTERED INFO: {playlist_category} {i+1}/{len(playlist_urls)} {playlist_url!r}"
                     )
+                    SKIPS.inc(stage="extract", reason="playlist_title_filtered")
                     continue
                 # get info from downloader
                 LOGGER.info(
                     f"RETRIEVING INFO: {playlist_category} {i+1}/{len(playlist_urls)} {playlist_url!r}"
                     + (f" ({playlist_title})" if playlist_title else "")
                 )
-                playlist_info = self.get_info(playlist_url)
+                playlist_info = self.get_playlist_info(playlist_url)
                 playlist_entries = playlist_info["entries"]
+                entry_count = playlist_info.get("playlist_count")
 
                 # set channel properties
                 if self.args.no_channels:
@@ -256,7 +373,7 @@ class YoutubeInfoExtractor:
                         "entries": {},
                     }
                     self.url_info_dict[ch_id] = channel_dict
-                    self.persist_url_info_dict()  # added channel for playlist
+                    self.persist_url_info_dict(ch_id)  # added channel for playlist
 
                 # create or load playlist dict
                 if pl_id in channel_dict["entries"]:
@@ -272,29 +389,58 @@ class YoutubeInfoExtractor:
                         "description": playlist_info["description"],
                     }
                     channel_dict["entries"][pl_id] = playlist_dict
-                    self.persist_url_info_dict()  # added playlist for playlist
+                    self.persist_url_info_dict(ch_id, pl_id)  # added playlist for playlist
 
                 # add videos (unless disallowed duplicate)
+                entry_ids = []
                 for idx, video_entry in enumerate(playlist_entries):
+                    if entry_count is not None:
+                        QUEUE_DEPTH.set(entry_count - idx, queue="extract")
                     video_id = video_entry["id"]
+                    entry_ids.append(video_id)
+                    if video_id in playlist_dict["entries"]:
+                        # already in the archive; only new entries need retrieving
+                        continue
                     if (
                         playlist_category in disallow_duplicates_in
                         and video_id in self.seen_video_ids
-                    ) or video_id in playlist_dict["entries"]:
+                    ):
                         LOGGER.info(
-                            f" SKIPPING SEEN INFO: {playlist_category} video {idx+1}/{len(playlist_entries)} {video_entry['url']!r}"
+                            " SKIPPING SEEN INFO: %s video %d/%s %r",
+                            playlist_category, idx + 1, entry_count or "?", video_entry["url"],
+                            extra=ITEM_SKIPPED,
                         )
+                        SKIPS.inc(stage="extract", reason="seen")
                         continue
-                    if not matches_filter(
-                        self.args.filter_video_title, video_entry["title"]
-                    ):
+                    skip_reason = self.prefilter_reason(video_entry)
+                    if skip_reason is not None:
                         LOGGER.info(
-                            f" SKIPPING FILTERED INFO: {playlist_category} video {idx+1}/{len(playlist_entries)} {video_entry['url']!r}"
+                            " SKIPPING FILTERED INFO (%s): %s video %d/%s %r",
+                            skip_reason, playlist_category, idx + 1, entry_count or "?", video_entry["url"],
+                            extra=ITEM_SKIPPED,
                         )
+                        SKIPS.inc(stage="extract", reason=skip_reason)
+                        continue
+                    if (archived := self.archived_video(video_id)) is not None:
+                        LOGGER.info(
+                            " REUSING ARCHIVED INFO: %s video %d/%s %r",
+                            playlist_category, idx + 1, entry_count or "?", video_entry["url"],
+                            extra=ITEM_REUSED,
+                        )
+                        SKIPS.inc(stage="extract", reason="archived")
+                        _, video_dict = archived
+                        video_dict["index"] = idx + 1
+                        video_dict["music_info"] = self.music_info_from_description(video_dict)
+                        playlist_dict["entries"][video_id] = video_dict
+                        self.dirty_playlists.add((ch_id, pl_id))
+                        self.persist_url_info_dict(ch_id, pl_id, video_id)  # added video for playlist
+                        self.seen_video_ids.add(video_id)
                         continue
 
                     LOGGER.info(
-                        f" RETRIEVING INFO: {playlist_category} video {idx+1}/{len(playlist_entries)} {video_entry['url']!r} ({video_entry['title']})"
+                        " RETRIEVING INFO: %s video %d/%s %r (%s)",
+                        playlist_category, idx + 1, entry_count or "?", video_entry["url"], video_entry["title"],
+                        extra=ITEM_RETRIEVED,
                     )
                     # try:
                     #     video_info_full = self.ydl.extract_info(
@@ -304,7 +450,7 @@ class YoutubeInfoExtractor:
                     #     continue
 
                     try:
-                        video_info = self.get_info(video_entry["url"])
+                        video_info = self.get_video_info(video_entry["url"])
                     except DownloadError as exc:
                         exc_specific = specify_download_error(exc)
                         availability = None
@@ -365,10 +511,80 @@ class YoutubeInfoExtractor:
                             pass
 
                     playlist_dict["entries"][video_id] = video_dict
-                    self.persist_url_info_dict()  # added video for playlist
+                    self.dirty_playlists.add((ch_id, pl_id))
+                    self.persist_url_info_dict(ch_id, pl_id, video_id)  # added video for playlist
 
                     self.seen_video_ids.add(video_id)
 
+                if self.args.album_override:
+                    # the album gathers the videos of every playlist (and loose video) of
+                    #  this run, so it can't be brought in line with, or fingerprinted by,
+                    #  any one of them
+                    continue
+
+                # a playlist with the same entries, in the same order, with the same title
+                #  and description (and video filters) as when it was last processed has
+                #  had nothing retrieved, and needs nothing updating or saving
+                fingerprint = get_hash(
+                    [
+                        entry_ids,
+                        pl_title,
+                        playlist_info["description"],
+                        self.args.filter_video_title,
+                        self.args.filter,
+                    ]
+                )
+                if playlist_dict.get("fingerprint") == fingerprint:
+                    LOGGER.info(
+                        f" SKIPPING UNCHANGED INFO: {playlist_category} {i+1}/{len(playlist_urls)} ({len(entry_ids)} videos)"
+                    )
+                    SKIPS.inc(stage="extract", reason="playlist_unchanged")
+                    continue
+                if self.update_playlist_dict(
+                    playlist_dict, entry_ids, pl_title, playlist_info["description"]
+                ):
+                    self.dirty_playlists.add((ch_id, pl_id))
+                playlist_dict["fingerprint"] = fingerprint
+                self.persist_url_info_dict(ch_id, pl_id)  # updated playlist for playlist
+
+    def prefilter_reason(self, video_entry: dict) -> str | None:
+        """
+        why a flat playlist entry can be skipped before its full info is retrieved, going
+         by the fields it already has (the downloader would skip it anyway), if it can be
+        """
+        if not matches_filter(self.args.filter_video_title, video_entry["title"]):
+            return "title_filtered"
+        if is_livestream(video_entry):
+            return "live"
+        if self.video_filter is not None and self.video_filter.rejects_entry(video_entry):
+            return "filtered"
+        return None
+
+    @staticmethod
+    def update_playlist_dict(
+        playlist_dict: dict, entry_ids: list[str], title: str, description: str | None
+    ) -> bool:
+        """
+        bring an archived playlist in line with its current entries (dropping removed
+         videos and renumbering moved ones), title and description, once its new videos
+         have been added; whether anything changed
+        """
+        changed = False
+        positions = {video_id: idx + 1 for idx, video_id in enumerate(entry_ids)}
+        for video_id in list(playlist_dict["entries"]):
+            if video_id not in positions:
+                LOGGER.info(f" REMOVING INFO: video {video_id!r} is no longer in playlist")
+                del playlist_dict["entries"][video_id]
+                changed = True
+            elif playlist_dict["entries"][video_id].get("index") != positions[video_id]:
+                playlist_dict["entries"][video_id]["index"] = positions[video_id]
+                changed = True
+        if (playlist_dict["title"], playlist_dict.get("description")) != (title, description):
+            playlist_dict["title"] = title
+            playlist_dict["description"] = description
+            changed = True
+        return changed
+
     def add_channels_to_url_info_dict(
         self,
         urls_input: UrlCategoryDict,
@@ -379,8 +595,9 @@ class YoutubeInfoExtractor:
             LOGGER.info(
                 f"RETRIEVING INFO: channel {i+1}/{len(channel_videos_urls)} {channel_videos_url!r}"
             )
-            channel_videos_info = self.get_info(channel_videos_url)
+            channel_videos_info = self.get_playlist_info(channel_videos_url)
             channel_videos_entries = channel_videos_info["entries"]
+            entry_count = channel_videos_info.get("playlist_count")
 
             # set channel properties
             if self.args.no_channels:
@@ -431,7 +648,7 @@ class YoutubeInfoExtractor:
                     "description": channel_videos_info["description"],
                 }
                 self.url_info_dict[ch_id] = channel_dict
-                self.persist_url_info_dict()  # added channel for channel
+                self.persist_url_info_dict(ch_id)  # added channel for channel
 
             # why was this added...?
             # if pl_id in channel_dict["entries"]:
@@ -449,33 +666,56 @@ class YoutubeInfoExtractor:
                     "entries": {},
                 }
                 channel_dict["entries"][pl_id] = playlist_dict
-                self.persist_url_info_dict()  # added playlist for channel
+                self.persist_url_info_dict(ch_id, pl_id)  # added playlist for channel
 
             # add videos not previously seen
             for idx, video_entry in enumerate(channel_videos_entries):
+                if entry_count is not None:
+                    QUEUE_DEPTH.set(entry_count - idx, queue="extract")
                 video_id = video_entry["id"]
                 if (
                     video_id in self.seen_video_ids
                     or video_id in playlist_dict["entries"]
                 ):
                     LOGGER.info(
-                        f" SKIPPING SEEN INFO: channel video {idx+1}/{len(channel_videos_entries)} {video_entry['url']!r}"
+                        " SKIPPING SEEN INFO: channel video %d/%s %r",
+                        idx + 1, entry_count or "?", video_entry["url"],
+                        extra=ITEM_SKIPPED,
                     )
+                    SKIPS.inc(stage="extract", reason="seen")
                     continue
-                if not matches_filter(
-                    self.args.filter_video_title, video_entry["title"]
-                ):
+                skip_reason = self.prefilter_reason(video_entry)
+                if skip_reason is not None:
                     LOGGER.info(
-                        f" SKIPPING FILTERED INFO: channel video {idx+1}/{len(channel_videos_entries)} {video_entry['url']!r}"
+                        " SKIPPING FILTERED INFO (%s): channel video %d/%s %r",
+                        skip_reason, idx + 1, entry_count or "?", video_entry["url"],
+                        extra=ITEM_SKIPPED,
                     )
+                    SKIPS.inc(stage="extract", reason=skip_reason)
+                    continue
+                if (archived := self.archived_video(video_id)) is not None:
+                    LOGGER.info(
+                        " REUSING ARCHIVED INFO: channel video %d/%s %r",
+                        idx + 1, entry_count or "?", video_entry["url"],
+                        extra=ITEM_REUSED,
+                    )
+                    SKIPS.inc(stage="extract", reason="archived")
+                    _, video_dict = archived
+                    playlist_dict["entries"][video_id] = video_dict
+                    self.dirty_playlists.add((ch_id, pl_id))
+                    self.persist_url_info_dict(ch_id, pl_id, video_id)  # added video for channel
+                    self.seen_video_ids.add(video_id)
                     continue
 
                 LOGGER.info(
-                    f" RETRIEVING INFO: channel video {idx+1}/{len(channel_videos_entries)} {video_entry['url']!r}"
+                    " RETRIEVING INFO: channel video %d/%s %r",
+                    idx + 1, entry_count or "?", video_entry["url"],
+                    extra=ITEM_RETRIEVED,
                 )
                 try:
-                    video_info_full = self.get_info(video_entry["url"])
+                    video_info_full = self.get_video_info(video_entry["url"])
                 except DownloadError as exc:
+                    SKIPS.inc(stage="extract", reason="unavailable")
                     continue
                 video_dict = {
                     "id": video_entry["id"],
@@ -492,7 +732,8 @@ class YoutubeInfoExtractor:
                     breakpoint()
                     pass
                 playlist_dict["entries"][video_entry["id"]] = video_dict
-                self.persist_url_info_dict()  # added video for channel
+                self.dirty_playlists.add((ch_id, pl_id))
+                self.persist_url_info_dict(ch_id, pl_id, video_entry["id"])  # added video for channel
                 self.seen_video_ids.add(video_entry["id"])
 
     def add_videos_to_url_info_dict(
@@ -506,23 +747,41 @@ class YoutubeInfoExtractor:
             # only add videos not previously seen
             if video_id in self.seen_video_ids:
                 LOGGER.info(
-                    f"SKIPPING SEEN INFO: video {i+1}/{len(video_urls)} {video_url!r}"
+                    "SKIPPING SEEN INFO: video %d/%d %r",
+                    i + 1, len(video_urls), video_url,
+                    extra=ITEM_SKIPPED,
                 )
+                SKIPS.inc(stage="extract", reason="seen")
                 continue
 
-            LOGGER.info(f"RETRIEVING INFO: video {i+1}/{len(video_urls)} {video_url!r}")
-            # get info from downloader
-            try:
-                video_info = self.get_info(video_url)
-            except DownloadError as exc:
-                LOGGER.exception(exc)
-                continue
+            archived = self.archived_video(video_id)
+            if archived is not None:
+                LOGGER.info(
+                    "REUSING ARCHIVED INFO: video %d/%d %r", i + 1, len(video_urls), video_url, extra=ITEM_REUSED
+                )
+                SKIPS.inc(stage="extract", reason="archived")
+            else:
+                LOGGER.info(
+                    "RETRIEVING INFO: video %d/%d %r", i + 1, len(video_urls), video_url, extra=ITEM_RETRIEVED
+                )
+                # get info from downloader
+                try:
+                    video_info = self.get_video_info(video_url)
+                except DownloadError as exc:
+                    LOGGER.exception(exc)
+                    SKIPS.inc(stage="extract", reason="unavailable")
+                    continue
 
             # set channel properties
             if self.args.no_channels:
                 ch_id = ""
                 ch_title = ""
                 ch_url = ""
+            elif archived is not None:
+                archived_channel, _ = archived
+                ch_id = archived_channel["id"]
+                ch_title = archived_channel["title"]
+                ch_url = archived_channel["url"]
             # elif self.args.albumartist_override:
             #     ch_id = self.args.albumartist_override
             #     ch_title = self.args.albumartist_override
@@ -562,7 +821,7 @@ class YoutubeInfoExtractor:
                     "entries": {},
                 }
                 self.url_info_dict[ch_id] = channel_dict
-                self.persist_url_info_dict()  # added channel for loose-video
+                self.persist_url_info_dict(ch_id)  # added channel for loose-video
 
             # create or load playlist dict
             if pl_id in channel_dict["entries"]:
@@ -576,35 +835,42 @@ class YoutubeInfoExtractor:
                     "entries": {},
                 }
                 channel_dict["entries"][pl_id] = playlist_dict
-                self.persist_url_info_dict()  # added playlist for loose-video
-
-            video_dict = {
-                "id": video_id,
-                "type": "video",
-                "title": video_info["title"],
-                "url": video_info["webpage_url"],
-                "upload_date": hyphenate_date(video_info["upload_date"]),
-                "uploader": self.get_uploader_url(video_info),
-                "music_info": self.music_info_from_description(video_info),
-                "description": video_info["description"],
-                "duration": video_info["duration"],
-                "availability": video_info["availability"],
-            }
-            if video_dict["upload_date"] is None:
-                breakpoint()
-                pass
+                self.persist_url_info_dict(ch_id, pl_id)  # added playlist for loose-video
+
+            if archived is not None:
+                _, video_dict = archived
+                video_dict["music_info"] = self.music_info_from_description(video_dict)
+            else:
+                video_dict = {
+                    "id": video_id,
+                    "type": "video",
+                    "title": video_info["title"],
+                    "url": video_info["webpage_url"],
+                    "upload_date": hyphenate_date(video_info["upload_date"]),
+                    "uploader": self.get_uploader_url(video_info),
+                    "music_info": self.music_info_from_description(video_info),
+                    "description": video_info["description"],
+                    "duration": video_info["duration"],
+                    "availability": video_info["availability"],
+                }
+                if video_dict["upload_date"] is None:
+                    breakpoint()
+                    pass
             playlist_dict["entries"][video_id] = video_dict
-            self.persist_url_info_dict()  # added video for loose-video
+            self.dirty_playlists.add((ch_id, pl_id))
+            self.persist_url_info_dict(ch_id, pl_id, video_id)  # added video for loose-video
             self.seen_video_ids.add(video_id)
 
-    def get_info(self, url: str):
+    def get_info(self, url: str, process=True):
         delay_func = lambda x: x * 10
         attempts = 0
         max_attempts = 10
+        category = url_category_label(url)
         while True:
             attempts += 1
             try:
-                return self.ydl.extract_info(url, download=False)
+                with EXTRACT_INFO_SECONDS.time(category=category):
+                    return self.ydl.extract_info(url, download=False, process=process)
             except Exception as exc:
                 msg = getattr(exc, "msg", str(exc))
                 if (
@@ -615,6 +881,7 @@ class YoutubeInfoExtractor:
                 if attempts >= max_attempts:
                     LOGGER.error("Max attempts (%d) reached", max_attempts)
                     raise
+                RETRIES.inc(stage="extract", reason="try_again_later")
                 delay = delay_func(attempts)
                 LOGGER.info(
                     "Waiting for %d seconds after attempt %d...", delay, attempts
@@ -622,6 +889,32 @@ class YoutubeInfoExtractor:
                 time.sleep(delay)
                 LOGGER.info("Retrying after wait (attempt %d)", attempts + 1)
 
+    def get_playlist_info(self, url: str):
+        """
+        like get_info, but a playlist's (or channel tab's) entries are a generator which
+         fetches continuation pages as it's consumed, so the first entries are worked on
+         before the last page is fetched and only about a page of entries is held at once
+        """
+        info = self.get_info(url, process=False)
+        if info.get("_type") != "playlist":
+            # e.g. a redirect to another URL, which only full processing follows
+            return self.get_info(url)
+        return info
+
+    def get_video_info(self, url: str):
+        if self.info_cache is not None:
+            # e.g. retrieved by an earlier run which stopped before saving its archive
+            try:
+                video_info = self.info_cache.load(get_url_id(url))
+            except ValueError:
+                video_info = None
+            if video_info is not None:
+                return video_info
+        video_info = self.get_info(url)
+        if self.info_cache is not None:
+            self.info_cache.save(video_info)
+        return video_info
+
     def get_title(self, url: str):
         url_parse_result = parse_url(url)
         category = url_parse_result["category"]
@@ -661,58 +954,23 @@ class YoutubeInfoExtractor:
         video_info = self.get_info(url)
         return self.music_info_from_description(video_info)
 
+    def archived_video(self, video_id: str) -> tuple[dict, dict] | None:
+        """
+        the channel and video dicts of a video collected by another batch, going by the
+         catalog; without the video's index and music info, which were its own to that
+         batch's playlist
+        """
+        if self.catalog is None:
+            return None
+        # the run's own archive is already loaded into url_info_dict
+        own_archive = self.store.path if self.store is not None else None
+        if (archived := self.catalog.archived_video(video_id, own_archive)) is None:
+            return None
+        channel, video = archived
+        return channel, deepcopy({k: v for k, v in video.items() if k not in MEMBERSHIP_KEYS})
+
     def music_info_from_description(self, info: dict, hyphenate_date=True):
-        info_out = {}
-        if (video_description := info.get("description")) is None:
-            return info_out
-        else:
-            # # Youtube Music Auto-generated description (modified from yt-dlp)
-            # mobj = re.search(
-            #     r"""(?xs)
-            #         (?P<track>[^·\n]+)·(?P<artist>[^\n]+)\n+
-            #         (?P<album>[^\n]+)
-            #         (?:.+?℗\s*(?P<release_year>\d{4})(?!\d))?
-            #         (?:.+?Released on\s*:\s*(?P<release_date>\d{4}-\d{2}-\d{2}))?
-            #         (.+?\nArtist\s*:\s*(?P<clean_artist>[^\n]+))?
-            #         .+\nAuto-generated\ by\ YouTube\.\s*$
-            #     """,
-            #     video_description,
-            # )
-
-            # Youtube Music Auto-generated description (from yt-dlp)
-            mobj = re.search(
-                r"""(?xs)
-                    (?=(?P<track>[^\n·]+))(?P=track)·
-                    (?=(?P<artist>[^\n]+))(?P=artist)\n+
-                    (?=(?P<album>[^\n]+))(?P=album)\n
-                    (?:.+?℗\s*(?P<release_year>\d{4})(?!\d))?
-                    (?:.+?Released\ on\s*:\s*(?P<release_date>\d{4}-\d{2}-\d{2}))?
-                    (.+?\nArtist\s*:\s*
-                        (?=(?P<clean_artist>[^\n]+))(?P=clean_artist)\n
-                    )?.+\nAuto-generated\ by\ YouTube\.\s*$
-                """,
-                video_description,
-            )
-            if mobj:
-                release_year = mobj.group("release_year")
-                release_date = mobj.group("release_date")
-                if release_date:
-                    if not hyphenate_date:
-                        release_date = release_date.replace("-", "")
-                    if not release_year:
-                        release_year = release_date[:4]
-                info_out = {
-                    "album": mobj.group("album".strip()),
-                    "artists": (
-                        clean_artist
-                        if (clean_artist := mobj.group("clean_artist"))
-                        else [a.strip() for a in mobj.group("artist").split("·")]
-                    ),
-                    "track": mobj.group("track").strip(),
-                    "release_date": release_date,
-                    "release_year": int_or_none(release_year),
-                }
-            return info_out
+        return parse_music_info(info.get("description"), hyphenate_date)
 
     def resolve_channel_urls(
         self,
@@ -720,12 +978,15 @@ class YoutubeInfoExtractor:
     ) -> UrlCategoryDict:
         url_dict_new = deepcopy(url_dict_categorised)
         channel_urls = url_dict_new.pop("channel")
+        # the tabs fetched to find out whether a channel has them, so they aren't fetched
+        #  a second time to be listed
+        tab_infos = {}
         while len(channel_urls) > 0:
             url = next(iter(channel_urls))
             channel_urls.pop(url)
             try:
                 url_releases = f"{url}/releases"
-                self.get_info(url_releases)
+                tab_infos[url_releases] = self.get_info(url_releases)
                 if "release" not in url_dict_new:
                     url_dict_new = {"channel_releases": [], **url_dict_new}
                 # url_dict_new["channel_releases"].append(url_releases)
@@ -734,7 +995,7 @@ class YoutubeInfoExtractor:
                 pass
             try:
                 url_playlists = f"{url}/playlists"
-                self.get_info(url_playlists)
+                tab_infos[url_playlists] = self.get_info(url_playlists)
                 url_dict_new["channel_playlists"][url_playlists] = ""
             except DownloadError as exc:
                 pass
@@ -744,7 +1005,9 @@ class YoutubeInfoExtractor:
         for category in PLAYLIST_CATEGORIES:
             urls_from_channel.setdefault(category, {})
             for channel_category_url in url_dict_new.pop(f"channel_{category}s"):
-                channel_category_info = self.get_info(channel_category_url)
+                channel_category_info = tab_infos.pop(channel_category_url, None)
+                if channel_category_info is None:
+                    channel_category_info = self.get_info(channel_category_url)
                 for entry in channel_category_info["entries"]:
                     entry_url = entry["url"]
                     self.url_to_channel_id[entry_url] = channel_category_info[
@@ -840,57 +1103,78 @@ class YoutubeInfoExtractor:
         return {**urls_input, "playlist": playlist_urls_resolved}
 
     def fill_metadata(self):
-        for channel_info in self.url_info_dict.values():
-            for playlist_id, playlist_info in channel_info["entries"].items():
-                for field_name in ("album", "release_year"):
+        """fill album/release year for playlists whose entries changed, then save once"""
+        filled_playlists = []
+        for channel_id, playlist_id in sorted(self.dirty_playlists):
+            playlist_info = self.url_info_dict[channel_id]["entries"][playlist_id]
+            changed = False
+            for field_name in ("album", "release_year"):
+                try:
+                    fields_debug = {
+                        (video_info["title"], video_info["url"]): video_info[
+                            "music_info"
+                        ][field_name]
+                        for video_info in playlist_info["entries"].values()
+                        if video_info.get("music_info")
+                        and video_info["music_info"].get(field_name)
+                    }
+                except Exception as exc:
+                    breakpoint()
+                    pass
+
+                fields_list = list(fields_debug.values())
+                fields_set = set(fields_debug.values())
+                # def get_most_common_field_and_count():
+                #     if len(fields_set) > 1:
+                #         [(most_common_field, most_common_field_count)] = Counter(fields_list).most_common(1)
+                #         if most_common_field_count > 1:
+                #             return most_common_field
+                #     return None
+                # if (field := get_most_common_field_and_count()) is not None:
+                #     LOGGER.warning(
+                #         f"Got conflicting {field_name!r}: {fields_set}. choosing most common: {field}"
+                #     )
+                # el
+                if len(fields_set) == 1:
+                    field = fields_set.pop()
+                elif field_name == "album" and playlist_info["title"]:
+                    field = playlist_info["title"]
+                    if len(fields_set) > 1:
+                        LOGGER.warning(
+                            f"Got conflicting {field_name!r}: {fields_set}. No most common: using {field=} for {field_name=}"
+                        )
+                else:
+                    if field_name == "album" and playlist_info["title"]:
+                        LOGGER.warning(f"no {field_name}!")
+                        breakpoint()
+                        pass
+                    continue
+                for video_info in playlist_info["entries"].values():
                     try:
-                        fields_debug = {
-                            (video_info["title"], video_info["url"]): video_info[
-                                "music_info"
-                            ][field_name]
-                            for video_info in playlist_info["entries"].values()
-                            if video_info.get("music_info")
-                            and video_info["music_info"].get(field_name)
-                        }
+                        music_info = video_info.setdefault("music_info", {})
                     except Exception as exc:
-                        breakpoint()
+                        import pdb; pdb.set_trace()
                         pass
+                    if music_info.get(field_name) != field:
+                        music_info[field_name] = field
+                        changed = True
+                music_info = playlist_info.setdefault("music_info", {})
+                if music_info.get(field_name) != field:
+                    music_info[field_name] = field
+                    changed = True
+            if changed:
+                filled_playlists.append((channel_id, playlist_id))
+        self.dirty_playlists.clear()
+        if filled_playlists:
+            LOGGER.debug("Filled metadata for %d playlists", len(filled_playlists))
+            self.persist_playlists(filled_playlists)  # filled metadata for playlists
+
+def url_category_label(url: str) -> str:
+    try:
+        return get_url_category(url)
+    except ValueError:
+        return "unknown"
 
-                    fields_list = list(fields_debug.values())
-                    fields_set = set(fields_debug.values())
-                    # def get_most_common_field_and_count():
-                    #     if len(fields_set) > 1:
-                    #         [(most_common_field, most_common_field_count)] = Counter(fields_list).most_common(1)
-                    #         if most_common_field_count > 1:
-                    #             return most_common_field
-                    #     return None
-                    # if (field := get_most_common_field_and_count()) is not None:
-                    #     LOGGER.warning(
-                    #         f"Got conflicting {field_name!r}: {fields_set}. choosing most common: {field}"
-                    #     )
-                    # el
-                    if len(fields_set) == 1:
-                        field = fields_set.pop()
-                    elif field_name == "album" and playlist_info["title"]:
-                        field = playlist_info["title"]
-                        if len(fields_set) > 1:
-                            LOGGER.warning(
-                                f"Got conflicting {field_name!r}: {fields_set}. No most common: using {field=} for {field_name=}"
-                            )
-                    else:
-                        if field_name == "album" and playlist_info["title"]:
-                            LOGGER.warning(f"no {field_name}!")
-                            breakpoint()
-                            pass
-                        continue
-                    for video_info in playlist_info["entries"].values():
-                        try:
-                            video_info.setdefault("music_info", {})[field_name] = field
-                        except Exception as exc:
-                            import pdb; pdb.set_trace()
-                            pass
-                    playlist_info.setdefault("music_info", {})[field_name] = field
-                    self.persist_url_info_dict()  # filled metadata for playlist
 
 def get_hash(data: any):
     data_string = json.dumps(data)
@@ -902,24 +1186,41 @@ def get_hash(data: any):
 JSON_FILE_VERSION = 1
 
 
-def get_all_urls_dict(args: ProgramArgsNamespace):
+def get_all_urls_dict(
+    args: ProgramArgsNamespace, ydl: YoutubeDL | None = None, hint_at_exit=True
+):
     LOGGER.info("Getting URL info")
-    if args.batchfile:
+    streamed = args.batchfile is not None and is_streamed_batch_file(args.batchfile)
+    if streamed:
+        urls_input_list = iter_urls_from_file(args.batchfile)
+    elif args.batchfile:
         urls_input_list = read_urls_from_file(args.batchfile)
     else:
         urls_input_list = args.urls
 
-    yie = YoutubeInfoExtractor(args)
+    yie = YoutubeInfoExtractor(args, ydl)
 
     if args.use_archives:
         # json_file_stem_prefix = None
         archive_dir = Path(args.output_dir, "_json")
         archive_dir.mkdir(parents=True, exist_ok=True)
+        catalog = None
+        if args.use_catalog:
+            with PROFILER.phase("catalog"):
+                catalog = ArchiveCatalog(Path(args.output_dir, CATALOG_FILENAME), archive_dir)
+                catalog.refresh()
 
         json_file_stem_prefix = datetime.now().replace(microsecond=0).isoformat()
         json_file_stem_prefix = json_file_stem_prefix.replace(":", "-")
         if args.json_file_prefix is not None:
             json_file_stem_suffix = restrict_filename(args.json_file_prefix)
+        elif streamed:
+            # the URLs aren't known yet, so the archive is named after where they come from
+            json_file_stem_suffix = restrict_filename(
+                "stdin"
+                if args.batchfile == STDIN_PATH
+                else args.batchfile.name.split(".")[0]
+            )
         else:
             if len(urls_input_list) == 1:
                 [url] = urls_input_list
@@ -942,13 +1243,26 @@ def get_all_urls_dict(args: ProgramArgsNamespace):
             )
         else:
             json_file_stem_prefix = restrict_filename(json_file_stem_prefix)
-            possible_filepaths = [
-                path
-                for path in sorted(
-                    archive_dir.iterdir(), key=os.path.getmtime, reverse=True
-                )
-                if path.stem.endswith(json_file_stem_suffix)
-            ]
+            if streamed and args.json_file_prefix is None:
+                # each stream's URLs are its own, so an earlier stream's archive (named
+                #  after the same source) isn't carried on; it would have its channels
+                #  downloaded all over again
+                possible_filepaths = []
+            elif catalog is not None:
+                possible_filepaths = [
+                    path
+                    for path in [catalog.find_archive(json_file_stem_suffix)]
+                    if path is not None
+                ]
+            else:
+                possible_filepaths = [
+                    path
+                    for path in sorted(
+                        archive_dir.iterdir(), key=os.path.getmtime, reverse=True
+                    )
+                    if path.suffix in STORE_SUFFIXES.values()
+                    and path.stem.endswith(json_file_stem_suffix)
+                ]
             if len(possible_filepaths) >= 1:
                 json_output_filepath = possible_filepaths[0]
             else:
@@ -957,19 +1271,33 @@ def get_all_urls_dict(args: ProgramArgsNamespace):
                     f"{json_file_stem_prefix}{DELIMITER}{json_file_stem_suffix}",
                 )
 
-        if not json_output_filepath.name.endswith(".json"):
+        # an existing archive keeps its format; a new one is created in --store's
+        if json_output_filepath.suffix not in STORE_SUFFIXES.values():
             json_output_filepath = json_output_filepath.with_name(
-                json_output_filepath.name + ".json"
+                json_output_filepath.name + STORE_SUFFIXES[args.store]
             )
 
-        yie.url_info_dict_path = json_output_filepath
-    url_info_dict = yie.construct_url_info_dict(urls_input_list)
+        yie.store = open_store(json_output_filepath)
+        yie.catalog = catalog
+    if streamed:
+        url_info_dict = yie.construct_url_info_dict_streaming(urls_input_list)
+    else:
+        url_info_dict = yie.construct_url_info_dict(urls_input_list)
+    if yie.store is not None:
+        yie.store.close()
+    if args.use_archives and catalog is not None:
+        catalog.close()
+        with PROFILER.phase("catalog"):
+            catalog.refresh()
 
     if args.use_archives:
-        atexit.register(
-            lambda: show_retrieved_urls_filepath(json_output_filepath, args)
-        )
-    if not url_info_dict:
+        if hint_at_exit:
+            atexit.register(
+                lambda: show_retrieved_urls_filepath(json_output_filepath, args)
+            )
+        else:
+            show_retrieved_urls_filepath(json_output_filepath, args)
+    if not url_info_dict and not args.plan_only:
         LOGGER.warning("URL info dict is empty. No URLs will be saved or downloaded.")
     return url_info_dict
 
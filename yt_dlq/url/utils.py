@@ -1,52 +1,44 @@
 from __future__ import annotations
 
 import atexit
+import gzip
 import hashlib
+import io
 import json
 import logging
 import os.path
 import re
+import stat
 import sys
 import time
 from collections import Counter
+from contextlib import contextmanager
 from copy import deepcopy
 from datetime import datetime
 from functools import partial
 from pathlib import Path
-from pprint import pformat, pprint
-from typing import TYPE_CHECKING, Callable, Optional
-
-from prettyprinter import cpprint
-from yt_dlp import YoutubeDL
-from yt_dlp.utils import DownloadError, int_or_none
+from pprint import pprint
+from typing import TYPE_CHECKING, Callable, Iterator, Optional, TextIO
 
 from utils_python import dump_data, get_logger_with_class, read_dict_from_file
 from yt_dlq.args import ProgramArgsNamespace
-from yt_dlq.patches import patch_extract_metadata_from_tabs, patch_releases_tab
 from yt_dlq.types import PLAYLIST_CATEGORIES, UrlSet
 from yt_dlq.utils import (
-    DownloadErrorAgeRestricted,
-    DownloadErrorMembersOnly,
-    DownloadErrorPrivateVideo,
-    DownloadErrorTOSViolation,
-    DownloadErrorUnavailableVideo,
     YtdlqLogger,
     hyphenate_date,
     matches_filter,
-    sorted_nested_with_entries,
-    specify_download_error,
 )
 
 if TYPE_CHECKING:
     from typing import Iterable
 
+    from yt_dlp import YoutubeDL
+
     from yt_dlq.types import Url, UrlCategoryDict, UrlList
 
 LOGGER = get_logger_with_class(__name__, YtdlqLogger)
 
 pprint = partial(pprint, sort_dicts=False)
-patch_extract_metadata_from_tabs()
-# patch_releases_tab() # https://github.com/yt-dlp/yt-dlp/issues/6893
 
 PATTERN_ID = r"[@\w\-]+"
 PATTERN_QUERY_FULL = r"(?:\?[\w=\&]+)"
@@ -76,39 +68,95 @@ DEFAULT_ALBUM_ARTIST_OVERRIDE_TITLE = "Various Artists"
 #   multiple channels
 
 
+STDIN_PATH = Path("-")
+COMPRESSED_SUFFIXES = (".gz", ".zst")
+
+
+def is_streamed_batch_file(filepath: Path) -> bool:
+    """
+    whether a batch file is read as it arrives (stdin, a named pipe, or compressed)
+     rather than read in full first
+    """
+    if filepath == STDIN_PATH or filepath.suffix in COMPRESSED_SUFFIXES:
+        return True
+    try:
+        return stat.S_ISFIFO(filepath.stat().st_mode)
+    except OSError:
+        return False
+
+
+@contextmanager
+def open_batch_file(filepath: Path) -> Iterator[TextIO]:
+    if filepath == STDIN_PATH:
+        yield sys.stdin
+    elif filepath.suffix == ".gz":
+        with gzip.open(filepath, "rt", encoding="utf-8") as file:
+            yield file
+    elif filepath.suffix == ".zst":
+        try:
+            import zstandard
+        except ImportError as exc:
+            raise RuntimeError(
+                f"Reading '{filepath}' needs the zstandard package (pip install yt-dlq[zstd])"
+            ) from exc
+        with open(filepath, "rb") as raw_file:
+            reader = zstandard.ZstdDecompressor().stream_reader(raw_file)
+            with io.TextIOWrapper(reader, encoding="utf-8") as file:
+                yield file
+    else:
+        with open(filepath, encoding="utf-8") as file:
+            yield file
+
+
+def iter_urls_from_file(filepath: Path, comment_char="#") -> Iterator[Url]:
+    """URLs from a batch file, one at a time as lines arrive"""
+    with open_batch_file(filepath) as file:
+        for rawline in iter(file.readline, ""):
+            line = rawline.strip()
+            if line and line[0] != comment_char:
+                yield line.split(comment_char)[0].strip()
+
+
 def read_urls_from_file(filepath: Path, comment_char="#") -> UrlList:
-    with open(filepath) as file:
-        rawlines = file.readlines()
-    url_list = []
-    for rawline in rawlines:
-        line = rawline.strip()
-        if line and line[0] != comment_char:
-            url_list.append(line.split(comment_char)[0].strip())
-    return url_list
+    return list(iter_urls_from_file(filepath, comment_char))
+
+
+# every category's pattern as one alternation, tried in the same order; the category is
+#  the name of the outer group that matched, and each pattern's own URL and ID groups
+#  follow it
+URL_CATEGORY_PATTERN = re.compile(
+    "^(?:"
+    + "|".join(
+        f"(?P<{url_category}>{pattern.removeprefix('^')})"
+        for url_category, pattern in URL_CATEGORY_PATTERNS.items()
+    )
+    + ")"
+)
+URL_CATEGORY_GROUPS = {
+    url_category: (index + 1, index + 2)
+    for url_category, index in URL_CATEGORY_PATTERN.groupindex.items()
+}
 
 
 def parse_url(url: Url) -> dict:
-    res = {
-        "category": None,
-        "id": None,
-        "url": url,
-    }
-    for url_category, pattern in URL_CATEGORY_PATTERNS.items():
-        match = re.match(pattern, url)
-        if match:
-            res["category"] = url_category
-            res["id"] = match.group(2)
-            if url_category == "video":
-                res["url"] = f"https://www.youtube.com/watch?v={res['id']}"
-            else:
-                res["url"] = match.group(1)
-            break
-    if res["category"] is None:
+    match = URL_CATEGORY_PATTERN.match(url)
+    if match is None:
         if not re.match(PATTERN_YOUTUBE, url):
             raise ValueError(f"Could not categorise URL '{url}' (not a valid URL?)")
-        LOGGER.info(pformat(URL_CATEGORY_PATTERNS).replace("\\\\", "\\"))
+        LOGGER.debug("Known URL patterns: %s", URL_CATEGORY_PATTERNS)
         raise ValueError(f"Could not categorise URL '{url}'")
-    return res
+    url_category = match.lastgroup
+    url_group, id_group = URL_CATEGORY_GROUPS[url_category]
+    url_id = match.group(id_group)
+    return {
+        "category": url_category,
+        "id": url_id,
+        "url": (
+            f"https://www.youtube.com/watch?v={url_id}"
+            if url_category == "video"
+            else match.group(url_group)
+        ),
+    }
 
 
 def get_url_category(url: Url) -> str | None:
@@ -121,24 +169,18 @@ def get_url_id(url: Url) -> str:
 
 def categorise_urls(url_list: UrlList) -> UrlCategoryDict:
     url_dict_categorised: dict[Optional[str], UrlList] = (
-        {"release": {}} | {k: {} for k in URL_CATEGORY_PATTERNS} | {None: {}}
+        {"release": {}} | {k: {} for k in URL_CATEGORY_PATTERNS}
     )
-    unknown_urls: UrlSet = set()
-    known_urls: UrlSet = set()
+    # input URLs and their normalised forms, so each distinct URL is parsed once
+    seen_urls: UrlSet = set()
     for url in url_list:
-        if url in (known_urls | unknown_urls):
+        if url in seen_urls:
             continue
         url_parsed_info = parse_url(url)
-        url_category = url_parsed_info["category"]
         url_categorised = url_parsed_info["url"]
-        if url_category is not None:
-            known_urls.add(url)
-            known_urls.add(url_categorised)
-        else:
-            LOGGER.warning(f"URL format not recognised: {url!r}")
-            unknown_urls.add(url)
-        url_dict_categorised[url_category][url_categorised] = ""
-    del url_dict_categorised[None]
+        seen_urls.add(url)
+        seen_urls.add(url_categorised)
+        url_dict_categorised[url_parsed_info["category"]][url_categorised] = ""
     return url_dict_categorised
 
 
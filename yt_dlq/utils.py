@@ -1,15 +1,14 @@
+import json
 import logging
+import os
 import re
+from json.encoder import encode_basestring as encode_json_string
 from collections.abc import Mapping
-from copy import deepcopy
 from os import PathLike
 from pathlib import Path
 from types import TracebackType
-from typing import TypeVar
 
-from utils_python import is_iterable, make_parent_dir, PathInput
-
-from yt_dlp.utils import DownloadError
+from utils_python import make_parent_dir, PathInput
 
 ROOT_PROJECT_DIR = Path(__file__).parent.parent
 
@@ -60,8 +59,17 @@ def escape_spaces(arg, use_singlequote=False):
     )
 
 
+def is_livestream(info_dict) -> bool:
+    """whether a video (from its full info or a flat playlist entry) is or was a livestream"""
+    return (
+        info_dict.get("is_live") is True
+        or info_dict.get("was_live") is True
+        or info_dict.get("live_status") in ("is_live", "was_live")
+    )
+
+
 def match_filter_func(info_dict):
-    if info_dict.get("is_live") is True or info_dict.get("was_live") is True:
+    if is_livestream(info_dict):
         return "Video is/was livestream; skipping"
     # if info_dict.get("availability") not in {'public', 'unlisted'}:
     #     return "Video is private; skipping"
@@ -75,6 +83,10 @@ def hyphenate_date(YYYYMMDD: str):
     return "-".join(match.groups())
 
 
+# stack frames between yt-dlp's logging call and YtdlqLogger.debug
+YTDLP_STACK_OFFSET = 3
+
+
 class YtdlqLogger(logging.Logger):
     def debug(
         self,
@@ -91,41 +103,31 @@ class YtdlqLogger(logging.Logger):
         stacklevel: int = 1,
         extra: Mapping[str, object] | None = None,
     ) -> None:
-        # re-calling logging functions adds another level to the stack, so we must
-        #  negate that by passing stacklevel: https://stackoverflow.com/a/59492341
-        YTDLP_STACK_OFFSET = 3
-
         # https://github.com/yt-dlp/yt-dlp#adding-logger-and-progress-hook
         # yt-dlp logs "info" as "debug"
         # debug messages start with [debug], but info messages do not start with [info]
         # as a workaround, assume log message starting with "["" was logged by yt-dlp
         # then assume any such message apart from `[debug]` should be info
-        if msg.startswith("["):
-            if msg.startswith("[debug]"):
-                return super().debug(
-                    msg,
-                    *args,
-                    exc_info=exc_info,
-                    stack_info=stack_info,
-                    stacklevel=stacklevel + YTDLP_STACK_OFFSET,
-                    extra=extra,
-                )
-            return super().info(
+        if msg[:1] == "[":
+            level = logging.DEBUG if msg.startswith("[debug]") else logging.INFO
+            # re-calling logging functions adds another level to the stack, so we must
+            #  negate that by passing stacklevel: https://stackoverflow.com/a/59492341
+            stacklevel += YTDLP_STACK_OFFSET
+        else:
+            level = logging.DEBUG
+            stacklevel += 1
+        # checked before anything else is done with the message, as most yt-dlp debug
+        #  messages are dropped
+        if self.isEnabledFor(level):
+            self._log(
+                level,
                 msg,
-                *args,
+                args,
                 exc_info=exc_info,
                 stack_info=stack_info,
-                stacklevel=stacklevel + YTDLP_STACK_OFFSET,
+                stacklevel=stacklevel,
                 extra=extra,
             )
-        return super().debug(
-            msg,
-            *args,
-            exc_info=exc_info,
-            stack_info=stack_info,
-            stacklevel=stacklevel + 1,
-            extra=extra,
-        )
 
 
 def make_shortcut(
@@ -140,45 +142,89 @@ def make_shortcut(
 
 ENTRIES_KEY = "entries"
 INDEX_KEY = "index"
-T = TypeVar("T")
-
 
-def sorted_nested_with_entries(obj: T) -> T:
-    obj_copy = deepcopy(obj)
-    if isinstance(obj_copy, dict):
-        iterable_items = {}
-        non_iterable_items = {}
 
-        entries_value = obj_copy.pop(ENTRIES_KEY) if ENTRIES_KEY in obj_copy else None
+def _sort_key(item: tuple):
+    # entries are ordered by their index where they have one, then anything else by key
+    key, value = item
+    if isinstance(value, dict) and isinstance(index := value.get(INDEX_KEY), (int, float)):
+        return (0, index, "")
+    return (1, 0, str(key))
 
-        def get_key(elem):
-            k, v = elem
-            if isinstance(v, dict) and "index" in v:
-                return v["index"]
-            return k
 
-        try:
-            iterable = sorted(obj_copy.items(), key=get_key)
-        except Exception as exc:
-            breakpoint()
-            pass
-
-        for k, v in iterable:
-            if is_iterable(v):
-                iterable_items[k] = sorted_nested_with_entries(v)
+def _ordered_items(obj: dict) -> list[tuple]:
+    """scalars first, then nested objects, then `entries`; each group sorted by _sort_key"""
+    items = sorted(
+        ((k, v) for k, v in obj.items() if k != ENTRIES_KEY), key=_sort_key
+    )
+    ordered = [item for item in items if not isinstance(item[1], (dict, list, tuple))]
+    ordered.extend(item for item in items if isinstance(item[1], (dict, list, tuple)))
+    if ENTRIES_KEY in obj:
+        ordered.append((ENTRIES_KEY, obj[ENTRIES_KEY]))
+    return ordered
+
+
+_SCALAR_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+
+def _encode_scalar(value) -> str:
+    if isinstance(value, str):
+        return encode_json_string(value)
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, int):
+        return int.__repr__(value)
+    return _SCALAR_ENCODER.encode(value)
+
+
+def iter_sorted_json(obj, indent: int = 4, _level: int = 0):
+    """
+    yield the JSON text of obj in canonical order (see _ordered_items), without
+     copying it; equivalent to json.dumps(obj, indent=indent, ensure_ascii=False) on a
+     reordered copy
+    """
+    if isinstance(obj, dict):
+        if not obj:
+            yield "{}"
+            return
+        separator = "\n" + " " * (indent * (_level + 1))
+        yield "{"
+        for i, (key, value) in enumerate(_ordered_items(obj)):
+            if isinstance(value, (dict, list, tuple)):
+                yield f"{',' if i else ''}{separator}{encode_json_string(str(key))}: "
+                yield from iter_sorted_json(value, indent, _level + 1)
             else:
-                non_iterable_items[k] = sorted_nested_with_entries(v)
-
-        result = {**non_iterable_items, **iterable_items}
-        if entries_value is not None:
-            result[ENTRIES_KEY] = sorted_nested_with_entries(entries_value)
-        return result
+                yield f"{',' if i else ''}{separator}{encode_json_string(str(key))}: {_encode_scalar(value)}"
+        yield "\n" + " " * (indent * _level) + "}"
+    elif isinstance(obj, (list, tuple)):
+        if not obj:
+            yield "[]"
+            return
+        try:
+            elements = sorted(obj)
+        except TypeError:
+            elements = obj
+        separator = "\n" + " " * (indent * (_level + 1))
+        yield "["
+        for i, element in enumerate(elements):
+            yield f"{',' if i else ''}{separator}"
+            yield from iter_sorted_json(element, indent, _level + 1)
+        yield "\n" + " " * (indent * _level) + "]"
+    else:
+        yield _encode_scalar(obj)
 
-    elif isinstance(obj_copy, (list, tuple)):
-        return obj_copy.__class__(sorted((sorted_nested_with_entries(e) for e in obj)))
 
-    else:
-        return obj_copy
+def dump_sorted_json(obj, path: Path):
+    """write obj to path in canonical order, replacing the file only once fully written"""
+    make_parent_dir(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.writelines(iter_sorted_json(obj))
+    os.replace(tmp_path, path)
 
 
 def matches_filter(
@@ -189,33 +235,4 @@ def matches_filter(
         return True
     return False
 
-class DownloadErrorPrivateVideo(DownloadError): ...
-class DownloadErrorMembersOnly(DownloadError): ...
-class DownloadErrorCaptchaChallenge(DownloadError): ...
-class DownloadErrorUnavailableVideo(DownloadError): ...
-class DownloadErrorAgeRestricted(DownloadError): ...
-class DownloadErrorTOSViolation(DownloadError): ...
-
-
-def specify_download_error(exc: DownloadError):
-    if exc.msg is None:
-        breakpoint()
-        pass
-        return exc
-    if "Private video" in exc.msg:
-        return DownloadErrorPrivateVideo(*exc.args)
-    if "members-only content" in exc.msg:
-        return DownloadErrorMembersOnly(*exc.args)
-    if "captcha challenge" in exc.msg:
-        return DownloadErrorCaptchaChallenge(*exc.args)
-    if "Video unavailable" in exc.msg:
-        return DownloadErrorUnavailableVideo(*exc.args)
-    if "Sign in to confirm your age." in exc.msg:
-        return DownloadErrorAgeRestricted(*exc.args)
-    if "removed for violating YouTube's Terms of Service" in exc.msg:
-        return DownloadErrorTOSViolation(*exc.args)
-    breakpoint()
-    pass
-    return exc
-
 YOUTUBE_MUSIC = "YouTube Music"